@@ -0,0 +1,192 @@
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from xml.sax.saxutils import escape
+import functools, json, os, random, re, shutil, threading
+
+WORDS = ("podcast episode interview guest host market science history music story technology "
+         "health money politics culture sport climate startup design research question answer").split()
+
+
+def episode_title(i: int) -> str:
+    """ Deterministic title of the i-th synthetic episode """
+    rng = random.Random(i)
+    return f"Episode {i}: " + ' '.join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(3, 8)))
+
+
+def make_feed(path, entries: int = 10_000, enclosure_url: str = "http://127.0.0.1/audio.mp3") -> Path:
+    """ Writes an RSS feed with entries episodes, newest first, all pointing to enclosure_url """
+    path = Path(path)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd"><channel>\n'
+                '<title>Benchmark Show</title><link>http://127.0.0.1/</link>'
+                '<image><url>http://127.0.0.1/cover.png</url><title>Benchmark Show</title></image>'
+                '<itunes:author>Bench Host</itunes:author>\n')
+        for i in range(entries, 0, -1):
+            rng = random.Random(i)
+            description = ' '.join(rng.choice(WORDS) for _ in range(60))
+            f.write(f'<item><title>{escape(episode_title(i))}</title><guid>episode-{i}</guid>'
+                    f'<description>{description}</description>'
+                    f'<pubDate>Mon, 01 Jan 2024 00:00:00 +0000</pubDate>'
+                    f'<enclosure url="{escape(enclosure_url)}" length="0" type="audio/mpeg"/>'
+                    f'<itunes:duration>01:00:00</itunes:duration></item>\n')
+        f.write('</channel></rss>\n')
+    return path
+
+
+def make_transcript(path, hours: float = 3, segment_seconds: float = 6, words: bool = True) -> Path:
+    """ Writes a WhisperX-shaped transcript of hours of speech, with word timings if words """
+    rng = random.Random(0)
+    segments, start = [], 0.0
+    while start < hours * 3600:
+        end = start + segment_seconds * rng.uniform(0.5, 1.5)
+        tokens = [rng.choice(WORDS) for _ in range(rng.randint(8, 24))]
+        segment = {'start': round(start, 3), 'end': round(end, 3), 'text': ' ' + ' '.join(tokens)}
+        if words:
+            step = (end - start) / len(tokens)
+            segment['words'] = [{'word': token, 'start': round(start + j * step, 3),
+                                 'end': round(start + (j + 1) * step, 3), 'score': round(rng.random(), 3)}
+                                for j, token in enumerate(tokens)]
+        segments.append(segment)
+        start = end
+    with open(path, 'w') as f:
+        json.dump({'segments': segments, 'language': 'en'}, f)
+    return Path(path)
+
+
+def make_corpus(directory, episodes: int = 100, hours: float = 1, vocabulary: int = 20_000,
+                segment_seconds: float = 6) -> Path:
+    """
+    Writes transcripts of episodes under directory/<channel>/<episode>/, with words drawn from a
+    Zipf-distributed vocabulary so that, as in speech, a few words are in most segments and most words are rare
+    :return: directory
+    """
+    directory = Path(directory)
+    rng = random.Random(0)
+    words = [corpus_word(i) for i in range(vocabulary)]
+    cum_weights, total = [], 0.0
+    for i in range(vocabulary):
+        total += 1 / (i + 1)
+        cum_weights.append(total)
+    for i in range(episodes):
+        path = directory.joinpath(f"channel-{i % 10}", f"episode-{i}", 'transcript.json')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        segments, start = [], 0.0
+        while start < hours * 3600:
+            end = start + segment_seconds * rng.uniform(0.5, 1.5)
+            text = ' ' + ' '.join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(8, 24)))
+            segments.append({'start': round(start, 3), 'end': round(end, 3), 'text': text})
+            start = end
+        with open(path, 'w') as f:
+            json.dump({'segments': segments, 'language': 'en'}, f)
+    return directory
+
+
+def corpus_word(rank: int) -> str:
+    """ Deterministic word of the given frequency rank in the synthetic corpus, the most frequent being 0 """
+    return f"{WORDS[rank % len(WORDS)]}{rank // len(WORDS) or ''}"
+
+
+def make_audio(path, size: int = 256 * 1024 * 1024) -> Path:
+    """ Writes size bytes of incompressible data standing in for an audio enclosure """
+    block = random.Random(0).randbytes(1024 * 1024)
+    with open(path, 'wb') as f:
+        for _ in range(size // len(block)):
+            f.write(block)
+        f.write(block[:size % len(block)])
+    return Path(path)
+
+
+class _RangeHandler(SimpleHTTPRequestHandler):
+    """ Static file handler answering single-range requests with 206 responses """
+
+    def log_message(self, format, *args):
+        pass
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, '_remaining', None)
+        if remaining is None:
+            return super().copyfile(source, outputfile)
+        while remaining > 0:
+            data = source.read(min(remaining, 1024 * 1024))
+            if not data:
+                break
+            outputfile.write(data)
+            remaining -= len(data)
+
+    def send_head(self):
+        self._remaining = None
+        path = self.translate_path(self.path)
+        match = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match is None or not os.path.isfile(path):
+            return super().send_head()
+        size = os.path.getsize(path)
+        first = int(match.group(1))
+        last = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+        f = open(path, 'rb')
+        f.seek(first)
+        self._remaining = last - first + 1
+        self.send_response(206)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Range', f"bytes {first}-{last}/{size}")
+        self.send_header('Content-Length', str(self._remaining))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        return f
+
+
+class FixtureServer:
+    """ Local HTTP server of a fixture directory, with range requests for the ranged downloader """
+
+    def __init__(self, directory, host: str = '127.0.0.1', port: int = 0) -> None:
+        """
+        Initialises FixtureServer
+        :param directory: directory to serve
+        :param host: host to listen on
+        :param port: port to listen on, any free port if 0
+        """
+        handler = functools.partial(_RangeHandler, directory=str(directory))
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    def url(self, name: str = '') -> str:
+        """ URL of a file in the served directory """
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/{name}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def build(directory, enclosure_url: str, feed_entries: int = 10_000, transcript_hours: float = 3,
+          audio_bytes: int = 256 * 1024 * 1024) -> dict:
+    """
+    Builds the fixtures in directory. The transcript and audio are reused when they were built
+    with the same parameters; the feed is always rewritten as its enclosure URL changes with the server port.
+    :return: paths of the fixtures
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = {'feed': directory.joinpath('feed.xml'), 'transcript': directory.joinpath('transcript.json'),
+             'audio': directory.joinpath('audio.mp3')}
+    make_feed(paths['feed'], feed_entries, enclosure_url)
+    params = {'transcript_hours': transcript_hours, 'audio_bytes': audio_bytes}
+    manifest = directory.joinpath('fixtures.json')
+    if not (manifest.exists() and json.loads(manifest.read_text()) == params
+            and paths['transcript'].exists() and paths['audio'].exists()):
+        make_transcript(paths['transcript'], transcript_hours)
+        make_audio(paths['audio'], audio_bytes)
+        manifest.write_text(json.dumps(params))
+    return paths
+
+
+def clean(directory) -> None:
+    """ Removes the fixtures """
+    shutil.rmtree(directory, ignore_errors=True)
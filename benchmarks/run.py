@@ -0,0 +1,294 @@
+"""
+Microbenchmarks of the PodSummer hot paths on synthetic fixtures, served from a local HTTP server.
+
+    python -m benchmarks.run                          all benchmarks, saved to benchmarks/results/<commit>.json
+    python -m benchmarks.run --quick -k title         smaller fixtures, only the benchmarks whose name contains 'title'
+    python -m benchmarks.run --compare benchmarks/results/<other commit>.json
+
+Run from the root of the repository. Exits with status 1 if the import time is over its budget,
+or if --compare finds a benchmark slower than --threshold times its previous median.
+"""
+from pathlib import Path
+import argparse, json, os, platform, random, statistics, subprocess, sys, tempfile, time
+
+from benchmarks import fixtures
+from podsummer import utils
+from podsummer.media.rss import RSSPodcast
+from podsummer.metadata.base import METADATA_KEYS
+from podsummer.retrieval.bm25 import BM25Index
+from podsummer.transcript.transcript import Transcript
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIRECTORY = ROOT.joinpath('benchmarks', 'results')
+HEAVY_MODULES = ['torch', 'whisperx', 'feedparser', 'pytube', 'fuzzywuzzy', 'openai', 'numpy']
+IMPORT_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import podsummer
+from podsummer.transcript.transcript import Transcript
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'heavy': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def measure(func, repeat: int, setup=None) -> dict:
+    """
+    Times func repeat times, calling setup untimed before every call
+    :return: min, median and mean seconds
+    """
+    times = []
+    for _ in range(repeat):
+        args = (setup(),) if setup is not None else ()
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times), 'mean': statistics.fmean(times), 'repeat': repeat}
+
+
+def bench_import(ctx: dict) -> dict:
+    """ Time to import podsummer and Transcript in a fresh interpreter, which must not import heavy backends """
+    runs = [json.loads(subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], cwd=ROOT, check=True,
+                                      capture_output=True, text=True).stdout) for _ in range(ctx['repeat'])]
+    seconds = [run['seconds'] for run in runs]
+    heavy = sorted(set(m for run in runs for m in run['heavy']))
+    return {'min': min(seconds), 'median': statistics.median(seconds), 'mean': statistics.fmean(seconds),
+            'repeat': len(runs), 'heavy_modules': heavy, 'budget': ctx['import_budget'],
+            'ok': min(seconds) <= ctx['import_budget'] and not heavy}
+
+
+def bench_rss_construct(ctx: dict) -> dict:
+    """ RSSPodcast construction, i.e. fetching and parsing the whole feed with feedparser """
+    result = measure(lambda: RSSPodcast(ctx['feed_url']), ctx['slow_repeat'])
+    result['entries'] = ctx['feed_entries']
+    return result
+
+
+def bench_find_entry_from_title(ctx: dict) -> dict:
+    """ Fuzzy title lookups on a parsed feed, per query: the first one builds the title index """
+    podcast = RSSPodcast(ctx['feed_url'])
+    rng = random.Random(0)
+
+    def queries():
+        # Fresh queries every repeat, missing one character so they take the fuzzy path and miss the query cache
+        titles = [fixtures.episode_title(rng.randint(1, ctx['feed_entries'])) for _ in range(ctx['queries'])]
+        return [title[:len(title) // 2] + title[len(title) // 2 + 1:] for title in titles]
+
+    start = time.perf_counter()
+    podcast.find_entry_from_title(queries()[0])
+    first = time.perf_counter() - start
+    result = measure(lambda batch: [podcast.find_entry_from_title(query) for query in batch], ctx['repeat'],
+                     setup=queries)
+    result.update({key: result[key] / ctx['queries'] for key in ('min', 'median', 'mean')})
+    result.update({'first': first, 'queries': ctx['queries'], 'entries': ctx['feed_entries']})
+    return result
+
+
+def bench_transcript_load(ctx: dict) -> dict:
+    """ Loading a WhisperX transcript JSON into a Transcript """
+    result = measure(lambda: Transcript(path=str(ctx['transcript'])), ctx['repeat'])
+    result['segments'] = len(Transcript(path=str(ctx['transcript'])))
+    return result
+
+
+def bench_transcript_text(ctx: dict) -> dict:
+    """ Building the text of a loaded Transcript """
+    return measure(lambda transcript: transcript.text, ctx['repeat'],
+                   setup=lambda: Transcript(path=str(ctx['transcript'])))
+
+
+def bench_transcript_timed_text(ctx: dict) -> dict:
+    """ Building the timed text of a loaded Transcript """
+    return measure(lambda transcript: transcript.timed_text, ctx['repeat'],
+                   setup=lambda: Transcript(path=str(ctx['transcript'])))
+
+
+def bench_save_json(ctx: dict) -> dict:
+    """ utils.save_json of a transcript """
+    raw = utils.load_json(ctx['transcript'])
+    path = Path(ctx['work']).joinpath('save_json.json')
+    result = measure(lambda: utils.save_json(raw, path), ctx['repeat'])
+    result['bytes'] = path.stat().st_size
+    return result
+
+
+def bench_load_json(ctx: dict) -> dict:
+    """ utils.load_json of a transcript """
+    result = measure(lambda: utils.load_json(ctx['transcript']), ctx['repeat'])
+    result['bytes'] = Path(ctx['transcript']).stat().st_size
+    return result
+
+
+def _bench_save_transcript(ctx: dict, name: str) -> dict:
+    """ utils.save_transcript of a transcript to name, whose suffix selects the format """
+    raw = utils.load_json(ctx['transcript'])
+    path = Path(ctx['work']).joinpath(name)
+    result = measure(lambda: utils.save_transcript(raw, path), ctx['repeat'])
+    result['bytes'] = path.stat().st_size
+    return result
+
+
+def _bench_transcript_load_format(ctx: dict, name: str) -> dict:
+    """ Loading a transcript saved to name into a Transcript """
+    path = Path(ctx['work']).joinpath(name)
+    utils.save_transcript(utils.load_json(ctx['transcript']), path)
+    result = measure(lambda: Transcript(path=str(path)), ctx['repeat'])
+    result['bytes'] = path.stat().st_size
+    return result
+
+
+def bench_save_transcript_json_gz(ctx: dict) -> dict:
+    """ utils.save_transcript to gzip-compressed JSON """
+    return _bench_save_transcript(ctx, 'transcript.json.gz')
+
+
+def bench_save_transcript_jsonl(ctx: dict) -> dict:
+    """ utils.save_transcript to JSON lines """
+    return _bench_save_transcript(ctx, 'transcript.jsonl')
+
+
+def bench_transcript_load_jsonl(ctx: dict) -> dict:
+    """ Loading a JSON lines transcript into a Transcript, segment by segment """
+    return _bench_transcript_load_format(ctx, 'transcript.jsonl')
+
+
+def bench_transcript_load_jsonl_gz(ctx: dict) -> dict:
+    """ Loading a gzip-compressed JSON lines transcript into a Transcript """
+    return _bench_transcript_load_format(ctx, 'transcript.jsonl.gz')
+
+
+def bench_bm25_search(ctx: dict) -> dict:
+    """ BM25Index.search of the top 10 segments over a corpus of transcripts, per query mixing common and rare words """
+    content = fixtures.make_corpus(Path(ctx['work']).joinpath('corpus'), ctx['corpus_episodes'])
+    index = BM25Index(Path(ctx['work']).joinpath('corpus.sqlite'))
+    start = time.perf_counter()
+    index.update(content)
+    build = time.perf_counter() - start
+    rng = random.Random(0)
+
+    def queries():
+        # Questions mix a few of the most common words with rarer ones
+        return [' '.join([fixtures.corpus_word(rng.randint(0, 20)) for _ in range(3)]
+                         + [fixtures.corpus_word(rng.randint(100, 5_000)) for _ in range(2)])
+                for _ in range(ctx['queries'])]
+
+    result = measure(lambda batch: [index.search(query, k=10) for query in batch], ctx['repeat'], setup=queries)
+    result.update({key: result[key] / ctx['queries'] for key in ('min', 'median', 'mean')})
+    result.update({'build': build, 'queries': ctx['queries'], 'segments': int(index._stat('segments'))})
+    index.close()
+    return result
+
+
+def bench_to_filename(ctx: dict) -> dict:
+    """ utils.to_filename of episode titles, per call """
+    titles = [fixtures.episode_title(i) for i in range(10_000)]
+    result = measure(lambda: [utils.to_filename(title) for title in titles], ctx['repeat'])
+    result.update({key: result[key] / len(titles) for key in ('min', 'median', 'mean')})
+    result['calls'] = len(titles)
+    return result
+
+
+def bench_download_audio(ctx: dict) -> dict:
+    """ RSSPodcast.download_audio of a large enclosure from the local server """
+    podcast = RSSPodcast(ctx['feed_url'], episode_title=fixtures.episode_title(ctx['feed_entries']))
+    audio_path = Path(podcast.store_paths[METADATA_KEYS["AUDIO_FILENAME"].split('.')[0]])
+
+    def setup():
+        for path in audio_path.parent.glob(f"{audio_path.name}*"):
+            path.unlink()
+
+    result = measure(lambda _: podcast.download_audio(), ctx['slow_repeat'], setup=setup)
+    size = audio_path.stat().st_size
+    result.update({'bytes': size, 'mb_per_second': size / result['median'] / 1e6})
+    return result
+
+
+BENCHMARKS = {name[len('bench_'):]: func for name, func in globals().items() if name.startswith('bench_')}
+
+
+def git_commit() -> str:
+    """ Short hash of the checked out commit, with a suffix if the tree has local changes """
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    commit = git('rev-parse', '--short', 'HEAD') or 'unknown'
+    return f"{commit}-dirty" if git('status', '--porcelain', '--untracked-files=no') else commit
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """ Prints the median of every benchmark against the baseline, returning the regressions """
+    regressions = []
+    print(f"\n{'benchmark':<28}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for name, result in results.items():
+        if name not in baseline['results']:
+            continue
+        old, new = baseline['results'][name]['median'], result['median']
+        ratio = new / old if old else float('inf')
+        flag = '  <-- slower' if ratio > threshold else ''
+        print(f"{name:<28}{old:>12.6f}{new:>12.6f}{ratio:>8.2f}{flag}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', dest='only', default='', help="run only the benchmarks whose name contains this")
+    parser.add_argument('--quick', action='store_true', help="smaller fixtures and fewer repeats")
+    parser.add_argument('--fixtures', default=Path(tempfile.gettempdir()).joinpath('podsummer-benchmarks'),
+                        type=Path, help="directory of the generated fixtures, reused between runs")
+    parser.add_argument('--output', type=Path, help="results file, defaults to benchmarks/results/<commit>.json")
+    parser.add_argument('--compare', type=Path, help="results file of a previous run to compare with")
+    parser.add_argument('--threshold', type=float, default=1.2, help="slowdown ratio reported as a regression")
+    parser.add_argument('--import-budget', type=float, default=0.5, help="maximum seconds to import podsummer")
+    args = parser.parse_args(argv)
+    # Read before running, as the results may be saved over the same file
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    ctx = {'feed_entries': 1_000 if args.quick else 10_000,
+           'transcript_hours': 0.5 if args.quick else 3,
+           'audio_bytes': (32 if args.quick else 256) * 1024 * 1024,
+           'repeat': 3 if args.quick else 10, 'slow_repeat': 1 if args.quick else 3,
+           'queries': 20 if args.quick else 100, 'corpus_episodes': 10 if args.quick else 100,
+           'import_budget': args.import_budget}
+    selected = {name: func for name, func in BENCHMARKS.items() if args.only in name}
+    fixtures_directory = Path(args.fixtures).resolve()
+    results = {}
+    with fixtures.FixtureServer(fixtures_directory.joinpath('served')) as server, \
+            tempfile.TemporaryDirectory() as work:
+        paths = fixtures.build(fixtures_directory.joinpath('served'), server.url('audio.mp3'),
+                               ctx['feed_entries'], ctx['transcript_hours'], ctx['audio_bytes'])
+        ctx.update({'feed_url': server.url('feed.xml'), 'transcript': paths['transcript'], 'work': work})
+        cwd = os.getcwd()
+        # Episodes are stored under content/ of the working directory
+        os.chdir(work)
+        try:
+            for name, func in selected.items():
+                results[name] = func(ctx)
+                print(f"{name:<28}median {results[name]['median']:.6f}s  min {results[name]['min']:.6f}s")
+        finally:
+            os.chdir(cwd)
+
+    report = {'commit': git_commit(), 'timestamp': time.time(), 'python': platform.python_version(),
+              'platform': platform.platform(), 'quick': args.quick,
+              'params': {key: value for key, value in ctx.items() if key not in ('feed_url', 'transcript', 'work')},
+              'results': results}
+    output = args.output or RESULTS_DIRECTORY.joinpath(f"{report['commit']}{'-quick' if args.quick else ''}.json")
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+    failed = False
+    if 'import' in results and not results['import']['ok']:
+        print(f"Import took {results['import']['min']:.3f}s (budget {args.import_budget}s), "
+              f"heavy modules imported: {results['import']['heavy_modules']}")
+        failed = True
+    if baseline is not None:
+        failed = bool(compare(results, baseline, args.threshold)) or failed
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,5 @@
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from podsummer._lazy import lazy_submodules
 
-from podsummer import utils
-from podsummer import media
-from podsummer import metadata
-from podsummer import transcribe
-from podsummer import transcript
-
-__all__ = ['utils',
-            'media',
-            'metadata',
-            'transcribe', 
-            'transcript']
+__all__ = ['utils', 'media', 'metadata', 'transcribe', 'transcript', 'store', 'llm', 'retrieval', 'ragengine', 'podsummer', 'instrument']
 
+__getattr__, __dir__ = lazy_submodules(__name__, __all__)
@@ -0,0 +1,20 @@
+import importlib, sys
+
+
+def lazy_submodules(package: str, submodules: list):
+    """
+    Returns the module-level __getattr__ and __dir__ of a package whose submodules are imported
+    on first attribute access, so importing the package does not import their dependencies
+    :param package: name of the package, i.e. its __name__
+    :param submodules: names of the submodules
+    """
+    def __getattr__(name):
+        if name in submodules:
+            # import_module binds the submodule to the package, so this runs once per submodule
+            return importlib.import_module(f"{package}.{name}")
+        raise AttributeError(f"module {package!r} has no attribute {name!r}")
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(submodules))
+
+    return __getattr__, __dir__
@@ -0,0 +1,285 @@
+"""
+Timing and resource instrumentation of the pipeline stages.
+
+Code under measurement opens nested spans:
+
+    with instrument.span('transcribe', model=self.trans_model) as span:
+        ...
+        span.set_audio_seconds(len(audio) / SAMPLE_RATE)
+
+Finished spans are sent to the enabled sinks, e.g.
+
+    instrument.enable(instrument.JSONLinesSink('trace.jsonl'), instrument.PrometheusSink('podsummer.prom'))
+
+or by setting PODSUMMER_TRACE and PODSUMMER_PROMETHEUS to the paths of the files.
+Without sinks, span returns a shared no-op span, so instrumented code costs one call per span.
+"""
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+import atexit, itertools, json, os, sys, threading, time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where peak RSS is not reported
+    resource = None
+
+from podsummer import utils
+
+_SINKS = []
+_CURRENT = ContextVar('podsummer_span', default=None)
+_IDS = itertools.count(1)
+
+
+def _peak_rss() -> Optional[int]:
+    """ Peak resident set size of the process in bytes """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def rss_bytes() -> Optional[int]:
+    """ Current resident set size of the process in bytes, None where it cannot be read """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+class _NullSpan:
+    """ Span used when instrumentation is disabled, doing nothing """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def add_bytes(self, n: int) -> None:
+        pass
+
+    def set_audio_seconds(self, seconds: float) -> None:
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """ Timed section of code, nested in the span that was current when it was entered """
+
+    __slots__ = ('name', 'id', 'parent', 'attrs', 'bytes', 'audio_seconds', '_wall', '_cpu', '_rss', '_start', '_token')
+
+    def __init__(self, name: str, attrs: dict) -> None:
+        """
+        Initialises Span
+        :param name: name of the stage
+        :param attrs: attributes recorded with the span
+        """
+        self.name = name
+        self.id = next(_IDS)
+        self.parent = None
+        self.attrs = attrs
+        self.bytes = 0
+        self.audio_seconds = None
+
+    @property
+    def path(self) -> str:
+        """ Names of the enclosing spans and this one, separated by slashes """
+        return f"{self.parent.path}/{self.name}" if self.parent is not None else self.name
+
+    def set(self, **attrs) -> None:
+        """ Records attributes with the span """
+        self.attrs.update(attrs)
+
+    def add_bytes(self, n: int) -> None:
+        """ Counts bytes transferred in the span """
+        self.bytes += n
+
+    def set_audio_seconds(self, seconds: float) -> None:
+        """ Records the duration of the audio processed in the span """
+        self.audio_seconds = seconds
+
+    def __enter__(self) -> 'Span':
+        self.parent = _CURRENT.get()
+        self._token = _CURRENT.set(self)
+        self._start = time.time()
+        # CPU time of the calling thread, so concurrent stages are not charged for each other
+        self._rss = rss_bytes()
+        self._wall, self._cpu = time.perf_counter(), time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall, cpu = time.perf_counter() - self._wall, time.thread_time() - self._cpu
+        rss = rss_bytes()
+        _CURRENT.reset(self._token)
+        record = {'name': self.name, 'path': self.path, 'id': self.id,
+                  'parent_id': self.parent.id if self.parent is not None else None,
+                  'start': self._start, 'wall_seconds': wall, 'cpu_seconds': cpu,
+                  # Resident memory is per process, so the delta includes what concurrent spans allocated
+                  'rss_bytes': rss, 'rss_delta_bytes': rss - self._rss if rss is not None and self._rss is not None else None,
+                  'process_peak_rss_bytes': _peak_rss(),
+                  'bytes': self.bytes, 'bytes_per_second': self.bytes / wall if self.bytes and wall > 0 else None,
+                  'audio_seconds': self.audio_seconds,
+                  'audio_seconds_per_second': self.audio_seconds / wall if self.audio_seconds and wall > 0 else None,
+                  'error': exc_type.__name__ if exc_type is not None else None,
+                  'attrs': self.attrs}
+        for sink in list(_SINKS):
+            sink.emit(record)
+        return False
+
+
+def span(name: str, **attrs):
+    """
+    Returns a context manager timing the enclosed code as a span
+    :param name: name of the stage, e.g. 'download'
+    :param attrs: attributes recorded with the span, e.g. the URL
+    """
+    if not _SINKS:
+        return NULL_SPAN
+    return Span(name, attrs)
+
+
+def current():
+    """ Returns the innermost open span, or a no-op span """
+    if not _SINKS:
+        return NULL_SPAN
+    return _CURRENT.get() or NULL_SPAN
+
+
+def enabled() -> bool:
+    """ Whether any sink is receiving spans """
+    return bool(_SINKS)
+
+
+def enable(*sinks: 'Sink') -> None:
+    """ Sends finished spans to sinks, in addition to the already enabled ones """
+    _SINKS.extend(sinks)
+
+
+def disable() -> None:
+    """ Stops sending spans and closes the sinks """
+    sinks = list(_SINKS)
+    _SINKS.clear()
+    for sink in sinks:
+        sink.close()
+
+
+class Sink(ABC):
+    """ Abstract base class for receivers of finished spans """
+
+    @abstractmethod
+    def emit(self, record: dict) -> None:
+        """
+        Receives a finished span, possibly from several threads at once
+        :param record: name, path, ids, timings, resources and attributes of the span
+        """
+        pass
+
+    def close(self) -> None:
+        """ Flushes and releases the sink """
+        pass
+
+
+class JSONLinesSink(Sink):
+    """ Appends every span as a line of JSON to a file """
+
+    def __init__(self, path) -> None:
+        """
+        Initialises JSONLinesSink
+        :param path: path of the file
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'a', buffering=1)
+
+    def emit(self, record: dict) -> None:
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusSink(Sink):
+    """
+    Aggregates spans by name into counters written in the Prometheus text format,
+    to a file read by the textfile collector of the node exporter
+    """
+
+    METRICS = (('spans_total', 'Number of finished spans', 'count'),
+               ('errors_total', 'Number of spans that raised', 'errors'),
+               ('wall_seconds_total', 'Wall time spent in spans', 'wall_seconds'),
+               ('cpu_seconds_total', 'CPU time of the calling thread spent in spans', 'cpu_seconds'),
+               ('bytes_total', 'Bytes transferred in spans', 'bytes'),
+               ('audio_seconds_total', 'Seconds of audio processed in spans', 'audio_seconds'))
+
+    def __init__(self, path, prefix: str = 'podsummer_span', interval: float = 10.0) -> None:
+        """
+        Initialises PrometheusSink
+        :param path: path of the .prom file
+        :param prefix: prefix of the metric names
+        :param interval: minimum seconds between writes of the file, it is also written on close
+        """
+        self.path = Path(path)
+        self.prefix = prefix
+        self.interval = interval
+        self._totals = defaultdict(lambda: dict.fromkeys(('count', 'errors', 'wall_seconds', 'cpu_seconds',
+                                                          'bytes', 'audio_seconds'), 0))
+        self._peak_rss = 0
+        self._written = 0.0
+        self._lock = threading.Lock()
+
+    def emit(self, record: dict) -> None:
+        with self._lock:
+            totals = self._totals[record['name']]
+            totals['count'] += 1
+            totals['errors'] += record['error'] is not None
+            totals['wall_seconds'] += record['wall_seconds']
+            totals['cpu_seconds'] += record['cpu_seconds']
+            totals['bytes'] += record['bytes']
+            totals['audio_seconds'] += record['audio_seconds'] or 0
+            self._peak_rss = max(self._peak_rss, record['process_peak_rss_bytes'] or 0)
+            if time.monotonic() - self._written >= self.interval:
+                self._write()
+
+    def _write(self) -> None:
+        """ Writes the file atomically, so the collector never reads a partial file """
+        lines = []
+        for metric, help, key in self.METRICS:
+            lines += [f"# HELP {self.prefix}_{metric} {help}", f"# TYPE {self.prefix}_{metric} counter"]
+            lines += [f'{self.prefix}_{metric}{{span="{name}"}} {totals[key]}' for name, totals in sorted(self._totals.items())]
+        lines += [f"# HELP {self.prefix}_process_peak_rss_bytes Peak resident set size of the process",
+                  f"# TYPE {self.prefix}_process_peak_rss_bytes gauge", f"{self.prefix}_process_peak_rss_bytes {self._peak_rss}"]
+        tmp_path = utils.temporary_path(self.path)
+        utils.save_text('\n'.join(lines) + '\n', tmp_path)
+        tmp_path.replace(self.path)
+        self._written = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            self._write()
+
+
+if os.environ.get('PODSUMMER_TRACE') or os.environ.get('PODSUMMER_PROMETHEUS'):
+    atexit.register(disable)
+if os.environ.get('PODSUMMER_TRACE'):
+    enable(JSONLinesSink(os.environ['PODSUMMER_TRACE']))
+if os.environ.get('PODSUMMER_PROMETHEUS'):
+    enable(PrometheusSink(os.environ['PODSUMMER_PROMETHEUS']))
@@ -0,0 +1,24 @@
+from abc import ABC, abstractmethod
+from typing import Iterator
+
+
+class ChatClient(ABC):
+    """ Abstract base class for chat completion clients """
+
+    @abstractmethod
+    def complete(self, messages: list, model: str, **params) -> str:
+        """ 
+        Completes a chat
+        :param messages: list of messages with role and content
+        :param model: name of the model
+        :param params: additional parameters of the request, e.g. temperature
+        :return: content of the response message
+        """
+        pass
+
+    def stream(self, messages: list, model: str, **params) -> Iterator[str]:
+        """ 
+        Completes a chat, yielding the content of the response as it is generated.
+        Clients that cannot stream yield the whole content at once.
+        """
+        yield self.complete(messages, model, **params)
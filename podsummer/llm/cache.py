@@ -0,0 +1,194 @@
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Iterator, Optional
+import hashlib, json, sqlite3, threading, time
+
+from podsummer.llm.base import ChatClient
+from podsummer.metadata.base import METADATA_KEYS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER,
+                                      created_at REAL, last_used REAL);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+def request_key(messages: list, model: str, params: dict) -> str:
+    """
+    Returns the cache key of a chat completion request, ignoring whitespace differences in the text of the messages.
+    Every field of the messages is part of the key, e.g. names and tool calls, not only their role and content
+    """
+    normalized = [{**message, 'content': ' '.join(message['content'].split())}
+                  if isinstance(message.get('content'), str) else message for message in messages]
+    payload = json.dumps({'model': model, 'messages': normalized, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """ On-disk cache of chat completion responses, with TTL and least recently used eviction by size """
+
+    def __init__(self, path: Optional[Path] = None, ttl: Optional[float] = None,
+                 max_bytes: Optional[int] = 256 * 1024 * 1024) -> None:
+        """
+        Initialises ResponseCache
+        :param path: path of the cache database, defaults to content/.llm_cache.sqlite
+        :param ttl: seconds after which a response expires, never if None
+        :param max_bytes: maximum total size of the cached responses, unbounded if None
+        """
+        if path is None:
+            path = Path(METADATA_KEYS["CONTENT_DIRECTORY_NAME"]).joinpath(METADATA_KEYS["LLM_CACHE_FILENAME"])
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "deduplicated": 0}
+
+    def __repr__(self):
+        """ Representation of ResponseCache Object """
+        return f"""ResponseCache[Path = {self.path}, Bytes = {self._bytes}, Stats = {self.stats}]"""
+
+    def close(self) -> None:
+        """ Closes the cache """
+        self._db.close()
+
+    def get(self, key: str) -> Optional[str]:
+        """ Returns the cached response of key, or None if it is missing or expired """
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute("SELECT response, size, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            response, size, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._bytes -= size
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.stats["hits"] += 1
+            return response
+
+    def put(self, key: str, model: str, response: str) -> None:
+        """ Caches response under key, evicting the least recently used responses over max_bytes; None is not cached """
+        if response is None:
+            return
+        now, size = time.time(), len(response.encode('utf-8'))
+        with self._lock, self._db:
+            row = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                             (key, model, response, size, now, now))
+            self._bytes += size - (row[0] if row else 0)
+            while self.max_bytes is not None and self._bytes > self.max_bytes:
+                oldest = self._db.execute("SELECT key, size FROM responses WHERE key != ? ORDER BY last_used LIMIT 64",
+                                          (key,)).fetchall()
+                if not oldest:
+                    break
+                for old_key, old_size in oldest:
+                    if self._bytes <= self.max_bytes:
+                        break
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    self._bytes -= old_size
+                    self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        """ Removes all cached responses """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses")
+            self._bytes = 0
+
+
+class CachedChatClient(ChatClient):
+    """
+    Chat client that serves repeated requests from a ResponseCache.
+    Identical requests made concurrently are sent once, and every caller gets the same response.
+    """
+
+    def __init__(self, client: ChatClient, cache: Optional[ResponseCache] = None) -> None:
+        """
+        Initialises CachedChatClient
+        :param client: chat client of the cache misses
+        :param cache: response cache, a default one is created if None
+        """
+        self.client = client
+        self.cache = cache if cache is not None else ResponseCache()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def _claim(self, key: str):
+        """ Returns the future of the in-flight request with key, and whether the caller owns it and must send it """
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+            else:
+                self.cache.stats["deduplicated"] += 1
+        return future, owner
+
+    def _release(self, key: str, future: Future) -> None:
+        """ Ends the in-flight request with key, resolving it with None if the owner gave up on it """
+        with self._lock:
+            del self._in_flight[key]
+        if not future.done():
+            future.set_result(None)
+
+    def complete(self, messages: list, model: str, **params) -> str:
+        """ Completes a chat, reusing a cached or in-flight response to the same request """
+        key = request_key(messages, model, params)
+        future, owner = self._claim(key)
+        if not owner:
+            response = future.result()
+            # None when the owner closed its stream early, so the request was never completed
+            return response if response is not None else self.complete(messages, model, **params)
+        try:
+            response = self.cache.get(key)
+            if response is None:
+                response = self.client.complete(messages, model, **params)
+                self.cache.put(key, model, response)
+            future.set_result(response)
+            return response
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._release(key, future)
+
+    def stream(self, messages: list, model: str, **params) -> Iterator[str]:
+        """
+        Streams a chat, serving a cached response at once and caching the streamed one.
+        A request identical to one in flight is sent once, and its response is yielded at once when it is complete
+        """
+        key = request_key(messages, model, params)
+        future, owner = self._claim(key)
+        if not owner:
+            response = future.result()
+            if response is None:
+                yield from self.stream(messages, model, **params)
+            else:
+                yield response
+            return
+        try:
+            response = self.cache.get(key)
+            if response is not None:
+                future.set_result(response)
+                yield response
+                return
+            tokens = []
+            for token in self.client.stream(messages, model, **params):
+                tokens.append(token)
+                yield token
+            response = ''.join(tokens)
+            self.cache.put(key, model, response)
+            future.set_result(response)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._release(key, future)
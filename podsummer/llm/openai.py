@@ -0,0 +1,28 @@
+from typing import Iterator, Optional
+
+import openai
+
+from podsummer.llm.base import ChatClient
+
+
+class OpenAIChatClient(ChatClient):
+    """ Chat completion client for the OpenAI API, or any server implementing it """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None) -> None:
+        """ 
+        Initialises OpenAIChatClient
+        :param api_key: OpenAI API key, read from OPENAI_API_KEY if None
+        :param base_url: base URL of the API, e.g. of a local server
+        """
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url)
+
+    def complete(self, messages: list, model: str, **params) -> str:
+        """ Completes a chat """
+        response = self.client.chat.completions.create(model=model, messages=messages, **params)
+        return response.choices[0].message.content
+
+    def stream(self, messages: list, model: str, **params) -> Iterator[str]:
+        """ Completes a chat, yielding the content of the response as it arrives """
+        for chunk in self.client.chat.completions.create(model=model, messages=messages, stream=True, **params):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
@@ -0,0 +1,37 @@
+SYSTEM_PROMPT = """ Assist podcast enthusiasts by summarizing episodes from provided transcripts
+                    and answering content-related queries.\n """
+
+
+def SUMMARY_PROMPT(podcast_title, episode_title, transcript_text):
+    """ Returns the summary prompt specifically for the podcast episode """
+
+    return f""" Given the following transcription of the episode {episode_title} from the podcast {podcast_title},
+                please analyze the structure and content of the transcription. Note the key topics discussed,
+                the main points made by the host and any guests, and any significant conclusions drawn during the episode.
+                Provide a concise summary that captures the essence of the episode, its thematic focus,
+                and any noteworthy insights or information shared by the participants.
+                The summary should be structured to reflect the flow of the conversation and should be limited to approximately 250-300 words for brevity.
+                Please exclude any parts of the transcript that involve plugs for the podcast, advertisements, or calls for subscriptions,
+                focusing solely on the content relevant to the main discussion topics.\n\n{transcript_text}"""
+
+
+def CHUNK_SUMMARY_PROMPT(podcast_title, episode_title, part, parts, transcript_text):
+    """ Returns the prompt summarizing one part of the transcript """
+
+    return f""" The following is part {part} of {parts} of the transcription of the episode {episode_title}
+                from the podcast {podcast_title}. Each line starts with its start time in seconds.
+                Summarize the topics discussed and the main points made in this part in a few sentences,
+                keeping the order of the conversation. Exclude advertisements and calls for subscriptions.\n\n{transcript_text}"""
+
+
+def REDUCE_SUMMARY_PROMPT(podcast_title, episode_title, summaries_text, final):
+    """ Returns the prompt combining the summaries of consecutive parts of the transcript """
+
+    if final:
+        instructions = """ Combine them into a concise summary that captures the essence of the episode, its thematic focus,
+                and any noteworthy insights or information shared by the participants.
+                The summary should reflect the flow of the conversation and be limited to approximately 250-300 words."""
+    else:
+        instructions = """ Combine them into one summary of these parts, keeping the order of the conversation."""
+    return f""" The following are summaries of consecutive parts of the episode {episode_title} from the podcast {podcast_title}.
+                {instructions}\n\n{summaries_text}"""
@@ -0,0 +1,257 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+import itertools, json, re, threading, time
+
+from podsummer.llm.base import ChatClient
+
+
+def _stub_reply(messages: list, model: str) -> str:
+    """ Deterministic reply to messages: the beginning of the last message """
+    content = messages[-1]['content']
+    return f"[{model}] {' '.join(content.split()[:50])}"
+
+
+def _stub_tokens(reply: str) -> list:
+    """ Splits a reply into the tokens it is streamed as, one word with its trailing space each """
+    return re.findall(r'\S+\s*', reply)
+
+
+class StubChatClient(ChatClient):
+    """ Deterministic chat client for local testing, with a configurable latency """
+
+    def __init__(self, latency: float = 0.0, token_latency: float = 0.0) -> None:
+        """
+        Initialises StubChatClient
+        :param latency: seconds every completion takes before its first token
+        :param token_latency: seconds between streamed tokens
+        """
+        self.latency = latency
+        self.token_latency = token_latency
+        self.calls = 0
+
+    def complete(self, messages: list, model: str, **params) -> str:
+        """ Returns the beginning of the last message after sleeping for the latency """
+        return ''.join(self.stream(messages, model, **params))
+
+    def stream(self, messages: list, model: str, **params) -> Iterator[str]:
+        """ Yields the reply of complete word by word, sleeping for the latencies """
+        self.calls += 1
+        time.sleep(self.latency)
+        for i, token in enumerate(_stub_tokens(_stub_reply(messages, model))):
+            if i:
+                time.sleep(self.token_latency)
+            yield token
+
+
+class StubChatServer:
+    """
+    Local HTTP server implementing the chat completions endpoint of the OpenAI API,
+    and the subset of the Assistants API used by OpenAIAssistant, with configurable latencies,
+    so clients can be measured without the network.
+    Streamed responses are sent as server-sent events, one word per event.
+    """
+
+    def __init__(self, latency: float = 0.0, token_latency: float = 0.0,
+                 host: str = '127.0.0.1', port: int = 0) -> None:
+        """
+        Initialises StubChatServer
+        :param latency: seconds every completion takes before its first token
+        :param token_latency: seconds between streamed tokens
+        :param host: host to listen on
+        :param port: port to listen on, any free port if 0
+        """
+        self.latency = latency
+        self.token_latency = token_latency
+        self.requests = 0
+        self.polls = 0
+        self._ids = itertools.count(1)
+        self._threads, self._runs = {}, {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    def _id(self, prefix: str) -> str:
+        """ Returns a new object id """
+        return f"{prefix}_{next(self._ids)}"
+
+    def _duration(self, reply: str) -> float:
+        """ Seconds a reply takes to be fully generated """
+        return self.latency + self.token_latency * max(len(_stub_tokens(reply)) - 1, 0)
+
+    def _message(self, thread_id: str, role: str, content: str) -> dict:
+        """ Returns an Assistants API message object """
+        return {'id': self._id('msg'), 'object': 'thread.message', 'created_at': int(time.time()),
+                'thread_id': thread_id, 'role': role, 'status': 'completed', 'attachments': [], 'metadata': {},
+                'content': [{'type': 'text', 'text': {'value': content, 'annotations': []}}]}
+
+    def _run(self, run: dict) -> dict:
+        """ Returns the current state of a run, adding its reply to the thread once it is done """
+        if run['status'] == 'in_progress' and time.time() >= run['_done_at']:
+            run['status'] = 'completed'
+            self._threads[run['thread_id']].append(self._message(run['thread_id'], 'assistant', run['_reply']))
+        return {key: value for key, value in run.items() if not key.startswith('_')}
+
+    def _handler(self):
+        """ Returns the request handler class bound to this server """
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+            def _send_json(self, obj) -> None:
+                payload = json.dumps(obj).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_events(self, events) -> None:
+                # HTTP/1.0 without Content-Length: the end of the stream is the end of the connection
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                for event, data in events:
+                    line = f"event: {event}\n" if event else ""
+                    self.wfile.write(f"{line}data: {data if isinstance(data, str) else json.dumps(data)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+
+            def _tokens(self, reply: str):
+                time.sleep(server.latency)
+                for i, token in enumerate(_stub_tokens(reply)):
+                    if i:
+                        time.sleep(server.token_latency)
+                    yield token
+
+            def do_GET(self):
+                parts = self.path.split('?')[0].strip('/').split('/')
+                with server._lock:
+                    if parts[-1] == 'messages':
+                        thread_id = parts[parts.index('threads') + 1]
+                        messages = list(server._threads.get(thread_id, []))
+                        if 'order=asc' not in self.path:
+                            messages.reverse()
+                        obj = {'object': 'list', 'data': messages, 'has_more': False,
+                               'first_id': messages[0]['id'] if messages else None,
+                               'last_id': messages[-1]['id'] if messages else None}
+                    elif 'runs' in parts and parts[-1] in server._runs:
+                        server.polls += 1
+                        obj = server._run(server._runs[parts[-1]])
+                    else:
+                        self.send_error(404)
+                        return
+                self._send_json(obj)
+
+            def do_POST(self):
+                parts = self.path.split('?')[0].strip('/').split('/')
+                body = self._body()
+                if parts[-2:] == ['chat', 'completions']:
+                    self._chat_completions(json.loads(body))
+                elif parts[-1] == 'files':
+                    self._send_json({'id': server._id('file'), 'object': 'file', 'bytes': len(body),
+                                     'created_at': int(time.time()), 'filename': 'transcript.txt',
+                                     'purpose': 'assistants', 'status': 'processed'})
+                elif parts[-1] == 'assistants':
+                    request = json.loads(body)
+                    self._send_json({'id': server._id('asst'), 'object': 'assistant', 'created_at': int(time.time()),
+                                     'name': request.get('name'), 'model': request['model'],
+                                     'instructions': request.get('instructions'), 'tools': request.get('tools', []),
+                                     'description': None, 'metadata': {}})
+                elif parts[-1] == 'threads':
+                    thread_id = server._id('thread')
+                    with server._lock:
+                        server._threads[thread_id] = []
+                    self._send_json({'id': thread_id, 'object': 'thread', 'created_at': int(time.time()), 'metadata': {}})
+                elif parts[-1] == 'messages':
+                    request = json.loads(body)
+                    thread_id = parts[-2]
+                    with server._lock:
+                        message = server._message(thread_id, request['role'], request['content'])
+                        server._threads[thread_id].append(message)
+                    self._send_json(message)
+                elif parts[-1] == 'runs':
+                    self._create_run(parts[-2], json.loads(body))
+                else:
+                    self.send_error(404)
+
+            def _chat_completions(self, request: dict) -> None:
+                with server._lock:
+                    server.requests += 1
+                    number = server.requests
+                reply = _stub_reply(request['messages'], request['model'])
+                base = {'id': f"chatcmpl-{number}", 'created': int(time.time()), 'model': request['model']}
+                if request.get('stream'):
+                    chunks = ({**base, 'object': 'chat.completion.chunk',
+                               'choices': [{'index': 0, 'delta': {'role': 'assistant', 'content': token},
+                                            'finish_reason': None}]} for token in self._tokens(reply))
+                    done = {**base, 'object': 'chat.completion.chunk',
+                            'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}
+                    self._send_events(itertools.chain(((None, chunk) for chunk in chunks),
+                                                      [(None, done), (None, '[DONE]')]))
+                    return
+                time.sleep(server._duration(reply))
+                self._send_json({**base, 'object': 'chat.completion',
+                                 'choices': [{'index': 0, 'finish_reason': 'stop',
+                                              'message': {'role': 'assistant', 'content': reply}}],
+                                 'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}})
+
+            def _create_run(self, thread_id: str, request: dict) -> None:
+                with server._lock:
+                    server.requests += 1
+                    messages = server._threads[thread_id]
+                    model = request.get('model') or 'assistant'
+                    reply = _stub_reply([{'content': messages[-1]['content'][0]['text']['value']}], model)
+                    run = {'id': server._id('run'), 'object': 'thread.run', 'created_at': int(time.time()),
+                           'thread_id': thread_id, 'assistant_id': request['assistant_id'], 'status': 'in_progress',
+                           'model': model, 'instructions': '', 'tools': [], 'metadata': {},
+                           '_reply': reply, '_done_at': time.time() + server._duration(reply)}
+                    server._runs[run['id']] = run
+                    public = server._run(run)
+                if not request.get('stream'):
+                    self._send_json(public)
+                    return
+
+                def events():
+                    yield 'thread.run.created', public
+                    message_id = server._id('msg')
+                    for token in self._tokens(reply):
+                        yield 'thread.message.delta', {'id': message_id, 'object': 'thread.message.delta',
+                                                       'delta': {'content': [{'index': 0, 'type': 'text',
+                                                                              'text': {'value': token}}]}}
+                    with server._lock:
+                        run['_done_at'] = 0
+                        completed = server._run(run)
+                    yield 'thread.run.completed', completed
+                    yield 'done', '[DONE]'
+
+                self._send_events(events())
+
+        return Handler
+
+    @property
+    def url(self) -> str:
+        """ Base URL of the API, to be passed as base_url to the clients """
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> 'StubChatServer':
+        """ Starts serving in a background thread """
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """ Stops the server """
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
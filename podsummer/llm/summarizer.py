@@ -0,0 +1,135 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+import re, threading, time
+
+from podsummer.llm.base import ChatClient
+from podsummer.llm.prompts import SYSTEM_PROMPT, CHUNK_SUMMARY_PROMPT, REDUCE_SUMMARY_PROMPT
+from podsummer.transcript.transcript import Transcript
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+class TokenCounter:
+    """ Counts tokens with tiktoken, or estimates them from the text length when it is not installed """
+
+    def __init__(self, model: str) -> None:
+        """ Initialises TokenCounter for model """
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding('cl100k_base')
+
+    def __call__(self, text: str) -> int:
+        """ Returns the number of tokens of text """
+        if self.encoding is None:
+            return len(text) // 4 + 1
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+class MapReduceSummarizer:
+    """
+    Summarizes a transcript by splitting its segments into token-budgeted chunks,
+    summarizing the chunks concurrently with a bounded number of requests in flight,
+    and combining the summaries hierarchically until one remains.
+    The bound is shared by all threads summarizing with the same instance.
+    """
+
+    def __init__(self, client: ChatClient, model: str = 'gpt-3.5-turbo', chunk_tokens: int = 3000,
+                 reduce_tokens: int = 3000, max_in_flight: int = 4, **params) -> None:
+        """
+        Initialises MapReduceSummarizer
+        :param client: chat client
+        :param model: name of the LLM
+        :param chunk_tokens: maximum number of transcript tokens per chunk
+        :param reduce_tokens: maximum number of summary tokens combined in one request
+        :param max_in_flight: maximum number of concurrent requests, across all summarize calls
+        :param params: additional parameters of the requests, e.g. temperature
+        """
+        self.client = client
+        self.model = model
+        self.chunk_tokens = chunk_tokens
+        self.reduce_tokens = reduce_tokens
+        self.max_in_flight = max_in_flight
+        self.params = params
+        self.count_tokens = TokenCounter(model)
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+
+    @staticmethod
+    def _lines(transcript: Transcript):
+        """ Lines of the transcript, one per segment prefixed with its start time, or one per sentence of a text transcript """
+        if not transcript.timed:
+            for sentence in re.split(r'(?<=[.!?])\s+', transcript.text):
+                if sentence.strip():
+                    yield sentence.strip()
+            return
+        for start, text in zip(transcript.starts, transcript.iter_texts()):
+            yield f"{start:.0f} {text.strip()}"
+
+    def chunk(self, transcript: Transcript) -> List[str]:
+        """ Splits the lines of the transcript into chunks of at most chunk_tokens tokens """
+        chunks, lines, tokens = [], [], 0
+        for line in self._lines(transcript):
+            line_tokens = self.count_tokens(line) + 1
+            if lines and tokens + line_tokens > self.chunk_tokens:
+                chunks.append('\n'.join(lines))
+                lines, tokens = [], 0
+            lines.append(line)
+            tokens += line_tokens
+        if lines:
+            chunks.append('\n'.join(lines))
+        return chunks
+
+    def _complete(self, prompt: str) -> str:
+        """ Sends one summarization request """
+        messages = [{'role': 'system', 'content': SYSTEM_PROMPT}, {'role': 'user', 'content': prompt}]
+        with self._in_flight:
+            return self.client.complete(messages, model=self.model, **self.params)
+
+    def _group(self, summaries: List[str]) -> List[List[str]]:
+        """ Groups consecutive summaries into batches of at most reduce_tokens tokens, with at least two per batch """
+        groups, group, tokens = [], [], 0
+        for summary in summaries:
+            summary_tokens = self.count_tokens(summary)
+            if len(group) >= 2 and tokens + summary_tokens > self.reduce_tokens:
+                groups.append(group)
+                group, tokens = [], 0
+            group.append(summary)
+            tokens += summary_tokens
+        if len(group) == 1 and groups:
+            groups[-1].append(group[0])
+        elif group:
+            groups.append(group)
+        return groups
+
+    def summarize(self, transcript: Transcript, podcast_title: str, episode_title: str) -> str:
+        """ Summarizes the transcript of the episode """
+        return self.summarize_with_stats(transcript, podcast_title, episode_title)[0]
+
+    def summarize_with_stats(self, transcript: Transcript, podcast_title: str, episode_title: str) -> Tuple[str, dict]:
+        """
+        Summarizes the transcript of the episode
+        :return: summary, and the numbers of chunks, requests and reduce levels and the wall time of the call
+        """
+        start, calls, levels = time.perf_counter(), 0, 0
+        chunks = self.chunk(transcript)
+        if not chunks:
+            return '', {'chunks': 0, 'calls': 0, 'reduce_levels': 0, 'wall_seconds': time.perf_counter() - start}
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            summaries = list(executor.map(self._complete, [CHUNK_SUMMARY_PROMPT(podcast_title, episode_title, i + 1, len(chunks), chunk)
+                                                           for i, chunk in enumerate(chunks)]))
+            calls = len(chunks)
+            # A single chunk summary still goes through the final reduction to get the full summary format
+            while len(summaries) > 1 or levels == 0:
+                groups = self._group(summaries)
+                final = len(groups) == 1
+                summaries = list(executor.map(self._complete, [REDUCE_SUMMARY_PROMPT(podcast_title, episode_title, '\n\n'.join(group), final)
+                                                               for group in groups]))
+                calls, levels = calls + len(groups), levels + 1
+        stats = {'chunks': len(chunks), 'calls': calls, 'reduce_levels': levels,
+                 'wall_seconds': time.perf_counter() - start}
+        return summaries[0], stats
@@ -1,6 +1,5 @@
-from podsummer.media import base
-from podsummer.media import rss
-from podsummer.media import youtube
-from podsummer.media import source_factory
+from podsummer._lazy import lazy_submodules
 
-__all__ = ['base', 'rss', 'youtube', 'source_factory']
\ No newline at end of file
+__all__ = ['base', 'feed_cache', 'downloader', 'title_index', 'rss_stream', 'rss', 'youtube', 'source_factory', 'scheduler']
+
+__getattr__, __dir__ = lazy_submodules(__name__, __all__)
@@ -0,0 +1,158 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+import os, re, threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from podsummer import instrument, utils
+
+PART_SUFFIX = '.part'
+JOURNAL_SUFFIX = '.part.json'
+# Sizes are only comparable on unencoded bodies
+IDENTITY = {'Accept-Encoding': 'identity'}
+
+
+class RangedDownloader:
+    """
+    Downloads files with HTTP Range requests over several pooled connections.
+    Data is written to a `.part` file next to the destination, together with a journal
+    of the completed ranges, so that an interrupted download resumes where it stopped.
+    The `.part` file is renamed to the destination only after its size is verified.
+    """
+
+    def __init__(self, connections: int = 4, part_size: int = 8 * 1024 * 1024,
+                 chunk_size: int = 64 * 1024, timeout: float = 30,
+                 session: Optional[requests.Session] = None) -> None:
+        """
+        Initialises RangedDownloader
+        :param connections: number of concurrent connections
+        :param part_size: size in bytes of each ranged request
+        :param chunk_size: size in bytes of the chunks streamed from each response
+        :param timeout: connect and read timeout in seconds
+        :param session: requests session, created with a pool of `connections` if None
+        """
+        self.connections = max(1, connections)
+        self.part_size = part_size
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.connections, pool_maxsize=self.connections)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+    def _probe(self, url: str) -> tuple:
+        """
+        Probes the server for range support
+        :return: (total size or None if unknown, whether ranged download is possible, validator)
+        """
+        with self.session.get(url, headers={**IDENTITY, 'Range': 'bytes=0-0'}, stream=True,
+                              timeout=self.timeout) as response:
+            response.raise_for_status()
+            validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+            if response.status_code == 206:
+                # The total is '*' when the server does not know the size
+                match = re.match(r'bytes\s+0-0/(\d+|\*)', response.headers.get('Content-Range', ''))
+                total = match.group(1) if match else '*'
+                return (int(total) if total != '*' else None), total != '*', validator
+            length = response.headers.get('Content-Length')
+            # The length of an encoded body is not the size of the decoded file
+            if response.headers.get('Content-Encoding', 'identity') != 'identity':
+                length = None
+            return (int(length) if length else None), False, validator
+
+    def _load_journal(self, journal_path: Path, url: str, size: int, validator: Optional[str]) -> set:
+        """ Returns the completed ranges of a previous attempt, if it matches the current file """
+        if not journal_path.exists():
+            return set()
+        try:
+            journal = utils.load_json(journal_path)
+        except (OSError, ValueError):
+            return set()
+        if journal.get('url') != url or journal.get('size') != size or journal.get('validator') != validator:
+            return set()
+        return {tuple(r) for r in journal.get('done', [])}
+
+    def _fetch_range(self, url: str, part_path: Path, start: int, end: int) -> None:
+        """ Fetches the bytes start..end (inclusive) and writes them at their offset in part_path """
+        headers = {**IDENTITY, 'Range': f'bytes={start}-{end}'}
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise IOError(f"Server ignored range request for bytes {start}-{end}")
+            written = 0
+            with open(part_path, 'r+b') as f:
+                f.seek(start)
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    f.write(chunk)
+                    written += len(chunk)
+        if written != end - start + 1:
+            raise IOError(f"Expected {end - start + 1} bytes for range {start}-{end}, got {written}")
+
+    def _download_ranged(self, url: str, part_path: Path, journal_path: Path,
+                         size: int, validator: Optional[str]) -> int:
+        """ 
+        Downloads the file with concurrent range requests, journaling completed ranges
+        :return: number of bytes fetched, excluding the ranges of a previous attempt
+        """
+        done = self._load_journal(journal_path, url, size, validator)
+        if not done or not part_path.exists():
+            done = set()
+            with open(part_path, 'wb') as f:
+                f.truncate(size)
+        ranges = [(start, min(start + self.part_size, size) - 1) for start in range(0, size, self.part_size)]
+        pending = [r for r in ranges if r not in done]
+        lock = threading.Lock()
+
+        def fetch(byte_range):
+            self._fetch_range(url, part_path, *byte_range)
+            with lock:
+                done.add(byte_range)
+                utils.save_json({'url': url, 'size': size, 'validator': validator,
+                                 'done': sorted(done)}, journal_path)
+
+        with ThreadPoolExecutor(max_workers=self.connections) as executor:
+            # Consume the results to propagate the first failure
+            for _ in executor.map(fetch, pending):
+                pass
+        return sum(end - start + 1 for start, end in pending)
+
+    def _download_stream(self, url: str, part_path: Path) -> int:
+        """ 
+        Downloads the file in a single stream
+        :return: number of bytes fetched
+        """
+        fetched = 0
+        with self.session.get(url, headers=IDENTITY, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            with open(part_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    f.write(chunk)
+                    fetched += len(chunk)
+        return fetched
+
+    def download(self, url: str, path) -> Path:
+        """
+        Downloads url to path
+        :param url: URL of the file
+        :param path: destination path
+        :return: destination path
+        """
+        path = Path(path)
+        part_path = path.with_name(path.name + PART_SUFFIX)
+        journal_path = path.with_name(path.name + JOURNAL_SUFFIX)
+        with instrument.span('download', url=url) as span:
+            size, ranged, validator = self._probe(url)
+            span.set(size=size, ranged=ranged)
+            if ranged and size:
+                span.add_bytes(self._download_ranged(url, part_path, journal_path, size, validator))
+            else:
+                span.add_bytes(self._download_stream(url, part_path))
+            if size is not None and os.path.getsize(part_path) != size:
+                raise IOError(f"Downloaded size {os.path.getsize(part_path)} does not match expected size {size}")
+            os.replace(part_path, path)
+            journal_path.unlink(missing_ok=True)
+        return path
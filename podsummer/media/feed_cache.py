@@ -0,0 +1,173 @@
+from pathlib import Path
+from typing import Optional, Tuple
+import hashlib, pickle, time
+
+import feedparser
+import requests
+
+from podsummer import instrument, utils
+from podsummer.metadata.base import METADATA_KEYS
+
+
+class FeedCache:
+    """ On-disk cache of RSS feeds using conditional GET requests, parsed or kept as received for streaming """
+
+    def __init__(self, cache_dir: Optional[Path] = None, ttl: Optional[float] = None) -> None:
+        """
+        Initialises FeedCache
+        :param cache_dir: directory of the cache, defaults to content/.feeds
+        :param ttl: seconds for which a cached feed is served without touching the network.
+                    If None, every access sends a conditional request.
+        """
+        if cache_dir is None:
+            cache_dir = Path(METADATA_KEYS["CONTENT_DIRECTORY_NAME"]).joinpath(METADATA_KEYS["FEED_CACHE_DIRECTORY_NAME"])
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def __repr__(self):
+        """ Representation of FeedCache Object """
+        return f"""FeedCache[Directory = {self.cache_dir}, TTL = {self.ttl}, Stats = {self.stats}]"""
+
+    def _paths(self, url: str) -> tuple:
+        """ Returns the paths of the parsed feed and its validators for url """
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return self.cache_dir.joinpath(f"{key}.pickle"), self.cache_dir.joinpath(f"{key}.json")
+
+    def _raw_paths(self, url: str) -> tuple:
+        """ Returns the paths of the unparsed feed and its validators for url """
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return self.cache_dir.joinpath(f"{key}.xml"), self.cache_dir.joinpath(f"{key}.xml.json")
+
+    def _load(self, url: str) -> tuple:
+        """ Loads the cached feed and its validators, or (None, None) if not cached """
+        feed_path, meta_path = self._paths(url)
+        if not (feed_path.exists() and meta_path.exists()):
+            return None, None
+        try:
+            with open(feed_path, 'rb') as f:
+                feed = pickle.load(f)
+            return feed, utils.load_json(meta_path)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return None, None
+
+    def _store(self, url: str, feed) -> None:
+        """ Stores the parsed feed and its validators """
+        feed_path, meta_path = self._paths(url)
+        # The parser's exception object is not guaranteed to be picklable
+        feed.pop('bozo_exception', None)
+        tmp_path = utils.temporary_path(feed_path)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(feed, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(feed_path)
+        self._save_meta({"url": url,
+                         "etag": feed.get('etag'),
+                         "modified": feed.get('modified'),
+                         "fetched_at": time.time()}, meta_path)
+
+    @staticmethod
+    def _save_meta(meta: dict, meta_path: Path) -> None:
+        """ Saves the validators atomically, so concurrent readers never see a partial file """
+        tmp_path = utils.temporary_path(meta_path)
+        utils.save_json(meta, tmp_path)
+        tmp_path.replace(meta_path)
+
+    def _touch(self, url: str, meta: dict) -> None:
+        """ Refreshes the fetch time of a cached feed """
+        meta["fetched_at"] = time.time()
+        self._save_meta(meta, self._paths(url)[1])
+
+    def parse(self, url: str):
+        """
+        Returns the parsed feed of url, using the cache when possible
+        :param url: URL of the RSS feed
+        :return: feedparser result
+        """
+        feed, meta = self._load(url)
+        if feed is not None and self.ttl is not None and time.time() - meta["fetched_at"] < self.ttl:
+            self.stats["hits"] += 1
+            instrument.current().set(cache='hit')
+            return feed
+        if feed is not None:
+            response = feedparser.parse(url, etag=meta.get("etag"), modified=meta.get("modified"))
+        else:
+            response = feedparser.parse(url)
+        if feed is not None and response.get('status') == 304:
+            self.stats["not_modified"] += 1
+            instrument.current().set(cache='not_modified')
+            self._touch(url, meta)
+            return feed
+        self.stats["misses"] += 1
+        instrument.current().set(cache='miss')
+        if response.get('status', 200) < 400 and not (response.bozo and not response.entries):
+            self._store(url, response)
+        return response
+
+    def fetch(self, url: str, timeout: float = 30, chunk_size: int = 64 * 1024,
+              session: Optional[requests.Session] = None) -> Path:
+        """
+        Returns the path of the unparsed feed of url, for parsers that stream it from disk.
+        The feed is downloaded with a conditional GET and kept as it was received.
+        :param url: URL of the RSS feed
+        :param timeout: connect and read timeout in seconds
+        :param chunk_size: size in bytes of the chunks written to disk
+        :param session: requests session sending the request, a one-off request is sent if None
+        :return: path of the cached feed
+        """
+        return self.refresh(url, timeout, chunk_size, session)[0]
+
+    def refresh(self, url: str, timeout: float = 30, chunk_size: int = 64 * 1024,
+                session: Optional[requests.Session] = None) -> Tuple[Path, bool]:
+        """
+        Brings the unparsed feed of url up to date like fetch, telling whether it was downloaded again
+        :return: path of the cached feed, and whether it changed, i.e. was not cached, not served
+                 within the ttl or answered with 304
+        """
+        raw_path, meta_path = self._raw_paths(url)
+        meta = None
+        if raw_path.exists() and meta_path.exists():
+            try:
+                meta = utils.load_json(meta_path)
+            except (OSError, ValueError):
+                meta = None
+        if meta is not None and self.ttl is not None and time.time() - meta["fetched_at"] < self.ttl:
+            self.stats["hits"] += 1
+            instrument.current().set(cache='hit')
+            return raw_path, False
+        headers = {}
+        if meta is not None and meta.get("etag"):
+            headers['If-None-Match'] = meta["etag"]
+        if meta is not None and meta.get("modified"):
+            headers['If-Modified-Since'] = meta["modified"]
+        with (session or requests).get(url, headers=headers, stream=True, timeout=timeout) as response:
+            if meta is not None and response.status_code == 304:
+                self.stats["not_modified"] += 1
+                instrument.current().set(cache='not_modified')
+                meta["fetched_at"] = time.time()
+                self._save_meta(meta, meta_path)
+                return raw_path, False
+            response.raise_for_status()
+            tmp_path = utils.temporary_path(raw_path)
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+            tmp_path.replace(raw_path)
+        self.stats["misses"] += 1
+        instrument.current().set(cache='miss')
+        self._save_meta({"url": url,
+                         "etag": response.headers.get('ETag'),
+                         "modified": response.headers.get('Last-Modified'),
+                         "fetched_at": time.time()}, meta_path)
+        return raw_path, True
+
+    def invalidate(self, url: str) -> None:
+        """ Removes url from the cache """
+        for path in (*self._paths(url), *self._raw_paths(url)):
+            path.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        """ Removes all cached feeds """
+        for path in self.cache_dir.iterdir():
+            if path.suffix in ('.pickle', '.xml', '.json', '.tmp'):
+                path.unlink(missing_ok=True)
@@ -1,27 +1,44 @@
 from pathlib import Path
 from typing import Optional
-import json
+import heapq, json
 
-import requests, feedparser
+import feedparser
 from fuzzywuzzy import fuzz
 
+from podsummer import instrument
 from podsummer.media.base import MediaSource
-from podsummer.metadata.rss import PodcastMetadataManager
+from podsummer.media.feed_cache import FeedCache
+from podsummer.media.downloader import RangedDownloader
+from podsummer.media.title_index import TitleIndex
+from podsummer.media.rss_stream import StreamingFeed
+from podsummer.metadata.rss import PodcastMetadataManager, StreamedPodcastMetadataManager
 from podsummer.metadata.base import METADATA_KEYS
+from podsummer.store.artifacts import ArtifactStore
 
 
 class RSSPodcast(MediaSource):
     
-    def __init__(self, url : str, episode_title: Optional[str] = None) -> None:
+    def __init__(self, url : str, episode_title: Optional[str] = None,
+                 feed_cache: Optional[FeedCache] = None, streaming: bool = False) -> None:
         """ 
         Initialises RSSPodcast 
         :param url: URL of the RSS feed
         :param episode_title: Title of the episode
+        :param feed_cache: FeedCache used to avoid re-downloading unchanged feeds, in both modes
+        :param streaming: if True, the feed is parsed incrementally into compact records
+                          and never held in memory as a whole
         """
         self.url = url
-        self._feed = feedparser.parse(self.url)
-        self.channel_name, self.title = self._feed.feed.title, None
-        self._episode = None
+        self.feed_cache = feed_cache
+        self.streaming = streaming
+        self._episode, self._title_index = None, None
+        if streaming:
+            self._feed, self._channel = None, None
+            self.channel_name, self.title = None, None
+        else:
+            with instrument.span('feed_fetch', url=url):
+                self._feed = feed_cache.parse(self.url) if feed_cache is not None else feedparser.parse(self.url)
+            self.channel_name, self.title = self._feed.feed.title, None
         if episode_title:
             self._episode = self.find_entry_from_title(episode_title)
             self.fetch_metadata()
@@ -30,39 +47,102 @@ class RSSPodcast(MediaSource):
         """ Representation of Podcast Object """
         return f"""Podcast[Podcast = {self.channel_name}, Episode = {self.title}]"""
 
+    def iter_episodes(self):
+        """ Iterates over compact episode records of a streamed feed """
+        source = self.url
+        if self.feed_cache is not None:
+            # The feed is streamed from the cached file, only downloaded again when it changed
+            with instrument.span('feed_fetch', url=self.url):
+                source = str(self.feed_cache.fetch(self.url))
+        stream = StreamingFeed(source)
+        for record in stream:
+            if self._channel is None:
+                self._channel = stream.channel
+                self.channel_name = stream.channel.title
+            yield record
+
     def list_episodes(self):
         """ Lists all episodes in the podcast """
-        for entry in self._feed.entries:
+        entries = self.iter_episodes() if self.streaming else self._feed.entries
+        for entry in entries:
             print("Title:", entry.title)
 
+    def find_entries_from_title(self, title : str, top_k: int = 5,
+                                similarity_threshold: float = 80) -> list:
+        """ 
+        Returns the entries most similar to title, with their similarity scores
+        :param title: title of the episode
+        :param top_k: maximum number of entries returned
+        :param similarity_threshold: minimum similarity score (0-100)
+        :return: list of (entry, score) sorted by descending score
+        """
+        if self.streaming:
+            # Keep only the top_k records seen so far, so memory stays bounded
+            best = []
+            for position, record in enumerate(self.iter_episodes()):
+                score = fuzz.ratio(title, record.title or '')
+                if score >= similarity_threshold:
+                    heapq.heappush(best, (score, -position, record))
+                    if len(best) > top_k:
+                        heapq.heappop(best)
+            return [(record, score) for score, _, record in sorted(best, reverse=True)]
+        if self._title_index is None:
+            self._title_index = TitleIndex.for_titles([entry.title for entry in self._feed.entries])
+        return [(self._feed.entries[i], score)
+                for i, score in self._title_index.search(title, top_k=top_k, similarity_threshold=similarity_threshold)]
+
     def find_entry_from_title(self, title : str, similarity_threshold: float = 80) -> json:
         """ 
         Returns the entry with the highest similarity score
         over the similarity threshold.
         """
-        title_list = [entry.title for entry in self._feed.entries]
-        similarity_scores = []
-        for t in title_list:
-            similarity_scores.append(fuzz.ratio(title, t))
-        max_score = max(similarity_scores)
-        max_index = similarity_scores.index(max_score)
-        return self._feed.entries[max_index]
+        if self.streaming:
+            # Stop reading the feed as soon as the exact title is found
+            best, best_score = None, 0
+            for record in self.iter_episodes():
+                score = fuzz.ratio(title, record.title or '')
+                if score == 100:
+                    return record
+                if score >= similarity_threshold and (best is None or score > best_score):
+                    best, best_score = record, score
+            matches = [(best, best_score)] if best is not None else []
+        else:
+            matches = self.find_entries_from_title(title, top_k=1, similarity_threshold=similarity_threshold)
+        if not matches:
+            raise ValueError(f"No episode with title similar to '{title}' found")
+        return matches[0][0]
 
     def fetch_metadata(self):
         """ Fetches podcast metadata from RSS feed """
         if self._episode is None:
             raise ValueError("No episode selected")
-        self.store_paths, metadata = PodcastMetadataManager(self._feed.feed, self._episode).fetch_metadata()
+        if self.streaming:
+            manager = StreamedPodcastMetadataManager(self._channel, self._episode)
+        else:
+            manager = PodcastMetadataManager(self._feed.feed, self._episode)
+        self.store_paths, metadata = manager.fetch_metadata()
         for key, value in metadata.items():
             setattr(self, key, value)
     
-    def download_audio(self):
-        """ Downloads audio from the source """
-        with requests.get(getattr(self,METADATA_KEYS["AUDIO_STREAM"]), stream=True) as response:
-            response.raise_for_status()
-            with open(self.store_paths[METADATA_KEYS["AUDIO_FILENAME"].split('.')[0]], 'wb') as f:   
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+    def download_audio(self, downloader: Optional[RangedDownloader] = None,
+                       store: Optional[ArtifactStore] = None):
+        """ 
+        Downloads audio from the source
+        :param downloader: RangedDownloader to use, a default one is created if None
+        :param store: ArtifactStore used to skip audio that was already downloaded
+        """
+        url = getattr(self, METADATA_KEYS["AUDIO_STREAM"])
+        audio_path = self.store_paths[METADATA_KEYS["AUDIO_FILENAME"].split('.')[0]]
+        if store is not None:
+            stored_audio = store.audio_for_source(url)
+            if stored_audio is not None:
+                store.materialize(stored_audio, audio_path)
+                return
+        if downloader is None:
+            downloader = RangedDownloader()
+        downloader.download(url, audio_path)
+        if store is not None:
+            store.put_audio(audio_path, source=url)
     
     def download_transcript(self):
         """ 
@@ -0,0 +1,127 @@
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple, Optional, Tuple, Union
+import xml.etree.ElementTree as ET
+
+import requests
+
+ITUNES_NS = '{http://www.itunes.com/dtds/podcast-1.0.dtd}'
+
+
+class ChannelRecord(NamedTuple):
+    """ Compact record of an RSS channel """
+    title: Optional[str]
+    image_url: Optional[str]
+    authors: Tuple[str, ...]
+
+
+class EpisodeRecord(NamedTuple):
+    """ Compact record of an RSS item """
+    title: Optional[str]
+    guid: Optional[str]
+    audio_url: Optional[str]
+    published: Optional[str]
+    duration: Optional[str]
+
+
+@contextmanager
+def _open_chunks(source: Union[str, bytes], chunk_size: int, timeout: float) -> Iterator[Iterator[bytes]]:
+    """ Opens a URL, a local path or the content of a feed as an iterator of byte chunks """
+    if isinstance(source, bytes):
+        yield (source[i:i + chunk_size] for i in range(0, len(source), chunk_size))
+    elif source.startswith(('http://', 'https://')):
+        with requests.get(source, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            yield response.iter_content(chunk_size=chunk_size)
+    else:
+        with open(source, 'rb') as f:
+            yield iter(lambda: f.read(chunk_size), b'')
+
+
+class StreamingFeed:
+    """
+    Parses an RSS feed incrementally, yielding compact EpisodeRecords.
+    Items are discarded from the parse tree as soon as they are converted, so memory
+    stays bounded regardless of the feed size, and iteration can stop early without
+    downloading the rest of the feed.
+    """
+
+    def __init__(self, source: Union[str, bytes], chunk_size: int = 64 * 1024, timeout: float = 30) -> None:
+        """
+        Initialises StreamingFeed
+        :param source: URL or local path of the RSS feed, or its content
+        :param chunk_size: size in bytes of the chunks fed to the parser
+        :param timeout: connect and read timeout in seconds
+        """
+        self.source = source
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.channel = None
+
+    def __repr__(self):
+        """ Representation of StreamingFeed Object """
+        source = f"{len(self.source)} bytes" if isinstance(self.source, bytes) else self.source
+        return f"""StreamingFeed[Source = {source}]"""
+
+    def __iter__(self) -> Iterator[EpisodeRecord]:
+        """ Iterates over the episodes of the feed, in document order """
+        parser = ET.XMLPullParser(events=('start', 'end'))
+        channel, stack = None, []
+        channel_fields = {'title': None, 'image_url': None, 'authors': []}
+        with _open_chunks(self.source, self.chunk_size, self.timeout) as chunks:
+            for chunk in chunks:
+                parser.feed(chunk)
+                for event, elem in parser.read_events():
+                    if event == 'start':
+                        stack.append(elem)
+                        if elem.tag == 'channel':
+                            channel = elem
+                        elif elem.tag == 'item' and self.channel is None:
+                            self.channel = self._channel_record(channel_fields)
+                        continue
+                    stack.pop()
+                    parent = stack[-1] if stack else None
+                    if elem.tag == 'item':
+                        yield self._episode_record(elem)
+                        elem.clear()
+                        if channel is not None:
+                            channel.remove(elem)
+                    elif parent is channel and channel is not None:
+                        self._update_channel_fields(channel_fields, elem)
+                        if elem.tag != 'image':
+                            elem.clear()
+        parser.close()
+        if self.channel is None:
+            self.channel = self._channel_record(channel_fields)
+
+    @staticmethod
+    def _update_channel_fields(fields: dict, elem: ET.Element) -> None:
+        """ Updates the channel fields from a direct child of the channel element """
+        if elem.tag == 'title':
+            fields['title'] = (elem.text or '').strip()
+        elif elem.tag == 'image' and fields['image_url'] is None:
+            fields['image_url'] = elem.findtext('url')
+        elif elem.tag == f'{ITUNES_NS}image':
+            fields['image_url'] = elem.get('href') or fields['image_url']
+        elif elem.tag in (f'{ITUNES_NS}author', 'author') and elem.text:
+            fields['authors'].append(elem.text.strip())
+
+    @staticmethod
+    def _channel_record(fields: dict) -> ChannelRecord:
+        """ Builds a ChannelRecord from the channel fields """
+        return ChannelRecord(fields['title'], fields['image_url'], tuple(dict.fromkeys(fields['authors'])))
+
+    @staticmethod
+    def _episode_record(item: ET.Element) -> EpisodeRecord:
+        """ Builds an EpisodeRecord from an item element """
+        audio_url = None
+        for enclosure in item.iter('enclosure'):
+            if audio_url is None or enclosure.get('type', '').startswith('audio/'):
+                audio_url = enclosure.get('url')
+            if enclosure.get('type') == 'audio/mpeg':
+                break
+        title = item.findtext('title')
+        return EpisodeRecord(title=title.strip() if title else title,
+                             guid=item.findtext('guid'),
+                             audio_url=audio_url,
+                             published=item.findtext('pubDate'),
+                             duration=item.findtext(f'{ITUNES_NS}duration'))
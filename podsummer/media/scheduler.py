@@ -0,0 +1,310 @@
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from statistics import median
+from typing import Callable, Dict, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+import queue, random, threading, time
+
+import requests
+
+from podsummer import instrument
+from podsummer.media.feed_cache import FeedCache
+from podsummer.media.rss_stream import ChannelRecord, EpisodeRecord, StreamingFeed
+
+
+class NewEpisode(NamedTuple):
+    """ Episode found in a feed since the previous poll """
+    feed_url: str
+    channel: Optional[ChannelRecord]
+    episode: EpisodeRecord
+
+
+class SystemClock:
+    """ Wall clock of the scheduler """
+
+    def time(self) -> float:
+        """ Current time in seconds since the epoch """
+        return time.time()
+
+    def sleep(self, seconds: float, wake: threading.Event) -> None:
+        """ Sleeps for seconds, waking up early if wake is set """
+        wake.wait(max(seconds, 0))
+
+
+class ManualClock:
+    """ Clock that only moves when advanced, to drive the scheduler step by step """
+
+    def __init__(self, start: float = 0.0) -> None:
+        """ Initialises ManualClock at start seconds """
+        self.now = start
+
+    def time(self) -> float:
+        """ Current time of the clock """
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        """ Moves the clock forward by seconds """
+        self.now += seconds
+
+    def sleep(self, seconds: float, wake: threading.Event) -> None:
+        """ Advances the clock by seconds instead of waiting """
+        self.advance(max(seconds, 0))
+
+
+class Subscription:
+    """ Polling state of a feed """
+
+    def __init__(self, url: str, next_poll: float) -> None:
+        """
+        Initialises Subscription
+        :param url: URL of the RSS feed
+        :param next_poll: time of the first poll
+        """
+        self.url = url
+        self.host = urlsplit(url).netloc
+        self.next_poll = next_poll
+        self.interval = None
+        self.channel = None
+        self.seen = set()
+        self.published = []
+        self.polls, self.not_modified, self.failures = 0, 0, 0
+        self.error = None
+
+    def __repr__(self):
+        """ Representation of Subscription Object """
+        return f"""Subscription[URL = {self.url}, Interval = {self.interval}, Episodes = {len(self.seen)}]"""
+
+    @staticmethod
+    def key(record: EpisodeRecord) -> Optional[str]:
+        """ Identity of an episode: its guid, or its enclosure or title if the feed has no guids """
+        return record.guid or record.audio_url or record.title
+
+    @property
+    def cadence(self) -> Optional[float]:
+        """ Median seconds between the most recent publications, or None if unknown """
+        gaps = [later - earlier for earlier, later in zip(self.published, self.published[1:]) if later > earlier]
+        return median(gaps) if gaps else None
+
+
+def _timestamp(published: Optional[str]) -> Optional[float]:
+    """ Timestamp of an RFC 822 publication date, or None if it cannot be parsed """
+    if not published:
+        return None
+    try:
+        return parsedate_to_datetime(published).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class FeedScheduler:
+    """
+    Polls many RSS feeds concurrently and emits the episodes that appear in them.
+    Every feed is polled at a fraction of its publishing cadence, estimated from the
+    publication dates of its recent episodes, and backs off further the longer it stays dormant,
+    so daily shows are picked up quickly without spending requests on inactive ones.
+    Feeds are fetched through a FeedCache, so requests are conditional and the validators
+    outlive the process. Requests are spaced per host, and new episodes are detected by guid.
+    """
+
+    def __init__(self, on_episode: Optional[Callable[[NewEpisode], None]] = None,
+                 episode_queue: Optional[queue.Queue] = None, max_workers: int = 8,
+                 min_interval: float = 15 * 60, max_interval: float = 7 * 24 * 3600,
+                 cadence_fraction: float = 0.05, host_interval: float = 1.0, history: int = 10,
+                 jitter: float = 0.1, timeout: float = 30, clock=None,
+                 session: Optional[requests.Session] = None, seed: Optional[int] = None,
+                 feed_cache: Optional[FeedCache] = None) -> None:
+        """
+        Initialises FeedScheduler
+        :param on_episode: called with every NewEpisode, from the scheduler thread, once it is on the queue.
+                           Exceptions it raises are recorded in stats and do not stop the other episodes
+        :param episode_queue: queue receiving every NewEpisode
+        :param max_workers: number of feeds fetched concurrently
+        :param min_interval: minimum seconds between polls of a feed
+        :param max_interval: maximum seconds between polls of a feed
+        :param cadence_fraction: fraction of the publishing cadence, or of the time since the
+                                 last publication if longer, waited between polls
+        :param host_interval: minimum seconds between requests to the same host
+        :param history: number of recent publications used to estimate the cadence
+        :param jitter: random fraction by which intervals are shortened, so feeds spread out
+        :param timeout: connect and read timeout in seconds
+        :param clock: object with time() and sleep(seconds, wake_event), defaults to the system clock
+        :param session: requests session, a new one is created if None
+        :param seed: seed of the jitter
+        :param feed_cache: FeedCache keeping the feeds and their validators, one in the default directory
+                           is created if None
+        """
+        self.on_episode = on_episode
+        self.episode_queue = episode_queue
+        self.max_workers = max_workers
+        self.min_interval, self.max_interval = min_interval, max_interval
+        self.cadence_fraction = cadence_fraction
+        self.host_interval = host_interval
+        self.history = history
+        self.jitter = jitter
+        self.timeout = timeout
+        self.clock = clock if clock is not None else SystemClock()
+        self.session = session if session is not None else requests.Session()
+        self.feed_cache = feed_cache if feed_cache is not None else FeedCache()
+        self.subscriptions: Dict[str, Subscription] = {}
+        self._host_next = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self.stats = {"polls": 0, "not_modified": 0, "failures": 0, "episodes": 0, "callback_errors": 0}
+        self.callback_error = None
+
+    def __repr__(self):
+        """ Representation of FeedScheduler Object """
+        return f"""FeedScheduler[Feeds = {len(self.subscriptions)}, Stats = {self.stats}]"""
+
+    def subscribe(self, url: str) -> Subscription:
+        """ Starts polling url, immediately. The episodes found on the first poll are not emitted """
+        with self._lock:
+            if url not in self.subscriptions:
+                self.subscriptions[url] = Subscription(url, self.clock.time())
+                # Polls the new feed now if the scheduler is sleeping
+                self._wake.set()
+            return self.subscriptions[url]
+
+    def unsubscribe(self, url: str) -> None:
+        """ Stops polling url """
+        with self._lock:
+            self.subscriptions.pop(url, None)
+
+    def _interval(self, subscription: Subscription, now: float) -> float:
+        """ Seconds until the next poll of a feed """
+        if subscription.failures:
+            base = self.min_interval * 2 ** subscription.failures
+        else:
+            cadence = subscription.cadence
+            since_last = now - subscription.published[-1] if subscription.published else None
+            candidates = [value for value in (cadence, since_last) if value is not None]
+            base = self.cadence_fraction * max(candidates) if candidates else self.min_interval
+        interval = min(max(base, self.min_interval), self.max_interval)
+        return interval * (1 - self._random.uniform(0, self.jitter))
+
+    def _due(self, now: float) -> List[Subscription]:
+        """ Returns the feeds to poll now, postponing those whose host was requested too recently """
+        due = []
+        with self._lock:
+            for subscription in sorted(self.subscriptions.values(), key=lambda s: s.next_poll):
+                if subscription.next_poll > now:
+                    break
+                host_next = self._host_next.get(subscription.host, now)
+                if host_next > now:
+                    subscription.next_poll = host_next
+                else:
+                    due.append(subscription)
+                    self._host_next[subscription.host] = now + self.host_interval
+        return due
+
+    def _fetch(self, subscription: Subscription) -> Optional[Path]:
+        """
+        Fetches a feed through the feed cache, with a conditional request
+        :return: path of the cached feed, or None if it is unchanged since the previous poll
+        """
+        with instrument.span('feed_fetch', url=subscription.url) as span:
+            path, changed = self.feed_cache.refresh(subscription.url, self.timeout, session=self.session)
+            # The first poll reads the feed even if it is unchanged since a previous run, to know its episodes
+            if not changed and subscription.polls:
+                return None
+            span.add_bytes(path.stat().st_size)
+            return path
+
+    def _update(self, subscription: Subscription, path: Optional[Path], now: float) -> List[NewEpisode]:
+        """ Updates the state of a feed from a fetch, returning its new episodes oldest first """
+        subscription.polls += 1
+        subscription.failures, subscription.error = 0, None
+        if path is None:
+            subscription.not_modified += 1
+            self.stats["not_modified"] += 1
+            return []
+        feed = StreamingFeed(str(path))
+        records = list(feed)
+        subscription.channel = feed.channel
+        first_poll = subscription.polls == 1
+        new = [record for record in records if Subscription.key(record) not in subscription.seen]
+        subscription.seen.update(Subscription.key(record) for record in new)
+        published = sorted(filter(None, (_timestamp(record.published) for record in records)))
+        if published:
+            subscription.published = published[-self.history:]
+        elif new and not first_poll:
+            # Without publication dates, the cadence is the one at which new episodes are seen
+            subscription.published = (subscription.published + [now])[-self.history:]
+        if first_poll:
+            return []
+        # Feeds list the newest episodes first
+        new.sort(key=lambda record: _timestamp(record.published) or 0)
+        return [NewEpisode(subscription.url, subscription.channel, record) for record in new]
+
+    def poll(self) -> List[NewEpisode]:
+        """
+        Polls the feeds that are due, concurrently, and emits their new episodes
+        :return: new episodes found
+        """
+        now = self.clock.time()
+        due = self._due(now)
+        if not due:
+            return []
+        found = []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(due))) as executor:
+            futures = [(subscription, executor.submit(self._fetch, subscription)) for subscription in due]
+            for subscription, future in futures:
+                self.stats["polls"] += 1
+                try:
+                    episodes = self._update(subscription, future.result(), now)
+                except Exception as e:
+                    subscription.failures += 1
+                    subscription.error = e
+                    self.stats["failures"] += 1
+                    episodes = []
+                subscription.interval = self._interval(subscription, now)
+                subscription.next_poll = now + subscription.interval
+                found.extend(episodes)
+        self.stats["episodes"] += len(found)
+        for episode in found:
+            if self.episode_queue is not None:
+                self.episode_queue.put(episode)
+            if self.on_episode is not None:
+                try:
+                    self.on_episode(episode)
+                except Exception as e:
+                    self.stats["callback_errors"] += 1
+                    self.callback_error = e
+        return found
+
+    def next_poll(self) -> Optional[float]:
+        """ Time of the next poll, or None if there are no subscriptions """
+        with self._lock:
+            return min((s.next_poll for s in self.subscriptions.values()), default=None)
+
+    def run(self, max_wait: float = 60.0) -> None:
+        """
+        Polls the feeds as they become due, until stop is called
+        :param max_wait: maximum seconds between checks, so new subscriptions are picked up
+        """
+        while not self._stop.is_set():
+            self._wake.clear()
+            self.poll()
+            next_poll = self.next_poll()
+            wait = max_wait if next_poll is None else min(next_poll - self.clock.time(), max_wait)
+            self.clock.sleep(wait, self._wake)
+
+    def start(self) -> 'FeedScheduler':
+        """ Runs the scheduler in a background thread """
+        self._stop.clear()
+        self._wake.clear()
+        self._thread = threading.Thread(target=self.run, name="feed-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """ Stops the background thread """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -2,15 +2,18 @@ from typing import Optional
 
 from podsummer.media.base import MediaSource
 from podsummer.media.rss import RSSPodcast
+from podsummer.media.feed_cache import FeedCache
 from podsummer.media.youtube import YouTubeVideo, YouTubePlaylist
 
 class SourceFactory:
     @staticmethod
-    def create_source(url: str, episode_title: Optional[str] = None) -> MediaSource:
+    def create_source(url: str, episode_title: Optional[str] = None,
+                      feed_cache: Optional[FeedCache] = None) -> MediaSource:
         """ 
         Creates source from url and optional episode title
         :param url: url of the source
         :param episode_title: title of the episode if url is rss
+        :param feed_cache: feed cache used if url is rss
         :return: MediaSource object (RSSPodcast, YouTubeVideo, YouTubePlaylist)
         """
         url_type = SourceFactory.identify_url_type(url)
@@ -19,7 +22,7 @@ class SourceFactory:
         elif url_type == "youtube_playlist":
             return YouTubePlaylist(url)
         else:
-            return RSSPodcast(url, episode_title)
+            return RSSPodcast(url, episode_title, feed_cache=feed_cache)
 
     @staticmethod   
     def identify_url_type(url: str) -> str:
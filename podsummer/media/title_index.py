@@ -0,0 +1,109 @@
+from collections import Counter, OrderedDict
+from typing import List, Tuple
+import heapq
+
+from fuzzywuzzy import fuzz
+import numpy as np
+
+
+class TitleIndex:
+    """
+    Index of episode titles for fuzzy lookups that agree exactly with a linear scan of fuzz.ratio.
+    The titles are stored as per-character count columns, from which the number of characters
+    a title shares with the query, and so an upper bound on its ratio, is computed for all titles
+    at once. Titles are then scored exactly in order of decreasing bound, stopping as soon as
+    the bound falls below the threshold or below the scores already found.
+    """
+
+    _cache = OrderedDict()
+    _cache_size = 64
+
+    def __init__(self, titles: List[str], query_cache_size: int = 1024) -> None:
+        """
+        Initialises TitleIndex
+        :param titles: titles to index
+        :param query_cache_size: number of query results that are memoised
+        """
+        self.titles = list(titles)
+        self.query_cache_size = query_cache_size
+        self._queries = OrderedDict()
+        self._lengths = np.array([len(title) for title in self.titles], dtype=np.int64)
+        self._counts = {}
+        for i, title in enumerate(self.titles):
+            for char, count in Counter(title).items():
+                column = self._counts.get(char)
+                if column is None:
+                    column = self._counts[char] = np.zeros(len(self.titles), dtype=np.int32)
+                column[i] = count
+
+    @classmethod
+    def for_titles(cls, titles: List[str], **kwargs) -> 'TitleIndex':
+        """ Returns a cached index for titles, building it if necessary """
+        key = (tuple(titles), tuple(sorted(kwargs.items())))
+        index = cls._cache.get(key)
+        if index is None:
+            index = cls(titles, **kwargs)
+            cls._cache[key] = index
+            if len(cls._cache) > cls._cache_size:
+                cls._cache.popitem(last=False)
+        else:
+            cls._cache.move_to_end(key)
+        return index
+
+    def __len__(self):
+        """ Number of indexed titles """
+        return len(self.titles)
+
+    def _bounds(self, query: str) -> np.ndarray:
+        """
+        Returns an upper bound on the fuzzy ratio of query with every title, rounded like fuzz.ratio.
+        The characters matched by the ratio are pairs of equal characters, so there are at most
+        as many as the characters the two strings have in common, counted with multiplicity
+        """
+        shared = np.zeros(len(self.titles), dtype=np.int64)
+        for char, count in Counter(query).items():
+            column = self._counts.get(char)
+            if column is not None:
+                shared += np.minimum(column, count)
+        # Same arithmetic as fuzz.ratio, 100 * (2 * matches / total length), so equal counts give equal scores
+        total = self._lengths + len(query)
+        bounds = np.round(100 * (2.0 * shared / np.maximum(1, total)))
+        # fuzz.ratio scores equal strings 100, even when both are empty
+        bounds[total == 0] = 100
+        return bounds
+
+    def search(self, query: str, top_k: int = 5, similarity_threshold: float = 0) -> List[Tuple[int, int]]:
+        """
+        Returns the indices and scores of the titles most similar to query
+        :param query: title to look up
+        :param top_k: maximum number of matches
+        :param similarity_threshold: minimum fuzzy ratio (0-100) of a match
+        :return: list of (title index, score) sorted by descending score, then by index
+        """
+        key = (query, top_k, similarity_threshold)
+        if key in self._queries:
+            self._queries.move_to_end(key)
+            return self._queries[key]
+        if top_k < 1:
+            return []
+        bounds = self._bounds(query)
+        candidates = np.flatnonzero(bounds >= similarity_threshold)
+        # Highest bound first, ties in index order
+        candidates = candidates[np.lexsort((candidates, -bounds[candidates]))]
+        # Min-heap of the best (score, -index) found so far, its root is the worst of them
+        best = []
+        for i in candidates.tolist():
+            if len(best) == top_k and bounds[i] < best[0][0]:
+                break
+            score = fuzz.ratio(query, self.titles[i])
+            if score < similarity_threshold:
+                continue
+            if len(best) < top_k:
+                heapq.heappush(best, (score, -i))
+            elif (score, -i) > best[0]:
+                heapq.heapreplace(best, (score, -i))
+        matches = [(-negative, score) for score, negative in sorted(best, reverse=True)]
+        self._queries[key] = matches
+        if len(self._queries) > self.query_cache_size:
+            self._queries.popitem(last=False)
+        return matches
@@ -1,8 +1,15 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, NamedTuple, Optional
+import os, time
+
 import pytube
 
+from podsummer import instrument, utils
 from podsummer.media.base import MediaSource
 from podsummer.metadata.base import METADATA_KEYS
 from podsummer.metadata.youtube import YouTubeVideoMetadataManager
+from podsummer.store.artifacts import ArtifactStore
 
 class YouTubeVideo(MediaSource):
     """ YouTube video source class """
@@ -13,12 +20,13 @@ class YouTubeVideo(MediaSource):
         """
         self.url = url
         self._feed = pytube.YouTube(self.url)
+        self.video_id = self._feed.video_id
         self.streams = self._feed.streams
         self.fetch_metadata()
 
     def __repr__(self):
         """ Representation of YouTubeVideo Object """
-        return f"""YouTubeVideo[Channel = {self.channel_name}, Title = {self.title}]"""
+        return f"""YouTubeVideo[Channel = {self.channel_name}, Title = {self.title}, ID = {self.video_id}]"""
 
     def fetch_metadata(self) -> None:
         """ Fetches YouTube video metadata """
@@ -26,15 +34,30 @@ class YouTubeVideo(MediaSource):
         for key, value in metadata.items():
             setattr(self, key, value)
     
-    def download_audio(self):
-        """ Downloads the audio of the YouTube video """
+    def download_audio(self, store: Optional[ArtifactStore] = None):
+        """ 
+        Downloads the audio of the YouTube video
+        :param store: ArtifactStore used to skip audio that was already downloaded
+        """
+        audio_path = self.store_paths[METADATA_KEYS["AUDIO_FILENAME"].split('.')[0]]
+        if store is not None:
+            stored_audio = store.audio_for_source(self.url)
+            if stored_audio is not None:
+                store.materialize(stored_audio, audio_path)
+                return
         stream = self.streams.filter(only_audio=True).order_by('abr').desc()
         try:
             stream = stream.filter(subtype='mp4').first()
         except:
             stream = stream.first()
-        stream.download(output_path=self.store_paths[METADATA_KEYS["AUDIO_FILENAME"].split('.')[0]].parent,
-                        filename=METADATA_KEYS["AUDIO_FILENAME"])
+        with instrument.span('download', url=self.url) as span:
+            # Downloaded next to the audio and renamed, as audio_path may be linked to the store
+            tmp_path = utils.temporary_path(audio_path)
+            stream.download(output_path=tmp_path.parent, filename=tmp_path.name)
+            os.replace(tmp_path, audio_path)
+            span.add_bytes(audio_path.stat().st_size)
+        if store is not None:
+            store.put_audio(audio_path, source=self.url)
         
     def download_transcript(self):
         """ Downloads transcript of the YouTube video """
@@ -50,35 +73,138 @@ class YouTubeVideo(MediaSource):
             return None
         
 
+class PlaylistProgress(NamedTuple):
+    """ Progress of a YouTubePlaylist stage """
+    stage: str
+    completed: int
+    failed: int
+    total: int
+    elapsed: float
+
+    @property
+    def throughput(self) -> float:
+        """ Items processed per second """
+        return (self.completed + self.failed) / self.elapsed if self.elapsed > 0 else 0.0
+
+
 class YouTubePlaylist(MediaSource):
     """ YouTube playlist source class """
 
-    def __init__(self, url : str) -> None:
+    def __init__(self, url : str, max_workers: int = 8, lazy: bool = False,
+                 progress_callback: Optional[Callable[[PlaylistProgress], None]] = None) -> None:
         """ 
         Initialises YouTubePlaylist
         :param url: YouTube playlist URL
+        :param max_workers: maximum number of videos resolved or downloaded concurrently
+        :param lazy: if True, videos are resolved as the playlist is iterated
+        :param progress_callback: called with a PlaylistProgress after every processed video
         """
         self.url = url
+        self.max_workers = max_workers
+        self.progress_callback = progress_callback
         self._feed = pytube.Playlist(self.url)
         self.title = self._feed.title
-        self.fetch_metadata()
+        self.youtube_videos, self.errors = [], {}
+        self._resolved = False
+        if not lazy:
+            self.fetch_metadata()
 
     def __repr__(self):
         """ Representation of YouTubePlaylist Object """
         return f"""YouTubePlaylist[Playlist = {self.title}]"""
 
+    def __iter__(self) -> Iterator[YouTubeVideo]:
+        """ Iterates over the videos of the playlist, resolving them if necessary """
+        if self._resolved:
+            return iter(self.youtube_videos)
+        return self.iter_videos()
+
+    def _report(self, stage: str, completed: int, failed: int, total: int, start: float) -> None:
+        """ Reports progress to the callback """
+        if self.progress_callback is not None:
+            self.progress_callback(PlaylistProgress(stage, completed, failed, total, time.perf_counter() - start))
+
+    def _map(self, stage: str, func: Callable, items: list, keys: list) -> tuple:
+        """ 
+        Applies func to items with bounded concurrency, isolating failures
+        :return: (dictionary of key to result for the successful items, dictionary of key to exception
+                 for the failed items), both in input order
+        """
+        results, completed, failed, start = {}, 0, 0, time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(func, item): key for item, key in zip(items, keys)}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    results[key] = future.result()
+                    completed += 1
+                except Exception as e:
+                    self.errors[(stage, key)] = e
+                    failed += 1
+                self._report(stage, completed, failed, len(items), start)
+        return ({key: results[key] for key in keys if key in results},
+                {key: self.errors[(stage, key)] for key in keys if key not in results})
+
+    def iter_videos(self) -> Iterator[YouTubeVideo]:
+        """ 
+        Resolves the videos of the playlist as they are iterated,
+        keeping at most max_workers resolutions in flight
+        """
+        urls = list(self._feed.video_urls)
+        self.youtube_videos, completed, failed, start = [], 0, 0, time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+            for url in urls:
+                pending.append((url, executor.submit(YouTubeVideo, url)))
+                if len(pending) < self.max_workers:
+                    continue
+                video = self._resolve_next(pending)
+                completed, failed = (completed + 1, failed) if video else (completed, failed + 1)
+                self._report('fetch_metadata', completed, failed, len(urls), start)
+                if video:
+                    yield video
+            while pending:
+                video = self._resolve_next(pending)
+                completed, failed = (completed + 1, failed) if video else (completed, failed + 1)
+                self._report('fetch_metadata', completed, failed, len(urls), start)
+                if video:
+                    yield video
+        self._resolved = True
+
+    def _resolve_next(self, pending: deque) -> Optional[YouTubeVideo]:
+        """ Waits for the oldest pending resolution, returns None if it failed """
+        url, future = pending.popleft()
+        try:
+            video = future.result()
+        except Exception as e:
+            self.errors[('fetch_metadata', url)] = e
+            return None
+        self.youtube_videos.append(video)
+        return video
+
     def fetch_metadata(self) -> None:
         """ Fetches YouTube playlist metadata """
-        self.youtube_videos = [YouTubeVideo(video_url) for video_url in self._feed.video_urls]
+        urls = list(self._feed.video_urls)
+        self.youtube_videos = list(self._map('fetch_metadata', YouTubeVideo, urls, urls)[0].values())
+        self._resolved = True
 
-    def download_audio(self):
-        """ Downloads the audio of all YouTube videos in the playlist """
-        for video in self.youtube_videos:
-            video.download_audio()
+    def download_audio(self, store: Optional[ArtifactStore] = None) -> dict:
+        """ 
+        Downloads the audio of all YouTube videos in the playlist
+        :param store: ArtifactStore used to skip audio that was already downloaded
+        :return: dictionary of video id to exception for the videos that failed
+        """
+        videos = list(self)
+        _, failures = self._map('download_audio', lambda video: video.download_audio(store), videos,
+                                [video.video_id for video in videos])
+        return failures
 
-    def download_transcript(self):
-        """ Downloads transcripts of all YouTube videos in the playlist """
-        title_transcript_dict = {}
-        for video in self.youtube_videos:
-            title_transcript_dict.update({video.title: video.download_transcript()})
-        return title_transcript_dict
\ No newline at end of file
+    def download_transcript(self) -> tuple:
+        """ 
+        Downloads transcripts of all YouTube videos in the playlist
+        :return: (dictionary of video id to transcript, None for the videos without English captions,
+                 dictionary of video id to exception for the videos that failed)
+        """
+        videos = list(self)
+        return self._map('download_transcript', lambda video: video.download_transcript(),
+                         videos, [video.video_id for video in videos])
@@ -1,5 +1,5 @@
-from podsummer.metadata import base
-from podsummer.metadata import rss
-from podsummer.metadata import youtube
+from podsummer._lazy import lazy_submodules
 
-__all__ = ['base', 'rss', 'youtube']
\ No newline at end of file
+__all__ = ['base', 'rss', 'youtube']
+
+__getattr__, __dir__ = lazy_submodules(__name__, __all__)
@@ -1,4 +1,8 @@
 from abc import ABC, abstractmethod
+from pathlib import Path
+import hashlib, os
+
+from podsummer import utils
 
 METADATA_KEYS = {"IMAGE_URL": "image_url",
                  "CREATORS": "creators",
@@ -7,9 +11,52 @@ METADATA_KEYS = {"IMAGE_URL": "image_url",
                  "SUMMARY": "summary",
                  "AUDIO_STREAM": "audio_stream",
                  "CONTENT_DIRECTORY_NAME": "content",
+                 "FEED_CACHE_DIRECTORY_NAME": ".feeds",
+                 "STORE_DIRECTORY_NAME": ".store",
+                 "PCM_CACHE_DIRECTORY_NAME": ".pcm",
+                 "SEARCH_INDEX_FILENAME": ".search.sqlite",
+                 "EMBEDDING_CACHE_FILENAME": ".embeddings.sqlite",
+                 "LLM_CACHE_FILENAME": ".llm_cache.sqlite",
                  "AUDIO_FILENAME": "audio.mp3",
                  "TRANSCRIPT_FILENAME": "transcript.json",
-                 "SUMMARY_FILENAME": "summary.txt"}
+                 "SUMMARY_FILENAME": "summary.txt",
+                 "SOURCE_FILENAME": ".source"}
+
+
+def _claim(directory: Path, source_id: str) -> str:
+    """ Records source_id as the owner of directory unless it already has one, returning the owner """
+    marker = directory.joinpath(METADATA_KEYS["SOURCE_FILENAME"])
+    tmp_path = utils.temporary_path(marker)
+    utils.save_text(source_id, tmp_path)
+    try:
+        # Linking fails if the marker exists, and never exposes a partially written one
+        os.link(tmp_path, marker)
+    except FileExistsError:
+        pass
+    finally:
+        tmp_path.unlink()
+    return utils.load_text(marker)
+
+
+def episode_directory(channel_name: str, title: str, source_id: str) -> Path:
+    """
+    Returns the directory of an episode, content/<channel>/<title>, creating it if necessary.
+    Every directory is claimed by the source it was created for, so an episode whose title collides
+    with another one after to_filename gets a directory suffixed with the hash of its own source.
+    :param channel_name: name of the channel
+    :param title: title of the episode
+    :param source_id: stable identity of the episode, e.g. its guid or video id
+    """
+    channel_dir = Path(METADATA_KEYS["CONTENT_DIRECTORY_NAME"]).joinpath(utils.to_filename(channel_name))
+    name = utils.to_filename(title)
+    suffix = hashlib.sha1(source_id.encode('utf-8')).hexdigest()[:8]
+    for directory_name in (name, f"{name}_{suffix}"):
+        directory = channel_dir.joinpath(directory_name)
+        directory.mkdir(parents=True, exist_ok=True)
+        if _claim(directory, source_id) == source_id:
+            break
+    return directory
+
 
 class BaseMetadataManager(ABC):
     """ Abstract base class for metadata managers. """
@@ -17,4 +64,11 @@ class BaseMetadataManager(ABC):
     @abstractmethod
     def fetch_metadata(self):
         """ Fetches metadata for the source. """
-        pass
\ No newline at end of file
+        pass
+
+    @staticmethod
+    def _episode_paths(channel_name: str, title: str, source_id: str) -> dict:
+        """ Returns the audio, transcript and summary paths of an episode """
+        directory = episode_directory(channel_name, title, source_id)
+        return {METADATA_KEYS[key].split('.')[0]: directory.joinpath(METADATA_KEYS[key])
+                for key in ("AUDIO_FILENAME", "TRANSCRIPT_FILENAME", "SUMMARY_FILENAME")}
\ No newline at end of file
@@ -1,48 +1,207 @@
-# from . import utils
-# from .podcast import Podcast
-# from .transcriber import AudioTranscriber
-# from .transcript import Transcript
-# from .ragengine import OpenAIAssistant
-
-# class PodSummer:
-
-#     def __init__(self, llm_model : str, api_key : str):
-#         """ Initialise the Podsummer = Podcast + Transcription + LLM """
-#         # Load LLM
-#         self.agent = OpenAIAssistant(llm_model=llm_model, api_key=api_key)
-
-#     def fetch_podcast(self, url):
-#         """ Loads podcast """
-#         # Load podcast from URL
-#         self.podcast = Podcast(url)
-#         self.podcast.episode.download()
-
-#     def transcribe_audio(self, hf_token, trans_model='base', device='cuda',
-#                         compute_type='float16', align=True, diarize=False):
-#         """ Transcribes audio and loads transcript """
-#         # Transcribe audio
-#         transcriber = AudioTranscriber(hf_token=hf_token ,trans_model=trans_model,
-#                                         device=device, compute_type=compute_type)
-        
-#         result = transcriber.transcribe_audio(audio_path=self.podcast.episode.file_paths['audio'],
-#                                               transcript_path=self.podcast.episode.file_paths['transcript'],
-#                                               align=align, diarize=diarize)
-#         # Set transcript
-#         self.transcript = Transcript(path=self.podcast.episode.file_paths['transcript'])
-        
-#     def load_transcript(self):
-#         """ Load transcript on RAG engine """
-#         self.agent.load_transcript(transcript=self.transcript)
-
-#     def query(self, message : str, verbose : bool = True):
-#         """ Query the LLM """
-#         return self.agent.query(message=message, verbose=verbose)
-    
-#     def summarize_transcript(self, verbose : bool = True):
-#         """ Summarizes the podcast and saves the summary """
-#         self.agent.summarize_transcript(podcast_title=self.podcast.title,
-#                                         episode_title=self.podcast.episode.title,
-#                                         verbose=verbose)
-
-
-        
+from typing import Iterable, Iterator, Optional
+import queue, threading, time
+
+from podsummer import instrument, utils
+from podsummer.llm.base import ChatClient
+from podsummer.llm.cache import CachedChatClient, ResponseCache
+from podsummer.llm.summarizer import MapReduceSummarizer
+from podsummer.media.feed_cache import FeedCache
+from podsummer.media.source_factory import SourceFactory
+from podsummer.media.youtube import YouTubePlaylist
+from podsummer.metadata.base import METADATA_KEYS
+from podsummer.store.artifacts import ArtifactStore
+from podsummer.transcribe.base import AudioTranscriber
+from podsummer.transcript.transcript import Transcript
+
+_STOP = object()
+
+
+class Episode:
+    """ Episode travelling through the PodSummer pipeline """
+
+    def __init__(self, url: str, episode_title: Optional[str] = None) -> None:
+        """
+        Initialises Episode
+        :param url: URL of the source
+        :param episode_title: title of the episode if url is rss
+        """
+        self.url = url
+        self.episode_title = episode_title
+        self.source = None
+        self.transcript = None
+        self.summary = None
+        self.error = None
+        self.timings = {}
+
+    def __repr__(self):
+        """ Representation of Episode Object """
+        status = f"Error = {self.error[0]}" if self.error else f"Stages = {list(self.timings)}"
+        return f"""Episode[URL = {self.url}, Title = {self.episode_title}, {status}]"""
+
+    def path(self, filename: str):
+        """ Returns the store path of the source for one of the METADATA_KEYS filenames """
+        return self.source.store_paths[filename.split('.')[0]]
+
+
+class Stage:
+    """ Pipeline stage with its own workers, reading episodes from a bounded queue """
+
+    def __init__(self, name: str, func, workers: int, queue_size: int) -> None:
+        """
+        Initialises Stage
+        :param name: name of the stage
+        :param func: processes an Episode in place
+        :param workers: number of concurrent workers
+        :param queue_size: capacity of the input queue
+        """
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.inbox = queue.Queue(maxsize=queue_size)
+        self._running = workers
+        self._lock = threading.Lock()
+
+    def start(self, outbox: queue.Queue, downstream_workers: int) -> list:
+        """ Starts the workers, which forward episodes to outbox and stop it when all are done """
+        threads = [threading.Thread(target=self._work, args=(outbox, downstream_workers),
+                                    name=f"{self.name}-{i}", daemon=True) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def _work(self, outbox: queue.Queue, downstream_workers: int) -> None:
+        """ Processes episodes until the stop signal, skipping episodes that failed upstream """
+        try:
+            while True:
+                episode = self.inbox.get()
+                if episode is _STOP:
+                    break
+                if episode.error is None:
+                    start = time.perf_counter()
+                    try:
+                        with instrument.span(f"pipeline_{self.name}", url=episode.url):
+                            self.func(episode)
+                    except Exception as e:
+                        episode.error = (self.name, e)
+                    episode.timings[self.name] = time.perf_counter() - start
+                # Blocks while the downstream queue is full, which applies backpressure
+                outbox.put(episode)
+        finally:
+            # Even a worker killed by a BaseException counts as stopped, so the downstream stages still finish
+            with self._lock:
+                self._running -= 1
+                last = self._running == 0
+            if last:
+                for _ in range(downstream_workers):
+                    outbox.put(_STOP)
+
+
+class PodSummer:
+    """
+    Staged pipeline: fetch metadata -> download -> transcribe -> summarize.
+    Stages are connected by bounded queues and have their own number of workers,
+    so network-bound and compute-bound stages overlap across episodes while
+    the number of episodes in flight, and therefore memory, stays bounded.
+    """
+
+    def __init__(self, transcriber: AudioTranscriber, llm: ChatClient, llm_model: str = 'gpt-3.5-turbo',
+                 fetch_workers: int = 4, download_workers: int = 4, transcribe_workers: int = 1,
+                 summarize_workers: int = 4, queue_size: int = 2, align: bool = False,
+                 store: Optional[ArtifactStore] = None, feed_cache: Optional[FeedCache] = None,
+                 llm_cache: Optional[ResponseCache] = None) -> None:
+        """
+        Initialise the Podsummer = Podcast + Transcription + LLM
+        :param transcriber: transcriber with a transcribe_audio method, e.g. WhisperXTranscriber or StubTranscriber
+        :param llm: chat client used for the summaries
+        :param llm_model: name of the LLM
+        :param queue_size: capacity of the queue in front of every stage
+        :param align: whether to align the transcriptions with the audio
+        :param store: ArtifactStore used to skip work that was already done
+        :param feed_cache: FeedCache used for RSS feeds
+        :param llm_cache: ResponseCache put in front of the chat client
+        """
+        self.transcriber = transcriber
+        self.llm = CachedChatClient(llm, llm_cache) if llm_cache is not None else llm
+        self.llm_model = llm_model
+        self.summarizer = MapReduceSummarizer(self.llm, llm_model)
+        self.align = align
+        self.store = store
+        self.feed_cache = feed_cache
+        self.queue_size = queue_size
+        self._workers = {'fetch_metadata': fetch_workers, 'download': download_workers,
+                         'transcribe': transcribe_workers, 'summarize': summarize_workers}
+
+    def _fetch_metadata(self, episode: Episode) -> None:
+        """ Creates the media source of the episode """
+        source = SourceFactory.create_source(episode.url, episode.episode_title, feed_cache=self.feed_cache)
+        if isinstance(source, YouTubePlaylist):
+            raise ValueError("Playlists must be passed as the URLs of their videos")
+        episode.source = source
+
+    def _download(self, episode: Episode) -> None:
+        """ Downloads the audio of the episode """
+        episode.source.download_audio(store=self.store)
+
+    def _transcribe(self, episode: Episode) -> None:
+        """ Transcribes the audio and loads the transcript """
+        transcript_path = episode.path(METADATA_KEYS["TRANSCRIPT_FILENAME"])
+        self.transcriber.transcribe_audio(episode.path(METADATA_KEYS["AUDIO_FILENAME"]), transcript_path,
+                                          align=self.align, store=self.store)
+        episode.transcript = Transcript(path=transcript_path)
+
+    def _summarize(self, episode: Episode) -> None:
+        """ Summarizes the transcript and saves the summary """
+        episode.summary = self.summarizer.summarize(episode.transcript, episode.source.channel_name,
+                                                    episode.source.title)
+        utils.save_text(episode.summary, episode.path(METADATA_KEYS["SUMMARY_FILENAME"]))
+        # The transcript stays on disk, releasing it keeps memory flat
+        episode.transcript = None
+
+    def _stages(self) -> list:
+        """ Creates the stages of the pipeline """
+        funcs = {'fetch_metadata': self._fetch_metadata, 'download': self._download,
+                 'transcribe': self._transcribe, 'summarize': self._summarize}
+        return [Stage(name, func, self._workers[name], self.queue_size) for name, func in funcs.items()]
+
+    def iter_run(self, sources: Iterable) -> Iterator[Episode]:
+        """
+        Runs the pipeline, yielding episodes as they leave the last stage.
+        If iterating over sources raises, the error is raised once the episodes produced before it are done
+        :param sources: URLs, or (url, episode title) tuples for RSS feeds
+        """
+        stages = self._stages()
+        done = queue.Queue(maxsize=self.queue_size)
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.start(next_stage.inbox, next_stage.workers)
+        stages[-1].start(done, 1)
+
+        errors = []
+
+        def produce():
+            try:
+                for source in sources:
+                    url, title = (source, None) if isinstance(source, str) else source
+                    stages[0].inbox.put(Episode(url, title))
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                # The stages finish the episodes already produced, even if the sources failed
+                for _ in range(stages[0].workers):
+                    stages[0].inbox.put(_STOP)
+
+        threading.Thread(target=produce, name="produce", daemon=True).start()
+        while True:
+            episode = done.get()
+            if episode is _STOP:
+                break
+            yield episode
+        if errors:
+            raise errors[0]
+
+    def run(self, sources: Iterable) -> list:
+        """
+        Runs the pipeline over sources
+        :param sources: URLs, or (url, episode title) tuples for RSS feeds
+        :return: list of processed episodes, failed ones have their error set to (stage, exception)
+        """
+        return list(self.iter_run(sources))
@@ -1,143 +1,271 @@
-# import os, time, openai
-# from . import utils
-# from .transcript import Transcript
-
-# # from langchain.llms.openai import OpenAIChat
-# # from langchain.chains import RetrievalQA, ConversationalRetrievalChain
-
-
-# ASSISTANT_NAME = 'PodChat'
-# ASSISTANT_INSTRUCTIONS = """ Assist podcast enthusiasts by summarizing episodes from provided transcripts
-#                             and answering content-related queries.\n """
-
-# CONTENT_BREAKDOWN_INSTRUCTIONS = """ The transcript that is provided to you is in the form of a list of JSON objects.
-#                                     Each JSON object has a start, end, and text field.
-#                                     The start and end fields are the start and end times of the text in seconds.
-#                                     The text field is the text that is spoken between the start and end times."""
-
-# def SUMMARY_PROMPT(podcast_title, episode_title):
-#     """ Returns the summary prompt specifically for the podcast episode """
-
-#     return f""" Given the attached transcription file of the episode {episode_title} from the podcast {podcast_title},
-#                       please analyze the structure and content of the transcription. Note the key topics discussed,
-#                       the main points made by the host and any guests, and any significant conclusions drawn during the episode.
-#                       Provide a concise summary that captures the essence of the episode, its thematic focus,
-#                       and any noteworthy insights or information shared by the participants.
-#                       The summary should be structured to reflect the flow of the conversation and should be limited to approximately 250-300 words for brevity.
-#                       Please exclude any parts of the transcript that involve plugs for the podcast, advertisements, or calls for subscriptions,
-#                       focusing solely on the content relevant to the main discussion topics."""
-
-# MODELS = ['gpt-3.5-turbo', 'gpt-4']
-
-
-# class OpenAIAssistant:
-
-#     def __init__(self, llm_model, api_key):
-#         """ Initialise """
-
-#         if llm_model not in MODELS:
-#             raise ValueError("The assistant llm_model can be either 'gpt-3' or 'gpt-4'")
-#         elif llm_model == 'gpt-3.5-turbo':
-#             self.llm_model = f"{llm_model}-1106"
-#         else:
-#             self.llm_model = f"{llm_model}-1106-preview"
-
-#         self.client = openai.OpenAI(api_key = api_key)
-#         self.transcript = None
-#         self.assistant = None
-#         self.thread = self.client.beta.threads.create()
-
-
-#     def load_transcript(self, transcript : Transcript) -> None:
-#         """ Loads the transcript """
-#         binary_file = transcript.timed_text.encode('utf-8')
-#         self.transcript = self.client.files.create(file=binary_file,
-#                                                     purpose='assistants')
-
-#         self.assistant = self.client.beta.assistants.create(name=ASSISTANT_NAME,
-#                                                             instructions=ASSISTANT_INSTRUCTIONS,
-#                                                             tools=[{"type": "retrieval"}],
-#                                                             model=self.llm_model,
-#                                                             file_ids=[self.transcript.id])
-
-
-#     def query(self, message : str, verbose : bool = True) -> str:
-#         """ Queries the assistant """
-#         # Add message to the thread
-#         message = self.client.beta.threads.messages.create(thread_id=self.thread.id,
-#                                                            role="user",
-#                                                            content=message)
-#         # Run the assistant
-#         run = self.client.beta.threads.runs.create(
-#               thread_id=self.thread.id,
-#               assistant_id=self.assistant.id,
-#               )
-#         # Retrieve the response until its status is either completed or failed
-#         response_status = "queued"
-#         while response_status in ["queued", "in_progress"]:
-#             response = self.client.beta.threads.runs.retrieve(
-#                 thread_id=self.thread.id,
-#                 run_id=run.id,
-#                 )
-
-#             response_status = response.status
-#             utils.print_status(response_status)
-#             time.sleep(5)
-#         # Print response
-#         if verbose:
-#             self._print_response()
-
-    
-#     def _print_response(self):
-#         """ Prints the response """
-#         messages = self.client.beta.threads.messages.list(thread_id=self.thread.id)
-#         print(f"{messages.data[0].role.upper()}:", messages.data[0].content[0].text.value)
-    
-
-#     def print_messages(self):
-#         """ Prints the messages from the current thread """
-#         messages = self.client.beta.threads.messages.list(thread_id=self.thread.id)
-#         for message in messages:
-#             print(f"{message.role.upper()}: ", message.content[0].text.value, '\n')
-
-
-#     def summarize_transcript(self, podcast_title, episode_title, verbose : bool = True):
-#         """ Summarizes the transcript text """
-#         return self.query(message=SUMMARY_PROMPT(podcast_title, episode_title), verbose=verbose)
-        
-        
-
-
-
-# class RAGEngine:
-
-#     def __init__(self, type='openai'):
-#         self.chat_history = []
-#         self.OPENAI_API_KEY = utils.load_text('api_key.txt')
-#         self.type = type
-
-
-
-#     def load_transcript(self, transcript : Transcript) -> None:
-#         """ Loads the transcript """
-#         self.transcript = transcript
-
-#     # def load_transcript(self, transcript : Transcript):
-#     #     self.transcript = transcript
-#     #     texts = self.transcript.split_text(chunks=1000, chunk_overlap=50)
-#     #     self.retriever = self.transcript.get_text_embeddings(texts)
-
-
-#     # def query(self, query):
-#     #     qa_chain = ConversationalRetrievalChain.from_llm(
-#     #         llm=OpenAIChat(openai_api_key=self.OPENAI_API_KEY),
-#     #         retriever=self.retriever,
-#     #         return_source_documents=True,
-#     #     )
-#     #     result = qa_chain({'question': query, 'chat_history': self.chat_history})
-#     #     result = result['answer']
-#     #     self.chat_history.append((query, result))
-#     #     return result
-        
-
-        
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional, Union
+import time
+
+from podsummer import utils
+from podsummer.llm.base import ChatClient
+from podsummer.llm.prompts import SYSTEM_PROMPT
+from podsummer.retrieval.cache import CachedEmbedder, EmbeddingCache
+from podsummer.retrieval.embedders import Embedder, HashingEmbedder
+from podsummer.retrieval.index import VectorIndex
+from podsummer.store.artifacts import hash_file
+from podsummer.transcript.transcript import Transcript
+
+RETRIEVAL_INSTRUCTIONS = """ Answer using only the transcript excerpts provided with the question.
+                            Each excerpt starts with its start and end time in seconds, cite them when relevant."""
+
+ASSISTANT_NAME = 'PodChat'
+ASSISTANT_INSTRUCTIONS = """ Assist podcast enthusiasts by summarizing episodes from provided transcripts
+                            and answering content-related queries.\n """
+
+CONTENT_BREAKDOWN_INSTRUCTIONS = """ The transcript that is provided to you is a text file with one segment per line.
+                                    Each line starts with the start time of the segment in seconds,
+                                    followed by the text spoken in the segment and its end time in seconds."""
+
+
+def ASSISTANT_SUMMARY_PROMPT(podcast_title, episode_title):
+    """ Returns the summary prompt specifically for the podcast episode attached to the assistant """
+
+    return f""" Given the attached transcription file of the episode {episode_title} from the podcast {podcast_title},
+                please analyze the structure and content of the transcription. Note the key topics discussed,
+                the main points made by the host and any guests, and any significant conclusions drawn during the episode.
+                Provide a concise summary that captures the essence of the episode, its thematic focus,
+                and any noteworthy insights or information shared by the participants.
+                The summary should be structured to reflect the flow of the conversation and should be limited to approximately 250-300 words for brevity.
+                Please exclude any parts of the transcript that involve plugs for the podcast, advertisements, or calls for subscriptions,
+                focusing solely on the content relevant to the main discussion topics."""
+
+
+class QueryMetrics(NamedTuple):
+    """ Latencies of a query, in seconds from when it was sent """
+    query: str
+    time_to_first_token: Optional[float]
+    total: float
+    tokens: int
+    polls: int = 0
+
+
+class _LatencyRecorder:
+    """ Forwards streamed tokens to a callback, recording when the first one arrived """
+
+    def __init__(self, on_token: Optional[Callable[[str], None]] = None) -> None:
+        """
+        Initialises _LatencyRecorder, starting the clock of the query
+        :param on_token: callback receiving every token, or None
+        """
+        self.on_token = on_token
+        self.start = time.perf_counter()
+        self.first = None
+        self.tokens = []
+
+    def __call__(self, token: str) -> None:
+        """ Records token and forwards it to the callback """
+        if self.first is None:
+            self.first = time.perf_counter() - self.start
+        self.tokens.append(token)
+        if self.on_token is not None:
+            self.on_token(token)
+
+    def metrics(self, query: str, polls: int = 0) -> QueryMetrics:
+        """ Returns the latencies of query, measured until now """
+        return QueryMetrics(query, self.first, time.perf_counter() - self.start, len(self.tokens), polls)
+
+
+class OpenAIAssistant:
+    """
+    Answers queries about a transcript with the OpenAI Assistants API.
+    Answers are streamed to a token callback as they are generated; when streaming is disabled,
+    the run is polled with exponential backoff and jitter instead of a fixed interval.
+    """
+
+    def __init__(self, llm_model: str = 'gpt-4o-mini', api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 stream: bool = True, poll_interval: float = 0.1, max_poll_interval: float = 5.0) -> None:
+        """
+        Initialise the assistant
+        :param llm_model: name of the LLM
+        :param api_key: OpenAI API key, read from OPENAI_API_KEY if None
+        :param base_url: base URL of the API, e.g. of a local server
+        :param stream: whether to stream the answers, otherwise runs are polled
+        :param poll_interval: first delay between polls in seconds
+        :param max_poll_interval: maximum delay between polls in seconds
+        """
+        import openai
+
+        self.llm_model = llm_model
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url)
+        self.stream = stream
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.transcript = None
+        self.assistant = None
+        self.thread = self.client.beta.threads.create()
+        self.metrics = []
+        self._attach_transcript = False
+
+    def load_transcript(self, transcript : Transcript) -> None:
+        """ Loads the transcript """
+        binary_file = transcript.timed_text.encode('utf-8')
+        self.transcript = self.client.files.create(file=('transcript.txt', binary_file), purpose='assistants')
+        self.assistant = self.client.beta.assistants.create(name=ASSISTANT_NAME,
+                                                            instructions=ASSISTANT_INSTRUCTIONS + CONTENT_BREAKDOWN_INSTRUCTIONS,
+                                                            tools=[{"type": "file_search"}],
+                                                            model=self.llm_model)
+        # The file is attached to the next message of the thread
+        self._attach_transcript = True
+
+    def _stream_run(self, on_token: Callable[[str], None]) -> None:
+        """ Runs the assistant, passing the tokens of the answer to on_token as they arrive """
+        events = self.client.beta.threads.runs.create(thread_id=self.thread.id, assistant_id=self.assistant.id,
+                                                      stream=True)
+        for event in events:
+            if event.event == 'thread.message.delta':
+                for content in event.data.delta.content or []:
+                    if content.type == 'text' and content.text.value:
+                        on_token(content.text.value)
+            elif event.event in ('thread.run.failed', 'thread.run.cancelled', 'thread.run.expired'):
+                raise RuntimeError(f"Assistant run {event.event.split('.')[-1]}")
+
+    def _poll_run(self, on_token: Callable[[str], None]) -> int:
+        """ Runs the assistant and polls the run until it is done, with backoff and jitter """
+        run = self.client.beta.threads.runs.create(thread_id=self.thread.id, assistant_id=self.assistant.id)
+        polls = 0
+        for delay in utils.backoff_delays(self.poll_interval, self.max_poll_interval):
+            if run.status not in ("queued", "in_progress"):
+                break
+            time.sleep(delay)
+            run = self.client.beta.threads.runs.retrieve(thread_id=self.thread.id, run_id=run.id)
+            polls += 1
+        if run.status != "completed":
+            raise RuntimeError(f"Assistant run {run.status}")
+        messages = self.client.beta.threads.messages.list(thread_id=self.thread.id, limit=1)
+        on_token(messages.data[0].content[0].text.value)
+        return polls
+
+    def query(self, message : str, on_token: Optional[Callable[[str], None]] = None, verbose : bool = False) -> str:
+        """
+        Queries the assistant
+        :param message: question to the assistant
+        :param on_token: called with every piece of the answer as it arrives
+        :param verbose: whether to print the answer
+        :return: answer of the assistant
+        """
+        if self.assistant is None:
+            raise ValueError("No transcript loaded")
+        recorder = _LatencyRecorder(on_token)
+        attachments = [{"file_id": self.transcript.id, "tools": [{"type": "file_search"}]}] if self._attach_transcript else []
+        self.client.beta.threads.messages.create(thread_id=self.thread.id, role="user", content=message,
+                                                 attachments=attachments)
+        self._attach_transcript = False
+        polls = 0
+        if self.stream:
+            self._stream_run(recorder)
+        else:
+            polls = self._poll_run(recorder)
+        self.metrics.append(recorder.metrics(message, polls))
+        answer = ''.join(recorder.tokens)
+        if verbose:
+            print("ASSISTANT:", answer)
+        return answer
+
+    def print_messages(self):
+        """ Prints the messages from the current thread """
+        messages = self.client.beta.threads.messages.list(thread_id=self.thread.id, order='asc')
+        for message in messages:
+            print(f"{message.role.upper()}: ", message.content[0].text.value, '\n')
+
+    def summarize_transcript(self, podcast_title, episode_title, on_token: Optional[Callable[[str], None]] = None,
+                             verbose : bool = False) -> str:
+        """ Summarizes the transcript text """
+        return self.query(message=ASSISTANT_SUMMARY_PROMPT(podcast_title, episode_title), on_token=on_token, verbose=verbose)
+
+
+class RAGEngine:
+    """ Retrieval over a transcript with a local vector index, optionally answering with an LLM """
+
+    def __init__(self, embedder: Optional[Embedder] = None, chat_client: Optional[ChatClient] = None,
+                 llm_model: str = 'gpt-3.5-turbo', window_seconds: float = 60, overlap_seconds: float = 15,
+                 embedding_cache: Optional[Union[EmbeddingCache, str, Path]] = None):
+        """ 
+        Initialise the RAG engine
+        :param embedder: embedder of the chunks and queries, defaults to the local HashingEmbedder
+        :param embedding_cache: EmbeddingCache, or path of one, serving the embeddings of chunks embedded before,
+                                e.g. when an edited transcript is indexed again; every chunk is embedded if None
+        :param chat_client: chat client answering queries from the retrieved chunks
+        :param llm_model: name of the LLM
+        :param window_seconds: duration of the transcript chunks in seconds
+        :param overlap_seconds: overlap of consecutive chunks in seconds
+        """
+        self.chat_history = []
+        self.metrics = []
+        self.embedder = embedder if embedder is not None else HashingEmbedder()
+        if embedding_cache is not None:
+            if not isinstance(embedding_cache, EmbeddingCache):
+                embedding_cache = EmbeddingCache(embedding_cache)
+            self.embedder = CachedEmbedder(self.embedder, embedding_cache)
+        self.chat_client = chat_client
+        self.llm_model = llm_model
+        self.window_seconds = window_seconds
+        self.overlap_seconds = overlap_seconds
+        self.transcript, self.index = None, None
+
+    def _index_path(self, transcript: Transcript):
+        """ 
+        Path of the index persisted next to the transcript, or None if the transcript has no path.
+        It is named after the full file name, so transcripts in different formats get indexes of their own
+        """
+        path = getattr(transcript, 'path', None)
+        return Path(path).with_name(Path(path).name + '.index.npy') if path is not None else None
+
+    def load_transcript(self, transcript : Transcript) -> None:
+        """ 
+        Loads the transcript, reusing its persisted index if it was built from the same content
+        of the transcript with the same settings
+        """
+        self.transcript = transcript
+        params = {'window_seconds': self.window_seconds, 'overlap_seconds': self.overlap_seconds}
+        index_path = self._index_path(transcript)
+        if index_path is not None:
+            transcript_hash = hash_file(transcript.path)
+            try:
+                index = VectorIndex.load(index_path)
+            except (OSError, ValueError, KeyError):
+                # Missing, or left incomplete by an interrupted save
+                index = None
+            if index is not None and index.embedder_id == self.embedder.id \
+                    and index.params == {**params, 'transcript_hash': transcript_hash}:
+                self.index = index
+                return
+        self.index = VectorIndex.build(transcript, self.embedder, **params)
+        if index_path is not None:
+            self.index.params['transcript_hash'] = transcript_hash
+            self.index.save(index_path)
+
+    def search(self, query : str, k : int = 4) -> list:
+        """ 
+        Returns the chunks of the transcript most relevant to query
+        :return: list of dicts with start, end, text and score
+        """
+        if self.index is None:
+            raise ValueError("No transcript loaded")
+        return self.index.search(self.embedder.embed([query]), k)[0]
+
+    def query(self, query : str, k : int = 4, on_token: Optional[Callable[[str], None]] = None) -> str:
+        """ 
+        Answers query from the k most relevant chunks of the transcript
+        :param on_token: called with every piece of the answer as it is streamed
+        """
+        if self.chat_client is None:
+            raise ValueError("A chat client is required to answer queries")
+        recorder = _LatencyRecorder(on_token)
+        hits = self.search(query, k)
+        context = '\n'.join(f"[{hit['start']:.0f}s - {hit['end']:.0f}s] {hit['text']}" for hit in hits)
+        messages = [{'role': 'system', 'content': SYSTEM_PROMPT + RETRIEVAL_INSTRUCTIONS},
+                    *[message for question, answer in self.chat_history
+                      for message in ({'role': 'user', 'content': question}, {'role': 'assistant', 'content': answer})],
+                    {'role': 'user', 'content': f"Transcript excerpts:\n{context}\n\nQuestion: {query}"}]
+        for token in self.chat_client.stream(messages, model=self.llm_model):
+            recorder(token)
+        self.metrics.append(recorder.metrics(query))
+        answer = ''.join(recorder.tokens)
+        self.chat_history.append((query, answer))
+        return answer
@@ -0,0 +1,5 @@
+from podsummer._lazy import lazy_submodules
+
+__all__ = ['bm25', 'cache', 'chunks', 'embedders', 'index']
+
+__getattr__, __dir__ = lazy_submodules(__name__, __all__)
@@ -0,0 +1,214 @@
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+import heapq, math, re, sqlite3, threading
+
+from podsummer import utils
+from podsummer.metadata.base import METADATA_KEYS
+from podsummer.transcript.binary import is_binary_transcript
+from podsummer.transcript.transcript import Transcript
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (id INTEGER PRIMARY KEY, path TEXT UNIQUE, size INTEGER, mtime_ns INTEGER,
+                                     channel TEXT, episode TEXT);
+CREATE TABLE IF NOT EXISTS segments (id INTEGER PRIMARY KEY, episode_id INTEGER, start REAL, end REAL,
+                                     length INTEGER, text TEXT);
+CREATE INDEX IF NOT EXISTS segments_episode ON segments (episode_id);
+CREATE TABLE IF NOT EXISTS postings (term TEXT, segment_id INTEGER, tf INTEGER,
+                                     PRIMARY KEY (term, segment_id)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value REAL);
+INSERT OR IGNORE INTO stats VALUES ('segments', 0), ('length', 0);
+"""
+
+
+def tokenize(text: str) -> list:
+    """ Splits text into lowercase word tokens """
+    return re.findall(r'\w+', text.lower())
+
+
+def is_transcript_file(path: Path) -> bool:
+    """
+    Checks whether path is an episode transcript in any of the formats it is saved in, e.g. transcript.jsonl.gz,
+    and not a file kept next to it, such as a checkpoint, temporary file or index
+    """
+    stem = Path(METADATA_KEYS['TRANSCRIPT_FILENAME']).stem
+    if path.name != stem + utils.artifact_suffix(path):
+        return False
+    return utils.artifact_format(path) in ('.json', '.jsonl') or is_binary_transcript(path)
+
+
+class BM25Index:
+    """
+    Incrementally updatable BM25 full-text index over the segments of stored transcripts.
+    Postings are kept on disk in SQLite, clustered by term, so a query reads only
+    the postings of its terms and new transcripts are added without a rebuild.
+    """
+
+    def __init__(self, path: Optional[Path] = None, k1: float = 1.2, b: float = 0.75) -> None:
+        """
+        Initialises BM25Index
+        :param path: path of the index database, defaults to content/.search.sqlite
+        :param k1: BM25 term frequency saturation
+        :param b: BM25 length normalisation
+        """
+        if path is None:
+            path = Path(METADATA_KEYS["CONTENT_DIRECTORY_NAME"]).joinpath(METADATA_KEYS["SEARCH_INDEX_FILENAME"])
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = Path(path)
+        self.k1, self.b = k1, b
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def __repr__(self):
+        """ Representation of BM25Index Object """
+        return f"""BM25Index[Path = {self.path}, Segments = {int(self._stat('segments'))}]"""
+
+    def close(self) -> None:
+        """ Closes the index """
+        self._db.close()
+
+    def _stat(self, key: str) -> float:
+        """ Returns a corpus statistic """
+        return self._db.execute("SELECT value FROM stats WHERE key = ?", (key,)).fetchone()[0]
+
+    def _remove_episode(self, episode_id: int) -> None:
+        """ Removes an episode and its postings, within the current transaction """
+        db = self._db
+        segment_ids = "SELECT id FROM segments WHERE episode_id = ?"
+        for term, count in db.execute(f"SELECT term, COUNT(*) FROM postings WHERE segment_id IN ({segment_ids}) "
+                                      "GROUP BY term", (episode_id,)).fetchall():
+            db.execute("UPDATE terms SET df = df - ? WHERE term = ?", (count, term))
+        n, length = db.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM segments WHERE episode_id = ?",
+                               (episode_id,)).fetchone()
+        db.execute(f"DELETE FROM postings WHERE segment_id IN ({segment_ids})", (episode_id,))
+        db.execute("DELETE FROM segments WHERE episode_id = ?", (episode_id,))
+        db.execute("DELETE FROM episodes WHERE id = ?", (episode_id,))
+        db.execute("UPDATE stats SET value = value - ? WHERE key = 'segments'", (n,))
+        db.execute("UPDATE stats SET value = value - ? WHERE key = 'length'", (length,))
+
+    def add_transcript(self, path, channel: Optional[str] = None, episode: Optional[str] = None) -> bool:
+        """
+        Adds a transcript to the index, replacing its previous version if it changed
+        :param path: path of the transcript
+        :param channel: name of the channel, defaults to the name of the grandparent directory
+        :param episode: name of the episode, defaults to the name of the parent directory
+        :return: whether the transcript was (re)indexed
+        """
+        path = Path(path)
+        stat = path.stat()
+        with self._lock, self._db:
+            row = self._db.execute("SELECT id, size, mtime_ns FROM episodes WHERE path = ?", (str(path),)).fetchone()
+            if row and (row[1], row[2]) == (stat.st_size, stat.st_mtime_ns):
+                return False
+            if row:
+                self._remove_episode(row[0])
+            transcript = Transcript(path=str(path))
+            episode_id = self._db.execute("INSERT INTO episodes (path, size, mtime_ns, channel, episode) VALUES (?, ?, ?, ?, ?)",
+                                          (str(path), stat.st_size, stat.st_mtime_ns,
+                                           channel or path.parent.parent.name, episode or path.parent.name)).lastrowid
+            first_id = self._db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM segments").fetchone()[0]
+            segments, postings, df, total_length = [], [], Counter(), 0
+            for segment_id, (start, end, text) in enumerate(zip(transcript.starts, transcript.ends,
+                                                                transcript.iter_texts()), first_id):
+                counts = Counter(tokenize(text))
+                length = sum(counts.values())
+                segments.append((segment_id, episode_id, start, end, length, text))
+                postings.extend((term, segment_id, tf) for term, tf in counts.items())
+                df.update(counts.keys())
+                total_length += length
+            self._db.executemany("INSERT INTO segments VALUES (?, ?, ?, ?, ?, ?)", segments)
+            # Inserting in key order keeps the clustered postings B-tree writes sequential
+            postings.sort()
+            self._db.executemany("INSERT INTO postings VALUES (?, ?, ?)", postings)
+            self._db.executemany("INSERT INTO terms VALUES (?, ?) ON CONFLICT(term) DO UPDATE SET df = df + excluded.df",
+                                 df.items())
+            self._db.execute("UPDATE stats SET value = value + ? WHERE key = 'segments'", (len(transcript),))
+            self._db.execute("UPDATE stats SET value = value + ? WHERE key = 'length'", (total_length,))
+        return True
+
+    def update(self, content_dir: Optional[Path] = None) -> int:
+        """
+        Indexes the new or changed transcripts under content/<channel>/<episode>/, in any format,
+        and removes the ones that were deleted.
+        An episode saved in several formats is indexed once, from its most recently written transcript
+        :return: number of transcripts (re)indexed
+        """
+        if content_dir is None:
+            content_dir = Path(METADATA_KEYS["CONTENT_DIRECTORY_NAME"])
+        stem = Path(METADATA_KEYS['TRANSCRIPT_FILENAME']).stem
+        transcripts = {}
+        for path in Path(content_dir).glob(f"*/*/{stem}.*"):
+            current = transcripts.get(path.parent)
+            if is_transcript_file(path) and (current is None or path.stat().st_mtime_ns > current.stat().st_mtime_ns):
+                transcripts[path.parent] = path
+        with self._lock, self._db:
+            # Forget the deleted transcripts and the other transcripts of the episodes,
+            # e.g. the JSON one after it was saved as JSON lines
+            for episode_id, path in self._db.execute("SELECT id, path FROM episodes").fetchall():
+                path = Path(path)
+                if not path.exists() or (path.parent in transcripts and path != transcripts[path.parent]):
+                    self._remove_episode(episode_id)
+        return sum(self.add_transcript(path) for path in sorted(transcripts.values()))
+
+    def _score(self, idf: float, tf: int, length: int, avg_length: float) -> float:
+        """ BM25 contribution of a term to the score of a segment """
+        return idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+
+    def search(self, query: str, k: int = 10) -> list:
+        """
+        Returns the k segments that best match query by BM25.
+        Terms are scored from the rarest to the most common, and once the segments found so far
+        cannot be overtaken by one that matches only the remaining terms, the postings of those terms
+        are looked up for the segments that can still reach the top k rather than read in full,
+        so common words cost little more than rare ones
+        :return: list of dicts with channel, episode, path, start, end, text and score
+        """
+        if k < 1:
+            return []
+        with self._lock:
+            n, total_length = self._stat('segments'), self._stat('length')
+            if not n:
+                return []
+            avg_length = total_length / n
+            terms = []
+            for term in set(tokenize(query)):
+                row = self._db.execute("SELECT df FROM terms WHERE term = ?", (term,)).fetchone()
+                if row and row[0]:
+                    terms.append((math.log(1 + (n - row[0] + 0.5) / (row[0] + 0.5)), row[0], term))
+            # A term adds less than idf * (k1 + 1) to any score, so the rarest terms are the ones that can rank a segment
+            terms.sort(reverse=True)
+            remaining = sum(idf for idf, _, _ in terms) * (self.k1 + 1)
+            scores = {}
+            for idf, df, term in terms:
+                threshold = heapq.nlargest(k, scores.values())[-1] if len(scores) >= k else 0.0
+                if len(scores) >= k and threshold >= remaining:
+                    # Segments unseen so far score under the threshold, as do those too far below it
+                    scores = {segment_id: score for segment_id, score in scores.items() if score + remaining >= threshold}
+                    if len(scores) < df:
+                        ids = list(scores)
+                        for i in range(0, len(ids), 500):
+                            batch = ids[i:i + 500]
+                            for segment_id, tf, length in self._db.execute(
+                                    "SELECT p.segment_id, p.tf, s.length FROM postings p JOIN segments s ON s.id = p.segment_id "
+                                    f"WHERE p.term = ? AND p.segment_id IN ({','.join('?' * len(batch))})", (term, *batch)):
+                                scores[segment_id] += self._score(idf, tf, length, avg_length)
+                        remaining -= idf * (self.k1 + 1)
+                        continue
+                for segment_id, tf, length in self._db.execute(
+                        "SELECT p.segment_id, p.tf, s.length FROM postings p JOIN segments s ON s.id = p.segment_id "
+                        "WHERE p.term = ?", (term,)):
+                    if segment_id in scores or threshold < remaining:
+                        scores[segment_id] = scores.get(segment_id, 0.0) + self._score(idf, tf, length, avg_length)
+                remaining -= idf * (self.k1 + 1)
+            hits = []
+            for segment_id, score in heapq.nlargest(k, scores.items(), key=lambda item: item[1]):
+                channel, episode, path, start, end, text = self._db.execute(
+                    "SELECT e.channel, e.episode, e.path, s.start, s.end, s.text FROM segments s "
+                    "JOIN episodes e ON e.id = s.episode_id WHERE s.id = ?", (segment_id,)).fetchone()
+                hits.append({'channel': channel, 'episode': episode, 'path': path,
+                             'start': start, 'end': end, 'text': text, 'score': score})
+            return hits
@@ -0,0 +1,122 @@
+from pathlib import Path
+from typing import Dict, List, Optional
+import hashlib, sqlite3, threading, time
+
+import numpy as np
+
+from podsummer.metadata.base import METADATA_KEYS
+from podsummer.retrieval.embedders import Embedder
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (embedder_id TEXT, text_hash TEXT, vector BLOB, last_used REAL,
+                                       PRIMARY KEY (embedder_id, text_hash)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+# SQLite limits the number of parameters of a statement
+BATCH_SIZE = 500
+
+
+def text_hash(text: str) -> str:
+    """ Returns the hash of a chunk text """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """ Persistent cache of embeddings keyed by (embedder id, text hash), with least recently used eviction """
+
+    def __init__(self, path: Optional[Path] = None, max_entries: Optional[int] = 1_000_000) -> None:
+        """
+        Initialises EmbeddingCache
+        :param path: path of the cache database, defaults to content/.embeddings.sqlite
+        :param max_entries: maximum number of cached embeddings, unbounded if None
+        """
+        if path is None:
+            path = Path(METADATA_KEYS["CONTENT_DIRECTORY_NAME"]).joinpath(METADATA_KEYS["EMBEDDING_CACHE_FILENAME"])
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def __repr__(self):
+        """ Representation of EmbeddingCache Object """
+        return f"""EmbeddingCache[Path = {self.path}, Hit rate = {self.hit_rate:.2f}, Stats = {self.stats}]"""
+
+    @property
+    def hit_rate(self) -> float:
+        """ Fraction of lookups served from the cache """
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def close(self) -> None:
+        """ Closes the cache """
+        self._db.close()
+
+    def get_many(self, embedder_id: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """ Returns the cached vectors of hashes, in batched lookups """
+        found, now = {}, time.time()
+        unique = list(dict.fromkeys(hashes))
+        with self._lock, self._db:
+            for i in range(0, len(unique), BATCH_SIZE):
+                batch = unique[i:i + BATCH_SIZE]
+                marks = ','.join('?' * len(batch))
+                rows = self._db.execute(f"SELECT text_hash, vector FROM embeddings WHERE embedder_id = ? AND text_hash IN ({marks})",
+                                        (embedder_id, *batch)).fetchall()
+                found.update((h, np.frombuffer(vector, dtype=np.float32)) for h, vector in rows)
+                self._db.execute(f"UPDATE embeddings SET last_used = ? WHERE embedder_id = ? AND text_hash IN ({marks})",
+                                 (now, embedder_id, *batch))
+            self.stats["hits"] += len(found)
+            self.stats["misses"] += len(unique) - len(found)
+        return found
+
+    def put_many(self, embedder_id: str, hashes: List[str], vectors: np.ndarray) -> None:
+        """ Caches vectors under hashes, evicting the least recently used embeddings over the size bound """
+        now = time.time()
+        rows = [(embedder_id, h, np.asarray(vector, dtype=np.float32).tobytes(), now) for h, vector in zip(hashes, vectors)]
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            # The running count over-estimates on replacements, so it is only recounted when over the bound
+            self._count += len(rows)
+            if self.max_entries is not None and self._count > self.max_entries:
+                self._count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                excess = self._count - self.max_entries
+                if excess > 0:
+                    self._db.execute("DELETE FROM embeddings WHERE (embedder_id, text_hash) IN "
+                                     "(SELECT embedder_id, text_hash FROM embeddings ORDER BY last_used LIMIT ?)", (excess,))
+                    self.stats["evictions"] += excess
+                    self._count -= excess
+
+
+class CachedEmbedder(Embedder):
+    """ Embedder that serves unchanged chunks from an EmbeddingCache and embeds only the misses, in one batch """
+
+    def __init__(self, embedder: Embedder, cache: Optional[EmbeddingCache] = None) -> None:
+        """
+        Initialises CachedEmbedder
+        :param embedder: embedder of the cache misses
+        :param cache: embedding cache, a default one is created if None
+        """
+        self.embedder = embedder
+        self.cache = cache if cache is not None else EmbeddingCache()
+
+    @property
+    def id(self) -> str:
+        """ Identifier of the wrapped embedder """
+        return self.embedder.id
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """ Embeds texts, reusing cached embeddings """
+        hashes = [text_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.id, hashes)
+        missing = {h: text for h, text in zip(hashes, texts) if h not in vectors}
+        if missing:
+            embedded = self.embedder.embed(list(missing.values()))
+            self.cache.put_many(self.id, list(missing), embedded)
+            vectors.update(zip(missing, embedded))
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([vectors[h] for h in hashes]).astype(np.float32, copy=False)
@@ -0,0 +1,35 @@
+from typing import List, NamedTuple
+
+from podsummer.transcript.transcript import Transcript
+
+
+class Chunk(NamedTuple):
+    """ Chunk of transcript text between start and end seconds """
+    start: float
+    end: float
+    text: str
+
+
+def chunk_by_time(transcript: Transcript, window_seconds: float = 60,
+                  overlap_seconds: float = 15) -> List[Chunk]:
+    """
+    Splits the transcript into time windows of window_seconds, starting every
+    window_seconds - overlap_seconds. Each chunk holds the segments overlapping its window.
+    """
+    if overlap_seconds >= window_seconds:
+        raise ValueError("The overlap must be shorter than the window")
+    if len(transcript) == 0:
+        return []
+    step = window_seconds - overlap_seconds
+    starts, ends = transcript.starts, transcript.ends
+    chunks, window_start, last_end = [], starts[0], ends[-1]
+    while True:
+        window = transcript.slice(window_start, window_start + window_seconds)
+        if len(window):
+            chunk = Chunk(window.starts[0], window.ends[-1], window.text.strip())
+            if not chunks or chunk != chunks[-1]:
+                chunks.append(chunk)
+        if window_start + window_seconds >= last_end:
+            break
+        window_start += step
+    return chunks
@@ -0,0 +1,85 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional
+import hashlib, re
+
+import numpy as np
+
+
+class Embedder(ABC):
+    """ Abstract base class for text embedders """
+
+    @property
+    @abstractmethod
+    def id(self) -> str:
+        """ Identifier of the embedder, which changes whenever its vectors would change """
+        pass
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """ Returns a float32 matrix with one L2-normalised row per text """
+        pass
+
+
+class HashingEmbedder(Embedder):
+    """ Deterministic local embedder that hashes word unigrams and bigrams into a fixed number of dimensions """
+
+    def __init__(self, dim: int = 512) -> None:
+        """
+        Initialises HashingEmbedder
+        :param dim: number of dimensions
+        """
+        self.dim = dim
+
+    @property
+    def id(self) -> str:
+        """ Identifier of the embedder """
+        return f"hashing-{self.dim}"
+
+    def _bucket(self, token: str) -> tuple:
+        """ Returns the dimension and sign of token """
+        digest = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+        return digest % self.dim, 1.0 if digest >> 63 else -1.0
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """ Embeds texts """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            words = re.findall(r'\w+', text.lower())
+            for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                dim, sign = self._bucket(token)
+                vectors[i, dim] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class OpenAIEmbedder(Embedder):
+    """ Embedder using the OpenAI embeddings API """
+
+    def __init__(self, model: str = 'text-embedding-3-small', api_key: Optional[str] = None,
+                 base_url: Optional[str] = None, batch_size: int = 256) -> None:
+        """
+        Initialises OpenAIEmbedder
+        :param model: name of the embedding model
+        :param api_key: OpenAI API key, read from OPENAI_API_KEY if None
+        :param base_url: base URL of the API
+        :param batch_size: number of texts per request
+        """
+        import openai
+        self.model = model
+        self.batch_size = batch_size
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url)
+
+    @property
+    def id(self) -> str:
+        """ Identifier of the embedder """
+        return f"openai-{self.model}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """ Embeds texts in batches """
+        rows = []
+        for i in range(0, len(texts), self.batch_size):
+            response = self.client.embeddings.create(model=self.model, input=texts[i:i + self.batch_size])
+            rows.extend(item.embedding for item in response.data)
+        vectors = np.asarray(rows, dtype=np.float32).reshape(len(texts), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
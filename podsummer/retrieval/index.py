@@ -0,0 +1,94 @@
+from pathlib import Path
+from typing import List, Optional
+import json, os
+
+import numpy as np
+
+from podsummer import utils
+from podsummer.retrieval.chunks import Chunk, chunk_by_time
+from podsummer.retrieval.embedders import Embedder
+from podsummer.transcript.transcript import Transcript
+
+
+class VectorIndex:
+    """ In-process vector index over transcript chunks, stored as one contiguous float32 matrix """
+
+    def __init__(self, vectors: np.ndarray, chunks: List[Chunk], embedder_id: str, params: Optional[dict] = None) -> None:
+        """
+        Initialises VectorIndex
+        :param vectors: L2-normalised vectors of the chunks, one row per chunk
+        :param chunks: chunks of the transcript
+        :param embedder_id: id of the embedder that produced the vectors
+        :param params: chunking parameters the index was built with
+        """
+        if len(vectors) != len(chunks):
+            raise ValueError("The number of vectors and chunks must match")
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.chunks = chunks
+        self.embedder_id = embedder_id
+        self.params = params or {}
+
+    def __repr__(self):
+        """ Representation of VectorIndex Object """
+        return f"""VectorIndex[Chunks = {len(self.chunks)}, Embedder = {self.embedder_id}]"""
+
+    def __len__(self):
+        """ Number of chunks """
+        return len(self.chunks)
+
+    @classmethod
+    def build(cls, transcript: Transcript, embedder: Embedder,
+              window_seconds: float = 60, overlap_seconds: float = 15) -> 'VectorIndex':
+        """ Builds the index of a transcript, chunked by time windows with overlap """
+        chunks = chunk_by_time(transcript, window_seconds, overlap_seconds)
+        vectors = embedder.embed([chunk.text for chunk in chunks]) if chunks else np.zeros((0, 0), np.float32)
+        return cls(vectors, chunks, embedder.id, {'window_seconds': window_seconds, 'overlap_seconds': overlap_seconds})
+
+    def search(self, query_vectors: np.ndarray, k: int = 4) -> List[list]:
+        """
+        Returns the top-k hits of every query vector, computed with one matrix product
+        :param query_vectors: matrix with one L2-normalised query vector per row
+        :return: for every query, a list of dicts with start, end, text and score
+        """
+        query_vectors = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        if not len(self.chunks):
+            return [[] for _ in query_vectors]
+        k = min(k, len(self.chunks))
+        scores = query_vectors @ self.vectors.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        hits = []
+        for row, candidates in zip(scores, top):
+            ordered = candidates[np.argsort(-row[candidates])]
+            hits.append([{**self.chunks[i]._asdict(), 'score': float(row[i])} for i in ordered])
+        return hits
+
+    def save(self, path) -> None:
+        """
+        Saves the vectors in an .npy file at path and the chunks in a JSON file next to it.
+        Both files are replaced atomically, the JSON file last, so an interrupted save
+        never leaves a partial file and the chunks are in place only once their vectors are
+        """
+        path = Path(path)
+        meta_path = path.with_suffix('.json')
+        tmp_paths = [utils.temporary_path(path), utils.temporary_path(meta_path)]
+        try:
+            with open(tmp_paths[0], 'wb') as f:
+                np.save(f, self.vectors)
+            with open(tmp_paths[1], 'w') as f:
+                json.dump({'embedder_id': self.embedder_id, 'params': self.params,
+                           'chunks': [list(chunk) for chunk in self.chunks]}, f)
+            os.replace(tmp_paths[0], path)
+            os.replace(tmp_paths[1], meta_path)
+        except BaseException:
+            for tmp_path in tmp_paths:
+                tmp_path.unlink(missing_ok=True)
+            raise
+
+    @classmethod
+    def load(cls, path) -> 'VectorIndex':
+        """ Loads an index saved with save, memory-mapping the vectors """
+        path = Path(path)
+        with open(path.with_suffix('.json'), 'r') as f:
+            meta = json.load(f)
+        return cls(np.load(path, mmap_mode='r'), [Chunk(*chunk) for chunk in meta['chunks']],
+                   meta['embedder_id'], meta['params'])
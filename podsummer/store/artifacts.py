@@ -0,0 +1,166 @@
+from pathlib import Path
+from typing import Optional
+import hashlib, json, os, shutil, sqlite3, threading, time
+
+from podsummer import utils
+from podsummer.metadata.base import METADATA_KEYS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash TEXT);
+CREATE TABLE IF NOT EXISTS sources (url TEXT PRIMARY KEY, audio_hash TEXT);
+CREATE TABLE IF NOT EXISTS artifacts (kind TEXT, audio_hash TEXT, model TEXT, settings_key TEXT,
+                                      hash TEXT, path TEXT, created_at REAL,
+                                      PRIMARY KEY (kind, audio_hash, model, settings_key));
+"""
+
+
+def hash_file(path, chunk_size: int = 1024 * 1024) -> str:
+    """ Returns the SHA-256 hex digest of the file in path """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def settings_key(settings: Optional[dict]) -> str:
+    """ Returns a stable key for a dictionary of settings """
+    return hashlib.sha256(json.dumps(settings or {}, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _link_or_copy(source, dest) -> None:
+    """ Atomically places a hard link to source at dest, or a copy if source is on another filesystem """
+    tmp_path = utils.temporary_path(dest)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, dest)
+
+
+class ArtifactStore:
+    """
+    Content-addressed store of episode artifacts with a SQLite manifest.
+    Audio is keyed by its hash, while derived artifacts (transcripts, summaries)
+    are keyed by (kind, audio hash, model, settings), so every stage can check
+    whether its output already exists before doing any work.
+    Stored files are hard-linked with the working files of the episodes, so each is kept once on disk.
+    """
+
+    def __init__(self, root: Optional[Path] = None) -> None:
+        """
+        Initialises ArtifactStore
+        :param root: directory of the store, defaults to content/.store
+        """
+        if root is None:
+            root = Path(METADATA_KEYS["CONTENT_DIRECTORY_NAME"]).joinpath(METADATA_KEYS["STORE_DIRECTORY_NAME"])
+        self.root = Path(root)
+        self.objects_dir = self.root.joinpath('objects')
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.root.joinpath('manifest.sqlite')), check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def __repr__(self):
+        """ Representation of ArtifactStore Object """
+        return f"""ArtifactStore[Root = {self.root}]"""
+
+    def close(self) -> None:
+        """ Closes the manifest """
+        self._db.close()
+
+    def _execute(self, query: str, params: tuple = ()) -> list:
+        """ Executes a query on the manifest and returns all rows """
+        with self._lock, self._db:
+            return self._db.execute(query, params).fetchall()
+
+    def _object_path(self, digest: str, suffix: str) -> Path:
+        """ Returns the path of the object with digest """
+        return self.objects_dir.joinpath(digest[:2], digest + suffix)
+
+    def _put_object(self, path, digest: str) -> Path:
+        """ 
+        Adds the file in path to the object directory, if not already there, and makes path a link to the object,
+        so the store and the working directory share one copy
+        """
+        object_path = self._object_path(digest, Path(path).suffix)
+        if not object_path.exists():
+            object_path.parent.mkdir(exist_ok=True)
+            # Objects are left writable, as a read-only inode would make the linked working file read-only too.
+            # Working files are replaced rather than written to, and appended ones are unlinked from the object first
+            _link_or_copy(path, object_path)
+        else:
+            self.materialize(object_path, path)
+        return object_path
+
+    def hash(self, path) -> str:
+        """ Returns the hash of the file in path, reusing it if the file is unchanged """
+        path = Path(path).resolve()
+        stat = path.stat()
+        rows = self._execute("SELECT hash FROM files WHERE path = ? AND size = ? AND mtime_ns = ?",
+                             (str(path), stat.st_size, stat.st_mtime_ns))
+        if rows:
+            return rows[0][0]
+        digest = hash_file(path)
+        self._execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                      (str(path), stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    @staticmethod
+    def materialize(object_path, dest) -> Path:
+        """ 
+        Places a stored object at dest, as a hard link when the filesystem allows it.
+        Working files are always replaced atomically and never written in place, so writing to dest never alters the store.
+        """
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if dest.exists() and os.path.samefile(object_path, dest):
+            return dest
+        _link_or_copy(object_path, dest)
+        return dest
+
+    def put_audio(self, path, source: Optional[str] = None) -> str:
+        """
+        Adds an audio file to the store
+        :param path: path of the audio file
+        :param source: URL the audio was downloaded from
+        :return: hash of the audio
+        """
+        digest = self.hash(path)
+        self._put_object(path, digest)
+        if source is not None:
+            self._execute("INSERT OR REPLACE INTO sources VALUES (?, ?)", (source, digest))
+        return digest
+
+    def audio_for_source(self, source: str) -> Optional[Path]:
+        """ Returns the stored audio downloaded from source, or None """
+        rows = self._execute("SELECT audio_hash FROM sources WHERE url = ?", (source,))
+        if not rows:
+            return None
+        matches = [path for path in self.objects_dir.joinpath(rows[0][0][:2]).glob(rows[0][0] + '*')
+                   if path.suffix != '.tmp']
+        return matches[0] if matches else None
+
+    def put_artifact(self, kind: str, audio_hash: str, model: str, settings: Optional[dict], path) -> Path:
+        """
+        Adds an artifact derived from an audio file to the store
+        :param kind: kind of the artifact, e.g. 'transcript' or 'summary'
+        :param audio_hash: hash of the audio the artifact was derived from
+        :param model: model that produced the artifact
+        :param settings: settings that produced the artifact
+        :param path: path of the artifact
+        :return: path of the stored object
+        """
+        digest = hash_file(path)
+        object_path = self._put_object(path, digest)
+        self._execute("INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                      (kind, audio_hash, model, settings_key(settings), digest, str(object_path), time.time()))
+        return object_path
+
+    def get_artifact(self, kind: str, audio_hash: str, model: str, settings: Optional[dict]) -> Optional[Path]:
+        """ Returns the stored artifact for (kind, audio hash, model, settings), or None """
+        rows = self._execute("SELECT path FROM artifacts WHERE kind = ? AND audio_hash = ? AND model = ? AND settings_key = ?",
+                             (kind, audio_hash, model, settings_key(settings)))
+        if rows and Path(rows[0][0]).exists():
+            return Path(rows[0][0])
+        return None
@@ -1,4 +1,5 @@
-from podsummer.transcribe import base
-from podsummer.transcribe import whisperx
+from podsummer._lazy import lazy_submodules
 
-__all__ = ['base', 'whisperx']
\ No newline at end of file
+__all__ = ['base', 'chunking', 'pcm_cache', 'registry', 'stub', 'whisperx']
+
+__getattr__, __dir__ = lazy_submodules(__name__, __all__)
@@ -0,0 +1,93 @@
+from typing import List, NamedTuple, Optional
+import numpy as np
+
+
+class AudioChunk(NamedTuple):
+    """ Chunk of audio with overlap, in samples. The core is the part the chunk is responsible for """
+    start: int
+    end: int
+    core_start: int
+    core_end: int
+
+
+def frame_energy(audio: np.ndarray, frame_length: int) -> np.ndarray:
+    """ Returns the RMS energy of consecutive frames of audio """
+    n_frames = len(audio) // frame_length
+    frames = audio[:n_frames * frame_length].reshape(n_frames, frame_length)
+    return np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+
+
+def find_silence_splits(audio: np.ndarray, sr: int, chunk_seconds: float,
+                        search_seconds: float = 10, frame_seconds: float = 0.03) -> List[int]:
+    """
+    Returns split points, in samples, close to every chunk_seconds of audio,
+    each placed at the quietest frame within search_seconds of its target
+    """
+    frame_length = max(1, int(frame_seconds * sr))
+    energy = frame_energy(audio, frame_length)
+    splits, target = [], chunk_seconds * sr
+    while target < len(audio) - search_seconds * sr:
+        # Search only after the previous split, which would otherwise be found again
+        lo = max(0, int((target - search_seconds * sr) // frame_length), splits[-1] // frame_length + 1 if splits else 0)
+        hi = min(len(energy), int((target + search_seconds * sr) // frame_length) + 1)
+        if hi <= lo:
+            break
+        # Split in the middle of the quiet run around the quietest frame
+        quietest = lo + int(np.argmin(energy[lo:hi]))
+        quiet = energy[quietest] * 1.5 + 1e-6
+        first, last = quietest, quietest
+        while first > lo and energy[first - 1] <= quiet:
+            first -= 1
+        while last < hi - 1 and energy[last + 1] <= quiet:
+            last += 1
+        split = (first + last + 1) * frame_length // 2
+        splits.append(split)
+        target = split + chunk_seconds * sr
+    return splits
+
+
+def plan_chunks(audio: np.ndarray, sr: int, chunk_seconds: float, overlap_seconds: float,
+                search_seconds: float = 10) -> List[AudioChunk]:
+    """ Splits audio into chunks at silences, extending each chunk by overlap_seconds on both sides """
+    overlap = int(overlap_seconds * sr)
+    bounds = [0] + find_silence_splits(audio, sr, chunk_seconds, search_seconds) + [len(audio)]
+    return [AudioChunk(max(0, core_start - overlap), min(len(audio), core_end + overlap), core_start, core_end)
+            for core_start, core_end in zip(bounds[:-1], bounds[1:])]
+
+
+def _shift(item: dict, offset: float) -> dict:
+    """ Returns item with its start and end, where present, shifted by offset """
+    return {**item, **{key: item[key] + offset for key in ('start', 'end') if item.get(key) is not None}}
+
+
+def merge_segments(chunk: AudioChunk, segments: list, sr: int, previous: Optional[dict] = None) -> list:
+    """
+    Returns the segments transcribed from one chunk that belong to it.
+    Segment and word times are shifted by the chunk offset, segments whose midpoint falls
+    outside the core of the chunk are dropped as duplicates of the overlap, and timestamps
+    are made monotonic after previous, the last segment kept from the preceding chunks.
+    """
+    kept = []
+    offset = chunk.start / sr
+    core_start, core_end = chunk.core_start / sr, chunk.core_end / sr
+    for segment in segments:
+        start, end = segment['start'] + offset, segment['end'] + offset
+        if not core_start <= (start + end) / 2 < core_end:
+            continue
+        if previous is not None:
+            if segment['text'].strip() == previous['text'].strip() and start < previous['end']:
+                continue
+            start = max(start, previous['end'])
+        if 'words' in segment:
+            segment = {**segment, 'words': [_shift(word, offset) for word in segment['words']]}
+        previous = {**segment, 'start': start, 'end': max(start, end)}
+        kept.append(previous)
+    return kept
+
+
+def merge_chunk_segments(chunks: List[AudioChunk], chunk_segments: List[list], sr: int) -> list:
+    """ Merges the segments transcribed from each chunk into one list with merge_segments """
+    merged = []
+    for chunk, segments in zip(chunks, chunk_segments):
+        merged += merge_segments(chunk, segments, sr, merged[-1] if merged else None)
+    return merged
@@ -0,0 +1,161 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional
+import os, threading
+
+import numpy as np
+
+from podsummer import instrument, utils
+from podsummer.metadata.base import METADATA_KEYS
+from podsummer.store.artifacts import ArtifactStore, hash_file
+
+PCM_SUFFIX = '.pcm.npy'
+
+
+class PCMCache:
+    """
+    Cache of decoded audio, saved as .npy files in one cache directory and memory-mapped when loaded,
+    so transcription, alignment and later re-runs share one decode.
+    Entries are named after the hash of the audio file and the sample rate, so a changed audio file
+    never hits the entry of its previous version, and the least recently used ones are removed once
+    the cache grows over its size bound.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = 8 * 1024 ** 3, cache_dir: Optional[Path] = None,
+                 store: Optional[ArtifactStore] = None) -> None:
+        """
+        Initialises PCMCache
+        :param max_bytes: maximum total size of the cached audio, unbounded if None
+        :param cache_dir: directory holding the cached audio, defaults to .pcm
+        :param store: ArtifactStore whose hash cache is reused to hash the audio files
+        """
+        self.max_bytes = max_bytes
+        self.cache_dir = Path(cache_dir if cache_dir is not None else METADATA_KEYS["PCM_CACHE_DIRECTORY_NAME"])
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.store = store
+        self._hashes = {}
+        self._sources = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        # Sizes of the entries from least to most recently used, scanned once and then kept up to date
+        entries = []
+        for path in self.cache_dir.glob(f"*{PCM_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, path.name, stat.st_size))
+        self._entries = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self.total_bytes = sum(self._entries.values())
+
+    def __repr__(self):
+        """ Representation of PCMCache Object """
+        return f"""PCMCache[Directory = {self.cache_dir}, Max bytes = {self.max_bytes}, Size = {self.total_bytes}, Stats = {self.stats}]"""
+
+    def _count(self, stat: str) -> None:
+        """ Increments a counter of stats """
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _hash(self, audio_path: Path) -> str:
+        """ Hash of the audio file, computed once per size and modification time """
+        stat = audio_path.stat()
+        key = (str(audio_path.resolve()), stat.st_size, stat.st_mtime_ns)
+        digest = self._hashes.get(key)
+        if digest is None:
+            digest = self.store.hash(audio_path) if self.store is not None else hash_file(audio_path)
+            self._hashes[key] = digest
+        return digest
+
+    def path(self, audio_path, sr: int) -> Path:
+        """ Path of the cached audio decoded from audio_path at sr """
+        return self.cache_dir.joinpath(f"{self._hash(Path(audio_path))}.{sr}{PCM_SUFFIX}")
+
+    def get(self, audio_path, sr: int) -> Optional[np.ndarray]:
+        """ Returns the cached audio memory-mapped copy-on-write, or None if it is not cached """
+        path = self.path(audio_path, sr)
+        try:
+            audio = np.load(path, mmap_mode='c')
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            if path.name in self._entries:
+                self._entries.move_to_end(path.name)
+        # The modification time orders the entries for eviction in later runs
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return audio
+
+    def load(self, audio_path, sr: int, decode: Callable[[], np.ndarray]) -> np.ndarray:
+        """
+        Returns the cached audio, decoding and caching it on a miss
+        :param audio_path: path of the audio file
+        :param sr: sample rate of the decoded audio
+        :param decode: decodes the audio file at sr
+        :return: audio memory-mapped from the cache
+        """
+        audio = self.get(audio_path, sr)
+        if audio is not None:
+            self._count("hits")
+            instrument.current().set(pcm_cache='hit')
+            return audio
+        self._count("misses")
+        instrument.current().set(pcm_cache='miss')
+        audio = decode()
+        self.put(audio_path, sr, audio)
+        # Mapping the cached copy lets the decoded one be freed, unless it was evicted as larger than the bound
+        cached = self.get(audio_path, sr)
+        return cached if cached is not None else audio
+
+    def put(self, audio_path, sr: int, audio: np.ndarray) -> Path:
+        """ Caches the decoded audio, replacing the entry of the previous version of the audio file cached by this cache """
+        path = self.path(audio_path, sr)
+        tmp_path = utils.temporary_path(path)
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(audio, dtype=np.float32))
+            size = tmp_path.stat().st_size
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        source = (str(Path(audio_path).resolve()), sr)
+        with self._lock:
+            self.total_bytes += size - self._entries.pop(path.name, 0)
+            self._entries[path.name] = size
+            stale = self._sources.get(source)
+            self._sources[source] = path.name
+            if stale is not None and stale != path.name and stale in self._entries:
+                self._remove(stale)
+        self.cleanup()
+        return path
+
+    def _remove(self, name: str) -> int:
+        """ Removes an entry, with the lock held, returning its size """
+        size = self._entries.pop(name)
+        self.total_bytes -= size
+        # Mapped arrays stay readable after their file is removed on POSIX systems
+        self.cache_dir.joinpath(name).unlink(missing_ok=True)
+        return size
+
+    def cleanup(self, max_bytes: Optional[int] = None) -> int:
+        """
+        Removes the least recently used cached audio until the cache fits in max_bytes
+        :param max_bytes: size bound, defaults to the one of the cache
+        :return: number of bytes removed
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        if max_bytes is None:
+            return 0
+        removed = 0
+        with self._lock:
+            while self._entries and self.total_bytes > max_bytes:
+                removed += self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+        return removed
+
+    def clear(self) -> int:
+        """ Removes all cached audio, returning the number of bytes removed """
+        return self.cleanup(max_bytes=0)
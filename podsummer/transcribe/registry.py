@@ -0,0 +1,96 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+import threading, time
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of loaded models with LRU eviction.
+    Models are kept resident between calls and evicted, least recently used first,
+    when the number of models or their memory exceeds the budget.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, max_models: Optional[int] = None) -> None:
+        """
+        Initialises ModelRegistry
+        :param max_bytes: memory budget in bytes for the resident models, unbounded if None
+        :param max_models: maximum number of resident models, unbounded if None
+        """
+        self.max_bytes = max_bytes
+        self.max_models = max_models
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "load_time": 0.0}
+
+    def __repr__(self):
+        """ Representation of ModelRegistry Object """
+        return f"""ModelRegistry[Models = {list(self._entries)}, Bytes = {self.resident_bytes}, Stats = {self.stats}]"""
+
+    def __contains__(self, key: Hashable) -> bool:
+        """ Checks whether the model with key is resident """
+        return key in self._entries
+
+    @property
+    def resident_bytes(self) -> int:
+        """ Memory in bytes of the resident models """
+        return sum(size for _, size, _ in self._entries.values())
+
+    def get(self, key: Hashable, loader: Callable[[], Any],
+            measure: Optional[Callable[[], int]] = None,
+            offload: Optional[Callable[[Any], None]] = None) -> Any:
+        """
+        Returns the model with key, loading it if it is not resident
+        :param key: key of the model
+        :param loader: loads the model
+        :param measure: returns the current memory usage, used to measure the size of the model
+        :param offload: releases the resources of the model when it is evicted
+        """
+        with self._lock:
+            if key in self._entries:
+                self.stats["hits"] += 1
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            self.stats["misses"] += 1
+            before = measure() if measure else 0
+            start = time.perf_counter()
+            model = loader()
+            self.stats["load_time"] += time.perf_counter() - start
+            size = max(0, measure() - before) if measure else 0
+            self._entries[key] = (model, size, offload)
+            self._evict(keep=key)
+            return model
+
+    def _over_budget(self) -> bool:
+        """ Checks whether the resident models exceed the budget """
+        return ((self.max_models is not None and len(self._entries) > self.max_models) or
+                (self.max_bytes is not None and self.resident_bytes > self.max_bytes))
+
+    def _evict(self, keep: Optional[Hashable] = None) -> None:
+        """ Evicts least recently used models until the budget is met, never evicting keep """
+        for key in list(self._entries):
+            if not self._over_budget():
+                break
+            if key != keep:
+                self.evict(key)
+
+    def evict(self, key: Hashable) -> None:
+        """ Evicts the model with key, if resident """
+        with self._lock:
+            if key not in self._entries:
+                return
+            _, _, offload = self._entries[key]
+            self.stats["evictions"] += 1
+            if offload is not None:
+                # Pass the only remaining reference, so that offload can release it
+                offload(self._entries.pop(key)[0])
+            else:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """ Evicts all models """
+        with self._lock:
+            for key in list(self._entries):
+                self.evict(key)
+
+
+REGISTRY = ModelRegistry()
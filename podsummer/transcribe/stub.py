@@ -0,0 +1,35 @@
+import os, time
+
+from podsummer import utils
+from podsummer.transcribe.base import AudioTranscriber
+
+
+class StubTranscriber(AudioTranscriber):
+    """ Transcriber for local testing that produces a synthetic transcript from the audio size """
+
+    def __init__(self, latency=0.0, bytes_per_second=16000, segment_seconds=5.0):
+        """ 
+        Initialise the stub transcriber
+        :param latency: seconds every transcription takes
+        :param bytes_per_second: bytes of audio per second, used to derive the duration
+        :param segment_seconds: duration of the synthetic segments
+        """
+        self.latency = latency
+        self.bytes_per_second = bytes_per_second
+        self.segment_seconds = segment_seconds
+
+    def load_audio(self, audio_path):
+        """ Returns the duration of the audio in seconds """
+        return os.path.getsize(audio_path) / self.bytes_per_second
+
+    def transcribe_audio(self, audio_path, transcript_path, align=False, diarize=False, store=None):
+        """ Writes a transcript with one segment every segment_seconds """
+        time.sleep(self.latency)
+        duration, segments, start = self.load_audio(audio_path), [], 0.0
+        while start < duration:
+            end = min(duration, start + self.segment_seconds)
+            segments.append({'start': start, 'end': end, 'text': f" Segment {len(segments)} of {audio_path}."})
+            start = end
+        result = {'segments': segments, 'language': 'en', 'mode': 'transcribed'}
+        utils.save_transcript(result, transcript_path)
+        return result
@@ -1,63 +1,200 @@
-import torch, gc
+import gc, importlib.util, json, os, subprocess, time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-try:
-    import whisperx
-except ImportError:
-    raise ImportError("""WhisperX is not installed. Please install it with
-                        pip install git+https://github.com/m-bain/whisperx.git""")
+import numpy as np
 
-from podsummer import utils
+from podsummer import instrument, utils
+from podsummer.store.artifacts import hash_file
 from podsummer.transcribe.base import AudioTranscriber
+from podsummer.transcribe.registry import REGISTRY
+from podsummer.transcribe import chunking
+
+SAMPLE_RATE = 16000
+WHISPERX_MISSING = """WhisperX is not installed. Please install it with
+                        pip install git+https://github.com/m-bain/whisperx.git"""
+
+_WORKER_MODEL = None
+
+
+def _whisperx():
+    """ Imports WhisperX on first use, as it imports torch and takes seconds to load """
+    try:
+        import whisperx
+    except ImportError:
+        raise ImportError(WHISPERX_MISSING)
+    return whisperx
+
+
+def _init_worker(trans_model, compute_type, threads):
+    """ Loads the transcription model once in each worker process """
+    global _WORKER_MODEL
+    _WORKER_MODEL = _whisperx().load_model(trans_model, device='cpu', compute_type=compute_type, threads=threads)
+
+
+def _transcribe_chunk(args):
+    """ Transcribes a chunk of audio in a worker process """
+    audio, batch_size, language = args
+    return _WORKER_MODEL.transcribe(audio, batch_size=batch_size, language=language)
 
 class WhisperXTranscriber(AudioTranscriber):
     """ Class that transcribes audio """
 
-    def __init__(self, trans_model="large-v2", batch_size=16, device='cuda', compute_type="float16", hf_token=None):
-        """ Initialise the transcriber """
+    def __init__(self, trans_model="large-v2", batch_size=16, device='cuda', compute_type="float16", hf_token=None,
+                 registry=None, pcm_cache=None):
+        """ 
+        Initialise the transcriber
+        :param registry: ModelRegistry that keeps models resident, defaults to the process-wide registry
+        :param pcm_cache: PCMCache sharing decoded audio between stages and runs, audio is decoded on every load if None
+        """
+        # WhisperX itself is imported on first use, but a missing install should fail here
+        if importlib.util.find_spec('whisperx') is None:
+            raise ImportError(WHISPERX_MISSING)
         self.device = device
         self.batch_size = batch_size
         self.compute_type = compute_type
         self.trans_model = trans_model
         self.HF_TOKEN = hf_token
+        self.registry = registry if registry is not None else REGISTRY
+        self.pcm_cache = pcm_cache
 
     def load_audio(self, audio_path):
         """ Load audio from path """
         print("Loading audio...")
-        return whisperx.load_audio(audio_path)
+        with instrument.span('decode', path=str(audio_path)) as span:
+            if self.pcm_cache is not None:
+                audio = self.pcm_cache.load(audio_path, SAMPLE_RATE, lambda: _whisperx().load_audio(audio_path))
+            else:
+                audio = _whisperx().load_audio(audio_path)
+            span.set_audio_seconds(len(audio) / SAMPLE_RATE)
+        return audio
     
     def _offload_gpu(self, model):
         """ Offloads model from GPU """
         print("Deleting model to free up GPU resources...")
-        gc.collect(); torch.cuda.empty_cache(); del model
+        del model; gc.collect()
+        if str(self.device).startswith('cuda'):
+            import torch
+            torch.cuda.empty_cache()
+
+    def _memory_used(self):
+        """
+        Memory in use on the device, used to measure the size of loaded models.
+        On GPU it is the used memory of the whole device, which unlike the torch allocator
+        also counts the CTranslate2 models of WhisperX; on CPU it is the resident memory of the process.
+        """
+        if str(self.device).startswith('cuda'):
+            import torch
+            if torch.cuda.is_available():
+                free, total = torch.cuda.mem_get_info(torch.device(self.device))
+                return total - free
+        return instrument.rss_bytes() or 0
     
-    def _transcribe(self, audio):
-        """ Transcribe only """
-        print("Transcribing audio with WhisperX...")
-        trans_model = whisperx.load_model(self.trans_model, device=self.device, compute_type=self.compute_type)
-        result = trans_model.transcribe(audio, batch_size=self.batch_size)
+    def load_audio_window(self, audio_path, offset, duration, sr=SAMPLE_RATE):
+        """ 
+        Load a window of audio from path, decoding only that window
+        :param offset: start of the window in seconds
+        :param duration: duration of the window in seconds
+        :return: mono float32 waveform sampled at sr
+        """
+        cached = self.pcm_cache.get(audio_path, sr) if self.pcm_cache is not None else None
+        if cached is not None:
+            # Slicing the mapped audio reads only the pages of the window
+            return cached[int(offset * sr):int((offset + duration) * sr)]
+        cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-ss", str(offset), "-t", str(duration),
+               "-i", str(audio_path), "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sr), "-"]
+        with instrument.span('decode', path=str(audio_path), offset=offset) as span:
+            try:
+                out = subprocess.run(cmd, capture_output=True, check=True).stdout
+            except subprocess.CalledProcessError as e:
+                raise RuntimeError(f"Failed to load audio: {e.stderr.decode()}") from e
+            audio = np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+            span.set_audio_seconds(len(audio) / sr)
+        return audio
+
+    def _load_model(self):
+        """ Load the transcription model, reusing it if it is resident in the registry """
+        return self.registry.get(('transcribe', self.trans_model, self.device, self.compute_type),
+                                 lambda: _whisperx().load_model(self.trans_model, device=self.device,
+                                                             compute_type=self.compute_type),
+                                 measure=self._memory_used, offload=self._offload_gpu)
+
+    def _load_align_model(self, language):
+        """ Load the align model and its metadata for language, reusing them if resident in the registry """
+        return self.registry.get(('align', language, self.device),
+                                 lambda: _whisperx().load_align_model(language_code=language, device=self.device),
+                                 measure=self._memory_used, offload=self._offload_gpu)
+
+    def warm_up(self, languages=()):
+        """ 
+        Load the transcription model, and the align models of languages, into the registry
+        :param languages: language codes of the align models to load
+        """
+        self._load_model()
+        for language in languages:
+            self._load_align_model(language)
+
+    def _transcribe(self, audio, language=None, **attrs):
+        """ 
+        Transcribe only, in a transcribe span
+        :param language: language code, detected if None
+        :param attrs: attributes recorded with the span, e.g. the window
+        """
+        with instrument.span('transcribe', model=self.trans_model, device=self.device, **attrs) as span:
+            trans_model = self._load_model()
+            result = trans_model.transcribe(audio, batch_size=self.batch_size, language=language)
+            span.set_audio_seconds(len(audio) / SAMPLE_RATE)
         return result
     
     def _align(self, audio, transcript):
         """ Align the transcription with the audio """
         print("Aligning the transcription with the audio...")
-        align_model, metadata = whisperx.load_align_model(language_code=transcript['language'],
-                                                            device=self.device)
-        result = whisperx.align(transcript["segments"], align_model,
-                                metadata, audio, self.device, return_char_alignments=False)
+        with instrument.span('align', language=transcript['language'], device=self.device) as span:
+            align_model, metadata = self._load_align_model(transcript['language'])
+            result = _whisperx().align(transcript["segments"], align_model,
+                                    metadata, audio, self.device, return_char_alignments=False)
+            span.set_audio_seconds(len(audio) / SAMPLE_RATE)
         return result
     
     def _diarize(self, audio, transcript):
         """ Diarize the audio and transcript """
         print("Diarizing...")
-        diarize_model = whisperx.DiarizationPipeline(use_auth_token=self.HF_TOKEN, device=self.device)
-        diarize_segments = diarize_model(audio)
-        result = whisperx.assign_word_speakers(diarize_segments, transcript)
+        with instrument.span('diarize', device=self.device) as span:
+            diarize_model = _whisperx().DiarizationPipeline(use_auth_token=self.HF_TOKEN, device=self.device)
+            diarize_segments = diarize_model(audio)
+            result = _whisperx().assign_word_speakers(diarize_segments, transcript)
+            span.set_audio_seconds(len(audio) / SAMPLE_RATE)
         return result
 
-    def transcribe_audio(self, audio_path, transcript_path, align=False, diarize=False):
-        """ Transcribe the audio, and optionally align the transcription with the audio and diarize the audio """
+    def _settings(self, align, diarize, transcript_path=None):
+        """ Settings that determine the transcription output, used as part of the store key """
+        settings = {'batch_size': self.batch_size, 'compute_type': self.compute_type,
+                    'align': align, 'diarize': diarize}
+        # Transcripts are stored as saved, so other formats than plain JSON get keys of their own
+        suffix = utils.artifact_suffix(transcript_path) if transcript_path is not None else '.json'
+        if suffix != '.json':
+            settings['format'] = suffix
+        return settings
+
+    def transcribe_audio(self, audio_path, transcript_path, align=False, diarize=False, store=None):
+        """ 
+        Transcribe the audio, and optionally align the transcription with the audio and diarize the audio
+        :param transcript_path: path of the transcript, saved as JSON lines if it ends with .jsonl,
+                                and compressed if it ends with .gz or .zst
+        :param store: ArtifactStore used to skip audio that was already transcribed with the same settings
+        """
+        if store is not None:
+            # The download stage stores the audio, only its hash is needed to key the transcript
+            audio_hash = store.hash(audio_path)
+            stored_transcript = store.get_artifact('transcript', audio_hash, self.trans_model,
+                                                   self._settings(align, diarize, transcript_path))
+            if stored_transcript is not None:
+                print('Found stored transcript...')
+                store.materialize(stored_transcript, transcript_path)
+                return utils.load_transcript(transcript_path)
         # Transcribe audio
         audio = self.load_audio(audio_path)
+        print("Transcribing audio with WhisperX...")
         result = self._transcribe(audio)
         mode = 'transcribed'
         # Align the transcription with the audio
@@ -72,6 +209,249 @@ class WhisperXTranscriber(AudioTranscriber):
 
         result['mode'] = mode
         print('Saving result...')
-        utils.save_json(result, transcript_path)
+        utils.save_transcript(result, transcript_path)
+        if store is not None:
+            store.put_artifact('transcript', audio_hash, self.trans_model,
+                               self._settings(align, diarize, transcript_path), transcript_path)
         
         return result
+
+    def _scan_checkpoint(self, checkpoint_path, header):
+        """ 
+        Reads the completed windows of a checkpoint, keeping only what is needed to resume after them
+        :return: dict with the number of completed windows, the size in bytes of their lines, the language,
+                 the last segment and whether the last window of the audio was completed,
+                 with no windows if the checkpoint does not match header
+        """
+        scan = {'windows': 0, 'size': 0, 'language': None, 'previous': None, 'last': False}
+        if not os.path.exists(checkpoint_path):
+            return scan
+        size = 0
+        with open(checkpoint_path, 'rb') as f:
+            for i, line in enumerate(f):
+                # A partially written last line belongs to an unfinished window
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if i == 0 and record != header:
+                    return scan
+                size += len(line)
+                if i > 0:
+                    scan.update(windows=i, size=size, language=scan['language'] or record['language'],
+                                last=record['last'])
+                    scan['previous'] = record['segments'][-1] if record['segments'] else scan['previous']
+        return scan
+
+    @staticmethod
+    def _iter_checkpoint(checkpoint_path, windows):
+        """ Yields the segments of the first windows of a checkpoint, reading one window at a time """
+        with open(checkpoint_path, 'rb') as f:
+            next(f)
+            for _ in range(windows):
+                yield from json.loads(next(f))['segments']
+
+    def _checkpoint_header(self, audio_path, window_seconds, align, overlap_seconds=0, store=None):
+        """ Header identifying the job of a checkpoint, including the content of the audio """
+        audio_hash = store.hash(audio_path) if store is not None else hash_file(audio_path)
+        return {'audio_hash': audio_hash, 'trans_model': self.trans_model,
+                'window_seconds': window_seconds, 'overlap_seconds': overlap_seconds, 'align': align}
+
+    def transcribe_stream(self, audio_path, checkpoint_path, window_seconds=600, align=False, overlap_seconds=5,
+                          store=None):
+        """ 
+        Transcribe the audio window by window, yielding segments as each window is finalised.
+        Every window is decoded with overlap_seconds of audio on both sides, and keeps the segments
+        whose midpoint falls in the window itself, so segments crossing a boundary are transcribed whole, once.
+        Every completed window is appended to checkpoint_path as a JSON line, and a restarted
+        job resumes after the last completed window of the same audio. Peak memory depends only on window_seconds.
+        :param audio_path: path of the audio
+        :param checkpoint_path: path of the JSON lines checkpoint
+        :param window_seconds: duration of the windows in seconds
+        :param align: whether to align each window with its audio
+        :param overlap_seconds: audio decoded on each side of a window, should exceed half the longest segment
+        :param store: ArtifactStore whose hash cache is reused to hash the audio
+        """
+        header = self._checkpoint_header(audio_path, window_seconds, align, overlap_seconds, store)
+        scan = self._scan_checkpoint(checkpoint_path, header)
+        language, previous, size = scan['language'], scan['previous'], scan['size']
+        if scan['windows']:
+            yield from self._iter_checkpoint(checkpoint_path, scan['windows'])
+        if scan['last']:
+            return
+        if size:
+            # Drop a partially written window before appending
+            os.truncate(checkpoint_path, size)
+        index = scan['windows']
+        with open(checkpoint_path, 'a' if size else 'w') as f:
+            if not size:
+                f.write(json.dumps(header) + '\n')
+            while True:
+                core_start = index * window_seconds
+                start = max(0, core_start - overlap_seconds)
+                duration = core_start - start + window_seconds + overlap_seconds
+                print(f"Transcribing window {index} starting at {core_start} s...")
+                audio = self.load_audio_window(audio_path, start, duration)
+                # A window shorter than requested reaches the end of the audio and owns all of it,
+                # with a tolerance for decoders that return a few samples less than requested
+                last = len(audio) < int(duration * SAMPLE_RATE) - SAMPLE_RATE // 10
+                end = int(start * SAMPLE_RATE) + len(audio)
+                core_end = end if last else int((core_start + window_seconds) * SAMPLE_RATE)
+                chunk = chunking.AudioChunk(int(start * SAMPLE_RATE), end, int(core_start * SAMPLE_RATE), core_end)
+                segments = []
+                if chunk.core_end > chunk.core_start:
+                    result = self._transcribe(audio, language, window=index)
+                    language = language or result['language']
+                    if align and result['segments']:
+                        result = self._align(audio, {**result, 'language': language})
+                    segments = chunking.merge_segments(chunk, [{'start': segment['start'], 'end': segment['end'],
+                                                                'text': segment['text']}
+                                                               for segment in result['segments']],
+                                                       SAMPLE_RATE, previous)
+                    previous = segments[-1] if segments else previous
+                f.write(json.dumps({'window': index, 'language': language,
+                                    'segments': segments, 'last': last}) + '\n')
+                f.flush(); os.fsync(f.fileno())
+                yield from segments
+                if last:
+                    break
+                index += 1
+
+    def transcribe_audio_streaming(self, audio_path, transcript_path, checkpoint_path=None,
+                                   window_seconds=600, align=False, overlap_seconds=5, store=None):
+        """ 
+        Transcribe the audio with transcribe_stream, writing the segments of each window to the transcript
+        as it is finalised, so they are never all held in memory. The transcript is written to a temporary
+        file that replaces it once every window is done.
+        :param checkpoint_path: path of the checkpoint, defaults to the transcript path with a .partial.jsonl suffix
+        :param store: ArtifactStore whose hash cache is reused to hash the audio
+        :return: info of the transcript, i.e. its language and mode, and its number of segments as segment_count
+        """
+        if checkpoint_path is None:
+            checkpoint_path = str(transcript_path) + '.partial.jsonl'
+        info = {'language': None, 'mode': 'aligned' if align else 'transcribed'}
+
+        def segments():
+            yield from self.transcribe_stream(audio_path, checkpoint_path, window_seconds, align, overlap_seconds, store)
+            # The language is detected on the first window and recorded with every window
+            with open(checkpoint_path, 'rb') as f:
+                next(f)
+                info['language'] = json.loads(next(f))['language']
+
+        count = utils.save_segments(segments(), info, transcript_path)
+        os.remove(checkpoint_path)
+        return {**info, 'segment_count': count}
+
+    def _timed_load_audio(self, audio_path):
+        """ Load audio from path and measure the decoding time """
+        start = time.perf_counter()
+        audio = self.load_audio(audio_path)
+        return audio, time.perf_counter() - start
+
+    def _prefetch_audio(self, audio_paths, decode_workers, prefetch):
+        """ 
+        Yield (audio path, future of (audio, decoding time)) in order, decoding up to prefetch
+        upcoming files on a thread pool while the caller works on the current one
+        """
+        with ThreadPoolExecutor(max_workers=decode_workers) as executor:
+            pending = deque()
+            for audio_path in audio_paths:
+                pending.append((audio_path, executor.submit(self._timed_load_audio, audio_path)))
+                if len(pending) > prefetch:
+                    yield pending.popleft()
+            while pending:
+                yield pending.popleft()
+
+    def transcribe_many(self, episodes, align=False, decode_workers=2, prefetch=2):
+        """ 
+        Transcribe several episodes with the model kept resident, decoding upcoming audio
+        on a thread pool while the current episode runs inference. Each transcript is aligned
+        with the audio decoded for its transcription, and saved as soon as it is final; the
+        align models stay resident in the registry, so each language's model is loaded once.
+        An episode that fails is reported with its error, and the others are still transcribed.
+        :param episodes: list of (audio path, transcript path), the same audio may be saved to several paths
+        :param align: whether to align the transcriptions with the audio
+        :param decode_workers: number of threads decoding audio
+        :param prefetch: number of episodes decoded ahead of inference
+        :return: report with the per-episode and aggregate real-time factor
+        """
+        wall_start = time.perf_counter()
+        episodes = list(episodes)
+        transcript_paths = {}
+        for audio_path, transcript_path in episodes:
+            transcript_paths.setdefault(audio_path, []).append(transcript_path)
+        reports = {}
+        # Load the model while the first episodes are decoded
+        self._load_model()
+        for audio_path, decoded in self._prefetch_audio(transcript_paths, decode_workers, prefetch):
+            report = reports[audio_path] = {'audio_path': str(audio_path), 'language': None,
+                                            'audio_seconds': 0.0, 'decode_seconds': 0.0,
+                                            'transcribe_seconds': 0.0, 'align_seconds': 0.0,
+                                            'rtf': None, 'error': None}
+            try:
+                audio, report['decode_seconds'] = decoded.result()
+                report['audio_seconds'] = len(audio) / SAMPLE_RATE
+                print(f"Transcribing {audio_path} with WhisperX...")
+                start = time.perf_counter()
+                result = self._transcribe(audio, path=str(audio_path))
+                result['mode'] = 'transcribed'
+                report['language'] = result['language']
+                report['transcribe_seconds'] = time.perf_counter() - start
+                if align:
+                    start = time.perf_counter()
+                    result = {**self._align(audio, result), 'language': result['language'], 'mode': 'aligned'}
+                    report['align_seconds'] = time.perf_counter() - start
+                del audio
+                for transcript_path in transcript_paths[audio_path]:
+                    utils.save_transcript(result, transcript_path)
+            except Exception as e:
+                print(f"Failed to transcribe {audio_path}: {e!r}")
+                report['error'] = repr(e)
+                continue
+            report['rtf'] = ((report['transcribe_seconds'] + report['align_seconds']) / report['audio_seconds']
+                             if report['audio_seconds'] else 0.0)
+        wall_time = time.perf_counter() - wall_start
+        audio_seconds = sum(report['audio_seconds'] for report in reports.values() if report['error'] is None)
+        return {'episodes': [{**reports[audio_path], 'transcript_path': str(transcript_path)}
+                             for audio_path, transcript_path in episodes],
+                'audio_seconds': audio_seconds,
+                'wall_seconds': wall_time,
+                'failed': sum(report['error'] is not None for report in reports.values()),
+                'rtf': wall_time / audio_seconds if audio_seconds else 0.0}
+
+    def transcribe_audio_parallel(self, audio_path, transcript_path, processes=None,
+                                  chunk_seconds=300, overlap_seconds=5, language=None):
+        """ 
+        Transcribe the audio on CPU with a process pool. The audio is split into overlapping
+        chunks at silences, the chunks are transcribed in parallel, and the segments are merged
+        with the overlap deduplicated and timestamps kept monotonic.
+        :param processes: number of worker processes, defaults to the number of cores
+        :param chunk_seconds: target duration of the chunks in seconds
+        :param overlap_seconds: overlap between neighbouring chunks in seconds
+        :param language: language code, detected per chunk if None
+        """
+        if self.device != 'cpu':
+            raise ValueError("Parallel transcription is only supported with device='cpu'")
+        processes = processes or os.cpu_count() or 1
+        audio = self.load_audio(audio_path)
+        chunks = chunking.plan_chunks(audio, SAMPLE_RATE, chunk_seconds, overlap_seconds)
+        print(f"Transcribing {len(chunks)} chunks with {processes} processes...")
+        # Share the cores between the processes instead of oversubscribing them
+        threads = max(1, (os.cpu_count() or 1) // processes)
+        # The workers cannot report spans, so the span covers the whole pool
+        with instrument.span('transcribe', model=self.trans_model, device=self.device,
+                             processes=processes, chunks=len(chunks)) as span, \
+                ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                    initargs=(self.trans_model, self.compute_type, threads)) as executor:
+            results = list(executor.map(_transcribe_chunk, [(audio[chunk.start:chunk.end], self.batch_size, language)
+                                                             for chunk in chunks]))
+            span.set_audio_seconds(len(audio) / SAMPLE_RATE)
+        segments = chunking.merge_chunk_segments(chunks, [result['segments'] for result in results], SAMPLE_RATE)
+        if language is None:
+            language = Counter(result['language'] for result in results).most_common(1)[0][0]
+        result = {'segments': segments, 'language': language, 'mode': 'transcribed'}
+        print('Saving result...')
+        utils.save_transcript(result, transcript_path)
+        return result
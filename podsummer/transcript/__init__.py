@@ -1,3 +1,5 @@
-from podsummer.transcript import transcript
+from podsummer._lazy import lazy_submodules
 
-__all__ = ['transcript']
\ No newline at end of file
+__all__ = ['segments', 'binary', 'transcript']
+
+__getattr__, __dir__ = lazy_submodules(__name__, __all__)
@@ -0,0 +1,95 @@
+from array import array
+import json, mmap, os, struct, sys
+
+from podsummer import utils
+from podsummer.transcript.segments import SegmentTable
+
+MAGIC = b'PSTRANS\x00'
+VERSION = 1
+EXTENSION = '.pst'
+# magic, version, flags, number of segments, text blob size, info size
+HEADER = struct.Struct('<8sIIQQQ')
+
+
+def is_binary_transcript(path) -> bool:
+    """ Checks whether the file in path is a binary transcript """
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _as_little_endian(values: array) -> bytes:
+    """ Returns the bytes of values in little-endian order """
+    if sys.byteorder == 'little':
+        return values.tobytes()
+    values = array(values.typecode, values)
+    values.byteswap()
+    return values.tobytes()
+
+
+def save_binary(table: SegmentTable, info: dict, path) -> None:
+    """
+    Saves a segment table in the binary transcript format:
+    a fixed-size header, the start, end and offset tables, the UTF-8 text blob
+    and the transcript info as JSON.
+    The file is replaced atomically, so transcripts memory-mapped from it, even by the caller, stay intact.
+    """
+    info_bytes = json.dumps(info).encode('utf-8')
+    tmp_path = utils.temporary_path(path)
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, len(table), len(table.blob), len(info_bytes)))
+            f.write(_as_little_endian(array('d', table.starts)))
+            f.write(_as_little_endian(array('d', table.ends)))
+            f.write(_as_little_endian(array('Q', table.offsets)))
+            f.write(table.blob)
+            f.write(info_bytes)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_binary(path) -> tuple:
+    """
+    Memory-maps a binary transcript
+    :return: (SegmentTable backed by the mapped file, transcript info)
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, _, n, blob_size, info_size = HEADER.unpack_from(mapped)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not a version {VERSION} binary transcript')
+    view = memoryview(mapped)
+    starts_at = HEADER.size
+    ends_at = starts_at + 8 * n
+    offsets_at = ends_at + 8 * n
+    blob_at = offsets_at + 8 * (n + 1)
+    info_at = blob_at + blob_size
+    if sys.byteorder == 'little':
+        starts = view[starts_at:ends_at].cast('d')
+        ends = view[ends_at:offsets_at].cast('d')
+        offsets = view[offsets_at:blob_at].cast('Q')
+    else:
+        starts, ends, offsets = array('d'), array('d'), array('Q')
+        for values, a, b in ((starts, starts_at, ends_at), (ends, ends_at, offsets_at), (offsets, offsets_at, blob_at)):
+            values.frombytes(view[a:b])
+            values.byteswap()
+    info = json.loads(bytes(view[info_at:info_at + info_size])) if info_size else {}
+    return SegmentTable(starts, ends, offsets, view[blob_at:info_at]), info
+
+
+def json_to_binary(json_path, binary_path) -> None:
+    """ Converts a JSON or JSON lines transcript to the binary transcript format """
+    raw = utils.load_transcript(json_path)
+    info = {key: value for key, value in raw.items() if key not in ('segments', 'word_segments')}
+    save_binary(SegmentTable.from_segments(raw['segments']), info, binary_path)
+
+
+def binary_to_json(binary_path, json_path) -> None:
+    """ Converts a binary transcript to a JSON or JSON lines transcript, according to the suffix of json_path """
+    table, info = load_binary(binary_path)
+    utils.save_transcript({**info, 'segments': [table.segment(i) for i in range(len(table))]}, json_path)
@@ -0,0 +1,61 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Optional
+
+
+class SegmentTable:
+    """
+    Columnar table of transcript segments.
+    Start and end times are float arrays, and the texts are stored in a single
+    UTF-8 buffer addressed by byte offsets, so a segment costs 24 bytes plus its text.
+    """
+
+    __slots__ = ('starts', 'ends', 'offsets', 'blob')
+
+    def __init__(self, starts, ends, offsets, blob) -> None:
+        """
+        Initialises SegmentTable
+        :param starts: start times of the segments in seconds
+        :param ends: end times of the segments in seconds
+        :param offsets: byte offsets of the segment texts in blob, one more than the segments
+        :param blob: UTF-8 encoded texts of the segments
+        """
+        if not (len(starts) == len(ends) == len(offsets) - 1):
+            raise ValueError('Starts, ends and offsets have inconsistent lengths')
+        self.starts, self.ends, self.offsets, self.blob = starts, ends, offsets, blob
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[dict]) -> 'SegmentTable':
+        """ Builds a SegmentTable from dicts with start, end and text """
+        starts, ends, offsets, blob = array('d'), array('d'), array('Q', [0]), bytearray()
+        for segment in segments:
+            starts.append(segment['start'])
+            ends.append(segment['end'])
+            blob += segment['text'].encode('utf-8')
+            offsets.append(len(blob))
+        return cls(starts, ends, offsets, bytes(blob))
+
+    def __len__(self):
+        """ Number of segments """
+        return len(self.starts)
+
+    def text(self, i: int) -> str:
+        """ Returns the text of segment i """
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+    def segment(self, i: int) -> dict:
+        """ Returns segment i as a dict with start, end and text """
+        return {'start': self.starts[i], 'end': self.ends[i], 'text': self.text(i)}
+
+    def index_at(self, time: float) -> Optional[int]:
+        """ Returns the index of the segment that contains time, or None, in O(log n) """
+        i = bisect_right(self.starts, time) - 1
+        if i >= 0 and time <= self.ends[i]:
+            return i
+        return None
+
+    def range_indices(self, start_time: float, end_time: float) -> tuple:
+        """ Returns the index range [lo, hi) of the segments overlapping [start_time, end_time) """
+        lo = bisect_right(self.ends, start_time)
+        hi = bisect_left(self.starts, end_time)
+        return lo, max(lo, hi)
@@ -1,7 +1,10 @@
+from functools import cached_property
 from pathlib import Path
 import os, json
 
-from podsummer import utils
+from podsummer import instrument, utils
+from podsummer.transcript.segments import SegmentTable
+from podsummer.transcript.binary import is_binary_transcript, load_binary, save_binary
 
 
 class Transcript:
@@ -9,6 +12,7 @@ class Transcript:
 
     def __init__(self, path=None, raw=None):
         """ Loads Trascript from path """
+        self._table, self._lo, self._hi, self.info = None, 0, 0, {}
         if path is None and raw is None:
             raise ValueError('Either path or file must be specified')
         elif path is not None:
@@ -16,33 +20,146 @@ class Transcript:
             self._load_transcript_from_path(path)
         elif raw is not None:
             self._load_transcript_from_raw(raw)
-    
+
+    @classmethod
+    def _from_table(cls, table: SegmentTable, lo: int, hi: int, info: dict) -> 'Transcript':
+        """ Creates a Transcript over segments lo..hi of table, without copying them """
+        transcript = cls.__new__(cls)
+        transcript._table, transcript._lo, transcript._hi, transcript.info = table, lo, hi, info
+        return transcript
+
+    def __len__(self):
+        """ Number of segments """
+        return self._hi - self._lo
+
     def _load_transcript_from_path(self, path : str) -> [str, dict]:
         """ Loads the transcript from path """
-        _, extension = os.path.splitext(path)
-        if extension == '.txt':
+        with instrument.span('transcript_load', path=str(path)) as span:
+            span.add_bytes(os.path.getsize(path))
+            self._load_transcript_from_file(path)
+
+    def _load_transcript_from_file(self, path : str) -> None:
+        """ Loads the transcript from path according to its format """
+        extension = utils.artifact_format(path)
+        if is_binary_transcript(path):
+            self._table, self.info = load_binary(path)
+            self._lo, self._hi = 0, len(self._table)
+        elif extension == '.txt':
             self.raw = utils.load_text(path)
             self.text = self.raw
         elif extension == '.json':
-            self.raw = utils.load_json(path)
-            self._extract_data_from_dict_raw()
+            self._extract_data_from_dict_raw(utils.load_json(path))
+        elif extension == '.jsonl':
+            # Segments go straight from the file into the table, without a list of dicts
+            self.info = {}
+            self._table = SegmentTable.from_segments(utils.iter_segments(path, self.info))
+            self._lo, self._hi = 0, len(self._table)
         else:
             raise ValueError('File type not supported')
 
     def _load_transcript_from_raw(self, raw):
         """ Loads the transcript from raw """
-        self.raw = raw
         if isinstance(raw, str):
+            self.raw = raw
             self.text = raw
         elif isinstance(raw, dict):
-            self._extract_data_from_dict_raw()
+            self._extract_data_from_dict_raw(raw)
         else:
             raise ValueError('Raw type not supported')
 
-    def _extract_data_from_dict_raw(self):
-        """ Extract data from dict raw """
-        if isinstance(self.raw, dict):
-            self.segments = [{'start': segment['start'], 'end': segment['end'],
-                               'text': segment['text']} for segment in self.raw['segments']]
-            self.text = ' '.join([segment['text'] for segment in self.segments])
-            self.timed_text = '\n '.join([f"{segment['start']} {segment['text']} {segment['end']}" for segment in self.segments])
+    def _extract_data_from_dict_raw(self, raw):
+        """ Extract data from dict raw into the columnar segment table """
+        if isinstance(raw, dict):
+            self._table = SegmentTable.from_segments(raw['segments'])
+            self._lo, self._hi = 0, len(self._table)
+            self.info = {key: value for key, value in raw.items() if key not in ('segments', 'word_segments')}
+
+    @property
+    def raw(self):
+        """ Raw transcript, rebuilt from the segment table for dict transcripts """
+        if self._table is None:
+            return getattr(self, '_raw', None)
+        return {**self.info, 'segments': self.segments}
+
+    @raw.setter
+    def raw(self, value):
+        """ Sets the raw text transcript """
+        self._raw = value
+
+    @property
+    def timed(self) -> bool:
+        """ Whether the transcript has timed segments, unlike plain text transcripts """
+        return self._table is not None
+
+    def _check_timed(self) -> None:
+        """ Raises ValueError for plain text transcripts, which have no segment times """
+        if self._table is None:
+            raise ValueError('Only timed transcripts have segment times, use text for plain text transcripts')
+
+    @cached_property
+    def segments(self) -> list:
+        """ Segments as a list of dicts with start, end and text, built on first access """
+        return list(self.iter_segments())
+
+    def iter_segments(self):
+        """ Iterates over the segments as dicts with start, end and text, without keeping them """
+        if self._table is None:
+            return
+        for i in range(self._lo, self._hi):
+            yield self._table.segment(i)
+
+    @property
+    def starts(self) -> memoryview:
+        """ Start times of the segments, as a zero-copy view """
+        self._check_timed()
+        return memoryview(self._table.starts)[self._lo:self._hi]
+
+    @property
+    def ends(self) -> memoryview:
+        """ End times of the segments, as a zero-copy view """
+        self._check_timed()
+        return memoryview(self._table.ends)[self._lo:self._hi]
+
+    def iter_texts(self):
+        """ Iterates over the texts of the segments """
+        self._check_timed()
+        for i in range(self._lo, self._hi):
+            yield self._table.text(i)
+
+    @cached_property
+    def text(self) -> str:
+        """ Text of the transcript, built on first access """
+        return ' '.join(self.iter_texts())
+
+    @cached_property
+    def timed_text(self) -> str:
+        """ Text of the transcript with segment start and end times, built on first access """
+        self._check_timed()
+        table = self._table
+        return '\n '.join([f"{table.starts[i]} {table.text(i)} {table.ends[i]}" for i in range(self._lo, self._hi)])
+
+    def segment_at(self, time: float):
+        """ Returns the segment that contains time, or None """
+        if self._table is None:
+            return None
+        i = self._table.index_at(time)
+        if i is None or not self._lo <= i < self._hi:
+            return None
+        return self._table.segment(i)
+
+    def save_binary(self, path) -> None:
+        """ Saves the transcript in the memory-mappable binary format """
+        if self._table is None:
+            raise ValueError('Only timed transcripts can be saved in binary format')
+        table = self._table
+        if (self._lo, self._hi) != (0, len(table)):
+            table = SegmentTable.from_segments(self.iter_segments())
+        save_binary(table, self.info, path)
+
+    def slice(self, start_time: float, end_time: float) -> 'Transcript':
+        """ Returns the transcript of the segments overlapping [start_time, end_time), sharing its storage """
+        if self._table is None:
+            raise ValueError('Only timed transcripts can be sliced')
+        lo, hi = self._table.range_indices(start_time, end_time)
+        lo, hi = max(lo, self._lo), min(hi, self._hi)
+        return Transcript._from_table(self._table, lo, max(lo, hi), self.info)
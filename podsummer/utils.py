@@ -1,4 +1,5 @@
-import requests, json, re
+import gzip, io, json, re, os, random, shutil, threading
+from pathlib import Path
 
 
 def load_text(text_path):
@@ -11,16 +12,263 @@ def save_text(text, text_path):
     with open(text_path, "w") as f:
         f.write(text)
 
-def save_json(file, file_path):
-    """ Saves JSON file """
-    with open(file_path, 'w') as f:
-        json.dump(file, f, indent=4) 
+COMPRESSION_SUFFIXES = ('.gz', '.zst')
+ZSTANDARD_MISSING = "Reading or writing .zst files requires zstandard, install it with: pip install zstandard"
+
+def _zstandard():
+    """ Imports zstandard, which is only needed for .zst files """
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(ZSTANDARD_MISSING) from None
+    return zstandard
+
+def compression_suffix(path):
+    """ Returns the compression suffix of path, '.gz' or '.zst', or '' if it is not compressed """
+    return next((suffix for suffix in COMPRESSION_SUFFIXES if str(path).endswith(suffix)), '')
+
+def open_artifact(path, mode='r', level=None, compression=None):
+    """
+    Opens a text file, compressed with gzip if path ends with .gz or with zstd if it ends with .zst
+    :param mode: 'r', 'w' or 'a', appending to a compressed file adds a new gzip member or zstd frame
+    :param level: compression level, defaults to 6 for gzip and 3 for zstd
+    :param compression: compression suffix used instead of the one of path, e.g. for temporary files
+    """
+    path = str(path)
+    compression = compression_suffix(path) if compression is None else compression
+    if compression == '.gz':
+        return gzip.open(path, mode + 't', compresslevel=level or 6, encoding='utf-8')
+    if compression == '.zst':
+        zstandard = _zstandard()
+        if mode == 'r':
+            stream = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True)
+        else:
+            stream = zstandard.ZstdCompressor(level=level or 3).stream_writer(open(path, mode + 'b'))
+        return io.TextIOWrapper(stream, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def artifact_suffix(path):
+    """ Returns the suffix of path including its compression suffix, e.g. '.jsonl.gz' for transcript.jsonl.gz """
+    name, compression = Path(path).name, ''
+    for suffix in COMPRESSION_SUFFIXES:
+        if name.endswith(suffix):
+            name, compression = name[:-len(suffix)], suffix
+    return os.path.splitext(name)[1] + compression
+
+def artifact_format(path):
+    """ Returns the suffix of path without its compression suffix, e.g. '.jsonl' for transcript.jsonl.gz """
+    suffix = artifact_suffix(path)
+    for compression in COMPRESSION_SUFFIXES:
+        if suffix.endswith(compression):
+            return suffix[:-len(compression)]
+    return suffix
+
+def save_json(file, file_path, indent=None):
+    """ 
+    Saves JSON file, compact unless indent is given, and compressed according to its suffix.
+    The file is replaced atomically, so readers never see a partial file and hard links to the old file are left intact.
+    """
+    separators = (',', ':') if indent is None else None
+    tmp_path = temporary_path(file_path)
+    try:
+        with open_artifact(tmp_path, 'w', compression=compression_suffix(file_path)) as f:
+            json.dump(file, f, indent=indent, separators=separators, ensure_ascii=False)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
 
 def load_json(file_path):
-    """ Loads JSON file """
-    with open(file_path, 'r') as f:
+    """ Loads JSON file, compact or indented, and compressed according to its suffix """
+    with open_artifact(file_path) as f:
         return json.load(f)
 
+def _truncation_errors(path):
+    """ Exceptions raised when reading a compressed file that was cut off while it was being written """
+    if compression_suffix(path) == '.zst':
+        return (EOFError, _zstandard().ZstdError)
+    return (EOFError,)
+
+def iter_jsonl(file_path):
+    """ Yields the objects of a JSON lines file lazily, stopping at a partially written last line """
+    with open_artifact(file_path) as f:
+        try:
+            for line in f:
+                if not line.endswith('\n'):
+                    break
+                yield json.loads(line)
+        except _truncation_errors(file_path):
+            # A compressed file cut off while it was being appended to
+            return
+
+def _unshare(path):
+    """ Replaces the file in path with a copy of its own, leaving its other hard links intact """
+    tmp_path = temporary_path(path)
+    try:
+        shutil.copy2(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+class SegmentWriter:
+    """
+    Writes a transcript as JSON lines, one segment per line, so segments can be appended as
+    they are produced and read back lazily with iter_segments.
+    Transcript info, e.g. the language, is written on lines of the form {"info": {...}},
+    which may appear anywhere and are merged in order.
+    A new file is written to a temporary path and renamed when the writer is closed,
+    so an interrupted transcript never appears complete.
+    """
+
+    def __init__(self, path, info=None, append=False, level=None):
+        """
+        Initialises SegmentWriter
+        :param path: path of the .jsonl file, optionally ending with .gz or .zst
+        :param info: transcript info written on the first line
+        :param append: whether to append to an existing file in place instead of replacing it
+        :param level: compression level
+        """
+        self.path = path
+        if append and os.path.exists(path) and os.stat(path).st_nlink > 1:
+            # The file shares its inode with a stored object, which appending in place would alter
+            _unshare(path)
+        self._tmp_path = None if append else temporary_path(path)
+        self._file = open_artifact(path if append else self._tmp_path, 'a' if append else 'w', level,
+                                   compression=compression_suffix(path))
+        if info:
+            self.write_info(info)
+
+    def __repr__(self):
+        """ Representation of SegmentWriter Object """
+        return f"""SegmentWriter[Path = {self.path}]"""
+
+    def _write(self, record):
+        """ Writes a record as one JSON line """
+        self._file.write(json.dumps(record, separators=(',', ':'), ensure_ascii=False) + '\n')
+
+    def write_info(self, info):
+        """ Writes transcript info, merged over the info written before """
+        self._write({'info': info})
+
+    def write_segment(self, segment):
+        """ Writes a segment """
+        self._write(segment)
+
+    def write_segments(self, segments):
+        """ Writes segments from an iterable """
+        for segment in segments:
+            self._write(segment)
+
+    def flush(self):
+        """ Flushes the written lines to the file """
+        self._file.flush()
+
+    def close(self):
+        """ Closes the file, moving a new file into place """
+        self._file.close()
+        if self._tmp_path is not None:
+            os.replace(self._tmp_path, self.path)
+            self._tmp_path = None
+
+    def discard(self):
+        """ Closes the file, deleting a new file instead of moving it into place """
+        self._file.close()
+        if self._tmp_path is not None:
+            os.remove(self._tmp_path)
+            self._tmp_path = None
+
+    def __enter__(self):
+        """ Returns the writer, closed when the block exits """
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        """ Closes the writer, or discards a new file if the block raised """
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+def iter_segments(file_path, info=None):
+    """
+    Yields the segments of a JSON lines transcript lazily
+    :param info: dict updated with the info lines as they are read
+    """
+    for record in iter_jsonl(file_path):
+        if 'info' in record:
+            if info is not None:
+                info.update(record['info'])
+        else:
+            yield record
+
+def save_transcript(result, file_path):
+    """
+    Saves a transcript in the format of its suffix: JSON lines for .jsonl, JSON otherwise,
+    compressed if the suffix ends with .gz or .zst. JSON lines transcripts leave out
+    word_segments, which repeat the words of the segments.
+    """
+    if artifact_format(file_path) != '.jsonl':
+        return save_json(result, file_path)
+    info = {key: value for key, value in result.items() if key not in ('segments', 'word_segments')}
+    with SegmentWriter(file_path, info) as writer:
+        writer.write_segments(result['segments'])
+
+def save_segments(segments, info, file_path):
+    """
+    Saves a transcript from an iterable of segments, in the format of its suffix like save_transcript,
+    without holding the segments in memory. info is read once every segment is written,
+    so it may be filled in while the segments are produced
+    :return: number of segments written
+    """
+    count = 0
+    if artifact_format(file_path) == '.jsonl':
+        with SegmentWriter(file_path) as writer:
+            for segment in segments:
+                writer.write_segment(segment)
+                count += 1
+            writer.write_info(info)
+        return count
+    tmp_path = temporary_path(file_path)
+    try:
+        with open_artifact(tmp_path, 'w', compression=compression_suffix(file_path)) as f:
+            f.write('{"segments":[')
+            for segment in segments:
+                f.write((',' if count else '') + json.dumps(segment, separators=(',', ':'), ensure_ascii=False))
+                count += 1
+            f.write(']')
+            for key, value in info.items():
+                f.write(f",{json.dumps(key)}:{json.dumps(value, separators=(',', ':'), ensure_ascii=False)}")
+            f.write('}')
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    return count
+
+def load_transcript(file_path):
+    """ Loads a transcript saved with save_transcript, or a JSON transcript """
+    if artifact_format(file_path) != '.jsonl':
+        return load_json(file_path)
+    info = {}
+    segments = list(iter_segments(file_path, info))
+    return {**info, 'segments': segments}
+
+def temporary_path(path):
+    """ Returns a temporary path next to path, unique to the calling process and thread """
+    path = Path(path)
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+def backoff_delays(initial=0.1, maximum=5.0, factor=2.0, jitter=0.5):
+    """
+    Yields exponentially growing delays between polls, capped at maximum.
+    Every delay is scaled down by a random fraction up to jitter, so concurrent pollers spread out.
+    """
+    delay = initial
+    while True:
+        yield delay * (1 - random.uniform(0, jitter))
+        delay = min(delay * factor, maximum)
+
 def to_filename(text):
     """
     Takes a text as an input and returns a string
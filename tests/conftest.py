@@ -0,0 +1,145 @@
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+import threading
+
+import pytest
+
+
+def rss_feed(episodes, title: str = "Test Show", enclosure_url: str = "http://127.0.0.1/audio.mp3") -> bytes:
+    """
+    Returns an RSS feed listing episodes newest first
+    :param episodes: (guid, title, publication timestamp) tuples, oldest first
+    """
+    items = ''.join(f'<item><title>{escape(episode_title)}</title><guid>{escape(guid)}</guid>'
+                    f'<pubDate>{formatdate(published, usegmt=True)}</pubDate>'
+                    f'<enclosure url="{escape(enclosure_url)}" length="0" type="audio/mpeg"/></item>\n'
+                    for guid, episode_title, published in reversed(list(episodes)))
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd"><channel>\n'
+            f'<title>{escape(title)}</title><link>http://127.0.0.1/</link>'
+            f'<image><url>http://127.0.0.1/cover.png</url><title>{escape(title)}</title></image>'
+            f'<itunes:author>Test Host</itunes:author>\n{items}</channel></rss>\n').encode('utf-8')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """ Serves the files of a FakeServer, answering conditional requests with 304 """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server.fake
+        name = self.path.split('?')[0].lstrip('/')
+        with server.lock:
+            server.requests.append((name, dict(self.headers)))
+            entry = server.files.get(name)
+        if entry is None:
+            self.send_error(404)
+            return
+        content, etag, modified, content_type = entry
+        if etag is not None and self.headers.get('If-None-Match') == etag or \
+                etag is None and modified is not None and self.headers.get('If-Modified-Since') == modified:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+        if modified is not None:
+            self.send_header('Last-Modified', modified)
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class FakeServer:
+    """ Local HTTP server of in-memory files with optional ETag and Last-Modified validators """
+
+    def __init__(self) -> None:
+        self.files = {}
+        self.requests = []
+        self.lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+
+    def put(self, name: str, content: bytes, etag: str = None, modified: str = None,
+            content_type: str = 'application/octet-stream') -> str:
+        """ Serves content at name, returning its URL """
+        with self.lock:
+            self.files[name] = (content, etag, modified, content_type)
+        return self.url(name)
+
+    def url(self, name: str) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/{name}"
+
+    def count(self, name: str) -> int:
+        """ Number of requests received for name """
+        with self.lock:
+            return sum(1 for requested, _ in self.requests if requested == name)
+
+    def start(self) -> 'FakeServer':
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def close(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def fake_server():
+    server = FakeServer().start()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """ Runs the test in a temporary directory, where content/ is created """
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+class FakeWhisperModel:
+    """
+    Transcription model for audio whose samples hold their own time in seconds, or are silent:
+    it returns one segment per whole second that lies entirely in the audio
+    """
+
+    def transcribe(self, audio, batch_size=16, language=None):
+        import math
+        import numpy as np
+        sound = int(np.flatnonzero(audio)[0])
+        first = float(audio[sound]) - sound / 16000
+        last = first + len(audio) / 16000
+        segments = [{'start': second - first, 'end': second + 1 - first, 'text': f" second {second}"}
+                    for second in range(math.ceil(first - 1e-3), math.floor(last + 1e-3))
+                    if second + 1 <= last + 1e-3]
+        return {'segments': segments, 'language': language or 'en'}
+
+
+def timed_audio(seconds: float, start: float = 0.0):
+    """ Audio at 16 kHz whose samples hold their own time in seconds """
+    import numpy as np
+    return (np.arange(int(start * 16000), int((start + seconds) * 16000)) / 16000).astype(np.float32)
+
+
+@pytest.fixture
+def fake_whisperx(monkeypatch):
+    """ Installs a stand-in whisperx module whose models are FakeWhisperModel """
+    import importlib.machinery, sys, types
+    module = types.ModuleType('whisperx')
+    module.__spec__ = importlib.machinery.ModuleSpec('whisperx', None)
+    module.loads = []
+
+    def load_model(name, device='cpu', compute_type='int8', **kwargs):
+        module.loads.append(name)
+        return FakeWhisperModel()
+
+    module.load_model = load_model
+    monkeypatch.setitem(sys.modules, 'whisperx', module)
+    return module
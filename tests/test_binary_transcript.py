@@ -0,0 +1,33 @@
+from podsummer import utils
+from podsummer.transcript.binary import binary_to_json, is_binary_transcript, json_to_binary, load_binary
+from podsummer.transcript.transcript import Transcript
+
+RESULT = {'language': 'en', 'mode': 'aligned',
+          'segments': [{'start': 1.5 * i, 'end': 1.5 * i + 1.0, 'text': f" segment {i} héllo"} for i in range(20)]}
+
+
+def test_round_trip(tmp_path):
+    utils.save_transcript(RESULT, tmp_path / 'transcript.json')
+    json_to_binary(tmp_path / 'transcript.json', tmp_path / 'transcript.pst')
+    assert is_binary_transcript(tmp_path / 'transcript.pst')
+    assert not is_binary_transcript(tmp_path / 'transcript.json')
+    table, info = load_binary(tmp_path / 'transcript.pst')
+    assert info == {'language': 'en', 'mode': 'aligned'}
+    assert [table.segment(i) for i in range(len(table))] == RESULT['segments']
+    binary_to_json(tmp_path / 'transcript.pst', tmp_path / 'copy.jsonl')
+    assert utils.load_transcript(tmp_path / 'copy.jsonl') == RESULT
+    assert Transcript(path=str(tmp_path / 'transcript.pst')).raw == RESULT
+
+
+def test_resaving_a_loaded_transcript_to_its_own_path(tmp_path):
+    path = tmp_path / 'transcript.pst'
+    Transcript(raw=RESULT).save_binary(path)
+    transcript = Transcript(path=str(path))
+    # The mapped file must not be truncated under the loaded transcript
+    transcript.save_binary(path)
+    assert transcript.segments == RESULT['segments']
+    part = transcript.slice(6, 12)
+    part.save_binary(path)
+    assert transcript.text == Transcript(raw=RESULT).text
+    assert Transcript(path=str(path)).segments == part.segments
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['transcript.pst']
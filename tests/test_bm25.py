@@ -0,0 +1,75 @@
+import random
+
+from podsummer import utils
+from podsummer.retrieval.bm25 import BM25Index
+
+
+def _save(content, channel, episode, texts):
+    path = content / channel / episode / 'transcript.json'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    utils.save_transcript({'language': 'en', 'segments': [{'start': float(i), 'end': i + 1.0, 'text': text}
+                                                         for i, text in enumerate(texts)]}, path)
+    return path
+
+
+def test_ranking_order(tmp_path):
+    content = tmp_path / 'content'
+    _save(content, 'show', 'one', [" the cat sat on the mat",
+                                   " the cat chased the other cat around the cat tree",
+                                   " a dog barked at the mailman"])
+    _save(content, 'show', 'two', [" the weather today is sunny with a chance of cats",
+                                   " nothing to see here"])
+    index = BM25Index(tmp_path / 'bm25.sqlite')
+    index.update(content)
+    hits = index.search('cat')
+    # More occurrences rank higher, and the plural is another term
+    assert [hit['text'] for hit in hits] == [" the cat chased the other cat around the cat tree",
+                                             " the cat sat on the mat"]
+    assert hits[0]['score'] > hits[1]['score']
+    # A rarer term outweighs a common one
+    assert index.search('the dog', k=1)[0]['text'] == " a dog barked at the mailman"
+    assert [hit['episode'] for hit in index.search('sunny cats')] == ['two']
+    assert index.search('unknown') == []
+    assert index.search('cat', k=0) == []
+
+
+def test_update_indexes_only_new_changed_and_deleted_transcripts(tmp_path):
+    content = tmp_path / 'content'
+    _save(content, 'show', 'one', [" apples and oranges"])
+    deleted = _save(content, 'show', 'two', [" bananas and cherries"])
+    index = BM25Index(tmp_path / 'bm25.sqlite')
+    assert index.update(content) == 2
+    assert index.update(content) == 0
+    _save(content, 'show', 'three', [" grapes"])
+    assert index.update(content) == 1
+    assert [hit['episode'] for hit in index.search('grapes')] == ['three']
+    # A changed transcript replaces its previous version
+    _save(content, 'show', 'one', [" pears and plums", " more pears"])
+    assert index.update(content) == 1
+    assert index.search('apples') == []
+    assert [hit['text'] for hit in index.search('pears')] == [" more pears", " pears and plums"]
+    # A deleted transcript is forgotten
+    deleted.unlink()
+    assert index.update(content) == 0
+    assert index.search('bananas') == []
+    assert index._stat('segments') == 3
+    assert index._db.execute("SELECT df FROM terms WHERE term = 'and'").fetchone()[0] == 1
+
+
+def test_pruned_search_matches_exhaustive_scoring(tmp_path):
+    rng = random.Random(0)
+    vocabulary = [f"w{i}" for i in range(300)]
+    weights = [1 / (i + 1) for i in range(len(vocabulary))]
+    content = tmp_path / 'content'
+    for episode in range(5):
+        _save(content, 'show', f"e{episode}", [' ' + ' '.join(rng.choices(vocabulary, weights, k=rng.randint(5, 30)))
+                                               for _ in range(200)])
+    index = BM25Index(tmp_path / 'bm25.sqlite')
+    index.update(content)
+    for _ in range(50):
+        query = ' '.join(rng.choices(vocabulary, weights, k=rng.randint(1, 6)))
+        # No k segments are found before the last term when k is over the number of segments, so nothing is pruned
+        exhaustive = index.search(query, k=10_000)
+        for k in (1, 5, 20):
+            hits = index.search(query, k=k)
+            assert [round(hit['score'], 9) for hit in hits] == [round(hit['score'], 9) for hit in exhaustive[:k]]
@@ -0,0 +1,70 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import gzip, re, threading
+
+import pytest
+
+from podsummer.media.downloader import RangedDownloader
+
+CONTENT = bytes(range(256)) * 4096
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """ Serves CONTENT, with the range and encoding behaviour selected by the path """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.headers.append(dict(self.headers))
+        match = re.fullmatch(r'bytes=(\d+)-(\d+)', self.headers.get('Range', ''))
+        if self.path == '/ranged' and match:
+            first, last = int(match.group(1)), int(match.group(2))
+            body = CONTENT[first:last + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {first}-{first + len(body) - 1}/{len(CONTENT)}")
+        elif self.path == '/unknown-size' and match:
+            body = CONTENT[:1]
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes 0-0/*')
+        elif self.path == '/gzip' and 'identity' not in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(CONTENT)
+            self.send_response(200)
+            self.send_header('Content-Encoding', 'gzip')
+        else:
+            body = CONTENT
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.daemon_threads = True
+    httpd.headers = []
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _url(server, path):
+    return f"http://127.0.0.1:{server.server_address[1]}/{path}"
+
+
+def test_ranged_download(server, tmp_path):
+    path = RangedDownloader(connections=3, part_size=100_000).download(_url(server, 'ranged'), tmp_path / 'a.mp3')
+    assert path.read_bytes() == CONTENT
+    assert not list(tmp_path.glob('*.part*'))
+
+
+def test_unknown_total_size_streams_without_size_check(server, tmp_path):
+    downloader = RangedDownloader()
+    assert downloader._probe(_url(server, 'unknown-size')) == (None, False, None)
+    assert downloader.download(_url(server, 'unknown-size'), tmp_path / 'a.mp3').read_bytes() == CONTENT
+
+
+def test_requests_unencoded_bodies(server, tmp_path):
+    assert RangedDownloader().download(_url(server, 'gzip'), tmp_path / 'a.mp3').read_bytes() == CONTENT
+    assert all(headers.get('Accept-Encoding') == 'identity' for headers in server.headers)
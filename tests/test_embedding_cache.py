@@ -0,0 +1,75 @@
+import numpy as np
+
+from podsummer import utils
+from podsummer.ragengine import RAGEngine
+from podsummer.retrieval.cache import CachedEmbedder, EmbeddingCache
+from podsummer.retrieval.embedders import HashingEmbedder
+from podsummer.transcript.transcript import Transcript
+
+
+class CountingEmbedder(HashingEmbedder):
+    """ HashingEmbedder recording the texts it embeds """
+
+    def __init__(self, dim=64):
+        super().__init__(dim)
+        self.embedded = []
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        return super().embed(texts)
+
+
+def test_hits_are_not_embedded_again(tmp_path):
+    embedder = CountingEmbedder()
+    cached = CachedEmbedder(embedder, EmbeddingCache(tmp_path / 'embeddings.sqlite'))
+    first = cached.embed(['apples', 'pears', 'apples'])
+    assert embedder.embedded == ['apples', 'pears']
+    assert cached.cache.stats == {"hits": 0, "misses": 2, "evictions": 0}
+    second = cached.embed(['pears', 'plums'])
+    assert embedder.embedded == ['apples', 'pears', 'plums']
+    assert cached.cache.stats["hits"] == 1
+    np.testing.assert_allclose(first, embedder.embed(['apples', 'pears', 'apples']))
+    np.testing.assert_allclose(second[0], first[1])
+    # The cache persists across instances
+    reopened = CachedEmbedder(CountingEmbedder(), EmbeddingCache(tmp_path / 'embeddings.sqlite'))
+    reopened.embed(['apples', 'plums'])
+    assert reopened.embedder.embedded == []
+
+
+def test_another_embedder_id_misses(tmp_path):
+    cache = EmbeddingCache(tmp_path / 'embeddings.sqlite')
+    CachedEmbedder(CountingEmbedder(dim=64), cache).embed(['apples'])
+    other = CachedEmbedder(CountingEmbedder(dim=32), cache)
+    vectors = other.embed(['apples'])
+    assert other.embedder.embedded == ['apples']
+    assert vectors.shape == (1, 32)
+
+
+def test_least_recently_used_embeddings_are_evicted(tmp_path):
+    cached = CachedEmbedder(CountingEmbedder(), EmbeddingCache(tmp_path / 'embeddings.sqlite', max_entries=2))
+    cached.embed(['a'])
+    cached.embed(['b'])
+    cached.embed(['a'])
+    cached.embed(['c'])
+    assert cached.cache.stats["evictions"] == 1
+    cached.embedder.embedded.clear()
+    cached.embed(['a', 'b', 'c'])
+    assert cached.embedder.embedded == ['b']
+
+
+def test_rag_engine_embeds_only_the_changed_chunks(tmp_path):
+    embedder = CountingEmbedder()
+    engine = RAGEngine(embedder=embedder, embedding_cache=tmp_path / 'embeddings.sqlite',
+                       window_seconds=10, overlap_seconds=0)
+    path = tmp_path / 'transcript.json'
+    words = ['apples', 'pears', 'plums']
+    utils.save_transcript({'segments': [{'start': 10.0 * i, 'end': 10.0 * (i + 1) - 1, 'text': f" {word}"}
+                                        for i, word in enumerate(words)]}, path)
+    engine.load_transcript(Transcript(path=str(path)))
+    assert embedder.embedded == words
+    words[1] = 'rockets'
+    utils.save_transcript({'segments': [{'start': 10.0 * i, 'end': 10.0 * (i + 1) - 1, 'text': f" {word}"}
+                                        for i, word in enumerate(words)]}, path)
+    engine.load_transcript(Transcript(path=str(path)))
+    assert embedder.embedded == ['apples', 'pears', 'plums', 'rockets']
+    assert engine.search('rockets', k=1)[0]['text'] == 'rockets'
@@ -0,0 +1,67 @@
+from conftest import rss_feed
+from podsummer.media.feed_cache import FeedCache
+
+MODIFIED = 'Mon, 01 Jan 2024 00:00:00 GMT'
+
+
+def _feed(*titles) -> bytes:
+    return rss_feed([(f"guid-{i}", title, 1_700_000_000 + i) for i, title in enumerate(titles)])
+
+
+def test_etag_is_reused_and_304_serves_the_cached_feed(fake_server, tmp_path):
+    url = fake_server.put('feed.xml', _feed('First'), etag='"v1"')
+    cache = FeedCache(tmp_path)
+    assert cache.parse(url).entries[0].title == 'First'
+    feed = cache.parse(url)
+    assert feed.entries[0].title == 'First'
+    assert fake_server.requests[-1][1].get('If-None-Match') == '"v1"'
+    assert cache.stats == {"hits": 0, "misses": 1, "not_modified": 1}
+
+
+def test_last_modified_is_reused(fake_server, tmp_path):
+    url = fake_server.put('feed.xml', _feed('First'), modified=MODIFIED)
+    cache = FeedCache(tmp_path)
+    cache.parse(url)
+    assert cache.parse(url).entries[0].title == 'First'
+    assert fake_server.requests[-1][1].get('If-Modified-Since') == MODIFIED
+    assert cache.stats["not_modified"] == 1
+
+
+def test_changed_feed_replaces_the_cached_one(fake_server, tmp_path):
+    url = fake_server.put('feed.xml', _feed('First'), etag='"v1"')
+    cache = FeedCache(tmp_path)
+    cache.parse(url)
+    fake_server.put('feed.xml', _feed('First', 'Second'), etag='"v2"')
+    assert [entry.title for entry in cache.parse(url).entries] == ['Second', 'First']
+    assert cache.stats == {"hits": 0, "misses": 2, "not_modified": 0}
+    # The new validator is sent next
+    cache.parse(url)
+    assert fake_server.requests[-1][1].get('If-None-Match') == '"v2"'
+    assert cache.stats["not_modified"] == 1
+
+
+def test_cache_persists_across_instances(fake_server, tmp_path):
+    url = fake_server.put('feed.xml', _feed('First'), etag='"v1"')
+    FeedCache(tmp_path).parse(url)
+    cache = FeedCache(tmp_path)
+    assert cache.parse(url).entries[0].title == 'First'
+    assert cache.stats["not_modified"] == 1
+
+
+def test_ttl_skips_the_network(fake_server, tmp_path):
+    url = fake_server.put('feed.xml', _feed('First'), etag='"v1"')
+    cache = FeedCache(tmp_path, ttl=3600)
+    cache.parse(url)
+    assert cache.parse(url).entries[0].title == 'First'
+    assert fake_server.count('feed.xml') == 1
+    assert cache.stats == {"hits": 1, "misses": 1, "not_modified": 0}
+
+
+def test_invalidate_forces_a_full_fetch(fake_server, tmp_path):
+    url = fake_server.put('feed.xml', _feed('First'), etag='"v1"')
+    cache = FeedCache(tmp_path)
+    cache.parse(url)
+    cache.invalidate(url)
+    cache.parse(url)
+    assert 'If-None-Match' not in fake_server.requests[-1][1]
+    assert cache.stats["misses"] == 2
@@ -0,0 +1,30 @@
+from pathlib import Path
+import json, subprocess, sys
+
+ROOT = Path(__file__).resolve().parent.parent
+BUDGET_SECONDS = 0.5
+HEAVY_MODULES = ['torch', 'whisperx', 'feedparser', 'pytube', 'fuzzywuzzy', 'openai', 'numpy', 'requests']
+
+
+def _import(statements: str) -> dict:
+    """ Runs statements in a fresh interpreter, returning their duration and the heavy modules they imported """
+    script = f"""
+import json, sys, time
+start = time.perf_counter()
+{statements}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'heavy': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+    return json.loads(subprocess.run([sys.executable, '-c', script], cwd=ROOT, check=True,
+                                     capture_output=True, text=True).stdout)
+
+
+def test_import_is_fast_and_light():
+    runs = [_import("import podsummer\nfrom podsummer.transcript.transcript import Transcript") for _ in range(3)]
+    assert [run['heavy'] for run in runs] == [[]] * 3
+    assert min(run['seconds'] for run in runs) <= BUDGET_SECONDS
+
+
+def test_backends_are_imported_on_first_use():
+    run = _import("import podsummer.transcribe.whisperx, podsummer.ragengine")
+    assert not {'torch', 'whisperx'} & set(run['heavy'])
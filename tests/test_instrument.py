@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from podsummer import instrument
+
+
+class ListSink(instrument.Sink):
+    def __init__(self):
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def sink():
+    sink = ListSink()
+    instrument.enable(sink)
+    yield sink
+    instrument.disable()
+
+
+def test_spans_report_the_memory_they_allocate(sink):
+    size = 64 * 1024 * 1024
+    with instrument.span('allocate'):
+        buffer = np.ones(size, dtype=np.uint8)
+    with instrument.span('idle'):
+        pass
+    allocate, idle = sink.records
+    assert allocate['rss_delta_bytes'] >= size * 0.9
+    assert abs(idle['rss_delta_bytes']) < size * 0.1
+    assert allocate['rss_bytes'] > size and allocate['process_peak_rss_bytes'] > size
+    del buffer
+
+
+def test_prometheus_reports_the_process_peak(tmp_path):
+    instrument.enable(instrument.PrometheusSink(tmp_path / 'podsummer.prom'))
+    with instrument.span('stage'):
+        pass
+    instrument.disable()
+    text = (tmp_path / 'podsummer.prom').read_text()
+    assert 'podsummer_span_process_peak_rss_bytes ' in text
+    assert 'podsummer_span_spans_total{span="stage"} 1' in text
+
+
+def test_every_transcription_path_emits_transcribe_spans(sink, fake_whisperx, tmp_path, monkeypatch):
+    from conftest import timed_audio
+    from podsummer.transcribe.registry import ModelRegistry
+    from podsummer.transcribe.whisperx import WhisperXTranscriber
+    transcriber = WhisperXTranscriber('fake', device='cpu', compute_type='int8', registry=ModelRegistry())
+    monkeypatch.setattr(transcriber, 'load_audio', lambda audio_path: timed_audio(25))
+    monkeypatch.setattr(transcriber, 'load_audio_window',
+                        lambda audio_path, offset, duration, sr=16000: timed_audio(max(0, min(duration, 25 - offset)), offset))
+
+    def transcribe_spans(run):
+        sink.records.clear()
+        run()
+        return [record for record in sink.records if record['name'] == 'transcribe']
+
+    assert len(transcribe_spans(lambda: transcriber.transcribe_audio('a.mp3', tmp_path / 'a.json'))) == 1
+    (tmp_path / 'a.mp3').write_bytes(b'audio')
+    spans = transcribe_spans(lambda: transcriber.transcribe_audio_streaming(tmp_path / 'a.mp3', tmp_path / 'b.json',
+                                                                            window_seconds=10, overlap_seconds=2))
+    assert [span['attrs']['window'] for span in spans] == [0, 1, 2]
+    spans = transcribe_spans(lambda: transcriber.transcribe_many([('a.mp3', tmp_path / 'c.json'),
+                                                                 ('b.mp3', tmp_path / 'd.json')]))
+    assert [span['audio_seconds'] for span in spans] == [25, 25]
+    spans = transcribe_spans(lambda: transcriber.transcribe_audio_parallel('a.mp3', tmp_path / 'e.json', processes=2,
+                                                                           chunk_seconds=10, overlap_seconds=2))
+    assert len(spans) == 1 and spans[0]['attrs']['processes'] == 2 and spans[0]['audio_seconds'] == 25
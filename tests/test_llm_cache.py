@@ -0,0 +1,67 @@
+from podsummer.llm.cache import CachedChatClient, ResponseCache, request_key
+from podsummer.llm.stub import StubChatClient
+
+
+def test_request_key_covers_every_message_field():
+    messages = [{'role': 'user', 'content': 'What  was said?'}]
+    assert request_key(messages, 'model', {}) == request_key([{'role': 'user', 'content': 'What was said?\n'}], 'model', {})
+    assert request_key(messages, 'model', {}) != request_key([{**messages[0], 'name': 'guest'}], 'model', {})
+    tool_call = {'role': 'assistant', 'content': None,
+                 'tool_calls': [{'id': 'call_1', 'type': 'function', 'function': {'name': 'search', 'arguments': '{}'}}]}
+    other_call = {**tool_call, 'tool_calls': [{**tool_call['tool_calls'][0], 'id': 'call_2'}]}
+    assert request_key([tool_call], 'model', {}) != request_key([other_call], 'model', {})
+    assert request_key(messages, 'model', {}) != request_key(messages, 'model', {'temperature': 0})
+
+
+class NoneClient(StubChatClient):
+    def complete(self, messages, model, **params):
+        self.calls += 1
+        return None
+
+
+def test_none_responses_are_not_cached(tmp_path):
+    cache = ResponseCache(tmp_path / 'cache.sqlite')
+    client = CachedChatClient(NoneClient(), cache)
+    messages = [{'role': 'user', 'content': 'hello'}]
+    assert client.complete(messages, 'model') is None
+    assert client.complete(messages, 'model') is None
+    assert client.client.calls == 2
+    assert cache.get(request_key(messages, 'model', {})) is None
+
+
+def _stream_concurrently(client, messages, n):
+    import threading
+    results = [None] * n
+
+    def stream(i):
+        results[i] = ''.join(client.stream(messages, 'model'))
+
+    threads = [threading.Thread(target=stream, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_identical_streams_in_flight_are_sent_once(tmp_path):
+    client = CachedChatClient(StubChatClient(latency=0.2), ResponseCache(tmp_path / 'cache.sqlite'))
+    messages = [{'role': 'user', 'content': 'tell me about the episode'}]
+    results = _stream_concurrently(client, messages, 4)
+    assert client.client.calls == 1
+    assert len(set(results)) == 1 and results[0]
+    assert client.cache.stats['deduplicated'] == 3
+
+
+def test_followers_are_served_when_the_first_stream_is_closed_early(tmp_path):
+    import threading
+    client = CachedChatClient(StubChatClient(latency=0.2), ResponseCache(tmp_path / 'cache.sqlite'))
+    messages = [{'role': 'user', 'content': 'tell me about the episode'}]
+    first = client.stream(messages, 'model')
+    assert next(first)
+    follower = []
+    thread = threading.Thread(target=lambda: follower.append(''.join(client.stream(messages, 'model'))))
+    thread.start()
+    first.close()
+    thread.join(timeout=5)
+    assert follower == [client.client.complete(messages, 'model')]
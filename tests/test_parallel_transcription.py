@@ -0,0 +1,32 @@
+import pytest
+
+from conftest import timed_audio
+from podsummer import utils
+from podsummer.transcribe.registry import ModelRegistry
+from podsummer.transcribe.whisperx import WhisperXTranscriber
+
+DURATION = 47.0
+
+
+@pytest.fixture
+def transcriber(fake_whisperx, monkeypatch):
+    audio = timed_audio(DURATION)
+    # Pauses where the chunks are split
+    for pause in (9.5, 21.2, 33.7):
+        audio[int(pause * 16000):int((pause + 0.3) * 16000)] = 0
+    transcriber = WhisperXTranscriber('fake', device='cpu', compute_type='int8', registry=ModelRegistry())
+    monkeypatch.setattr(transcriber, 'load_audio', lambda audio_path: audio)
+    return transcriber
+
+
+@pytest.mark.parametrize('chunk_seconds, overlap_seconds', [(10, 2), (12, 5)])
+def test_parallel_output_matches_single_process(transcriber, tmp_path, chunk_seconds, overlap_seconds):
+    single = transcriber.transcribe_audio('audio.mp3', tmp_path / 'single.json')
+    parallel = transcriber.transcribe_audio_parallel('audio.mp3', tmp_path / 'parallel.json', processes=2,
+                                                     chunk_seconds=chunk_seconds, overlap_seconds=overlap_seconds)
+    assert len(single['segments']) == int(DURATION)
+    assert [segment['text'] for segment in parallel['segments']] == [segment['text'] for segment in single['segments']]
+    for ours, theirs in zip(parallel['segments'], single['segments']):
+        assert (ours['start'], ours['end']) == (pytest.approx(theirs['start'], abs=1e-3), pytest.approx(theirs['end'], abs=1e-3))
+    assert parallel['language'] == single['language']
+    assert utils.load_transcript(tmp_path / 'parallel.json')['segments'] == parallel['segments']
@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+
+from podsummer.transcribe.pcm_cache import PCMCache, PCM_SUFFIX
+
+
+def _audio_file(workdir, name, content):
+    path = workdir / name / 'audio.mp3'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return path
+
+
+def _decoder(samples, calls):
+    def decode():
+        calls.append(1)
+        return samples
+    return decode
+
+
+def test_hit_maps_the_cached_decode(workdir):
+    cache = PCMCache(cache_dir=workdir / 'pcm')
+    audio = _audio_file(workdir, 'a', b'audio a')
+    samples, calls = np.arange(1000, dtype=np.float32), []
+    first = cache.load(audio, 16000, _decoder(samples, calls))
+    second = cache.load(audio, 16000, _decoder(samples, calls))
+    assert len(calls) == 1
+    assert isinstance(second, np.memmap)
+    np.testing.assert_array_equal(first, samples)
+    np.testing.assert_array_equal(second, samples)
+    assert cache.stats == {"hits": 1, "misses": 1, "evictions": 0}
+    # Entries live in the cache directory, not next to the audio
+    assert [path.parent for path in workdir.rglob(f"*{PCM_SUFFIX}")] == [workdir / 'pcm']
+    # A new cache over the same directory finds the entry
+    assert PCMCache(cache_dir=workdir / 'pcm').get(audio, 16000) is not None
+
+
+def test_miss_on_other_audio_or_sample_rate(workdir):
+    cache = PCMCache(cache_dir=workdir / 'pcm')
+    audio = _audio_file(workdir, 'a', b'audio a')
+    other = _audio_file(workdir, 'b', b'audio b')
+    cache.put(audio, 16000, np.ones(10, dtype=np.float32))
+    assert cache.get(other, 16000) is None
+    assert cache.get(audio, 8000) is None
+    assert cache.get(audio, 16000) is not None
+
+
+def test_changed_audio_does_not_hit_its_stale_entry(workdir):
+    cache = PCMCache(cache_dir=workdir / 'pcm')
+    audio = _audio_file(workdir, 'a', b'first version')
+    calls = []
+    cache.load(audio, 16000, _decoder(np.zeros(10, dtype=np.float32), calls))
+    audio.write_bytes(b'second version, longer')
+    os.utime(audio, ns=(1, 1))
+    reloaded = cache.load(audio, 16000, _decoder(np.ones(20, dtype=np.float32), calls))
+    assert len(calls) == 2
+    np.testing.assert_array_equal(reloaded, np.ones(20, dtype=np.float32))
+    # The entry of the previous version is replaced, not left to take up space
+    assert len(list((workdir / 'pcm').glob(f"*{PCM_SUFFIX}"))) == 1
+    assert cache.total_bytes == sum(path.stat().st_size for path in (workdir / 'pcm').iterdir())
+
+
+def test_least_recently_used_entries_are_evicted(workdir):
+    samples = np.zeros(1000, dtype=np.float32)
+    probe = PCMCache(cache_dir=workdir / 'probe')
+    entry_bytes = probe.put(_audio_file(workdir, 'probe', b'probe'), 16000, samples).stat().st_size
+    cache = PCMCache(max_bytes=2 * entry_bytes, cache_dir=workdir / 'pcm')
+    audios = [_audio_file(workdir, name, name.encode()) for name in ('a', 'b', 'c')]
+    cache.put(audios[0], 16000, samples)
+    cache.put(audios[1], 16000, samples)
+    # Using the first entry makes the second the least recently used
+    assert cache.get(audios[0], 16000) is not None
+    cache.put(audios[2], 16000, samples)
+    assert cache.get(audios[1], 16000) is None
+    assert cache.get(audios[0], 16000) is not None
+    assert cache.get(audios[2], 16000) is not None
+    assert cache.stats["evictions"] == 1
+    assert cache.total_bytes == 2 * entry_bytes
+    assert cache.clear() == 2 * entry_bytes
+    assert cache.total_bytes == 0 and not list((workdir / 'pcm').iterdir())
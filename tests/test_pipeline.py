@@ -0,0 +1,106 @@
+import threading
+
+from conftest import rss_feed
+from podsummer.llm.stub import StubChatClient
+from podsummer.podsummer import PodSummer
+from podsummer.store.artifacts import ArtifactStore
+from podsummer.transcribe.stub import StubTranscriber
+
+
+def _serve_show(fake_server, episodes: int = 3) -> str:
+    """ Serves a show whose episodes all point to one 10 second audio file, returning the feed URL """
+    audio_url = fake_server.put('audio.mp3', b'\0' * 160_000, content_type='audio/mpeg')
+    feed = rss_feed([(f"guid-{i}", f"Episode {i}", 1_700_000_000 + i * 86400) for i in range(episodes)],
+                    enclosure_url=audio_url)
+    return fake_server.put('feed.xml', feed, content_type='application/rss+xml')
+
+
+def test_pipeline_runs_with_stub_backends(fake_server, workdir):
+    feed_url = _serve_show(fake_server)
+    summer = PodSummer(StubTranscriber(segment_seconds=2.0), StubChatClient(), llm_model='stub',
+                       fetch_workers=2, download_workers=2, summarize_workers=2, queue_size=1)
+    episodes = summer.run([(feed_url, f"Episode {i}") for i in range(3)])
+    assert sorted(episode.episode_title for episode in episodes) == [f"Episode {i}" for i in range(3)]
+    for episode in episodes:
+        assert episode.error is None
+        assert episode.summary.startswith('[stub]')
+        assert episode.path('summary.txt').read_text() == episode.summary
+        assert list(episode.timings) == ['fetch_metadata', 'download', 'transcribe', 'summarize']
+
+
+def test_pipeline_isolates_failed_episodes(fake_server, workdir):
+    feed_url = _serve_show(fake_server)
+    summer = PodSummer(StubTranscriber(), StubChatClient(), llm_model='stub')
+    episodes = {episode.episode_title: episode
+                for episode in summer.run([(feed_url, "Episode 0"), (feed_url, "Unrelated title")])}
+    assert episodes["Episode 0"].error is None
+    stage, error = episodes["Unrelated title"].error
+    assert stage == 'fetch_metadata' and isinstance(error, ValueError)
+
+
+def test_pipeline_finishes_when_a_worker_dies(fake_server, workdir, monkeypatch):
+    class WorkerKilled(BaseException):
+        pass
+
+    def die(episode):
+        raise WorkerKilled()
+
+    feed_url = _serve_show(fake_server)
+    summer = PodSummer(StubTranscriber(), StubChatClient(), llm_model='stub', transcribe_workers=1)
+    monkeypatch.setattr(summer, '_transcribe', die)
+    monkeypatch.setattr(threading, 'excepthook', lambda args: None)
+    result = []
+    runner = threading.Thread(target=lambda: result.extend(summer.run([(feed_url, "Episode 0")])), daemon=True)
+    runner.start()
+    runner.join(timeout=10)
+    assert not runner.is_alive()
+    assert result == []
+
+
+def test_pipeline_reuses_stored_audio(fake_server, workdir):
+    feed_url = _serve_show(fake_server, episodes=1)
+    summer = PodSummer(StubTranscriber(), StubChatClient(), llm_model='stub', store=ArtifactStore(workdir / 'store'))
+    first = summer.run([(feed_url, "Episode 0")])
+    downloads = fake_server.count('audio.mp3')
+    second = summer.run([(feed_url, "Episode 0")])
+    assert first[0].error is None and second[0].error is None
+    assert fake_server.count('audio.mp3') == downloads
+    assert second[0].summary == first[0].summary
+
+
+def _run_in_thread(func):
+    """ Runs func in a thread, returning its result or exception, or None if it was still running after 10 s """
+    outcome = []
+
+    def target():
+        try:
+            outcome.append(('result', func()))
+        except Exception as e:
+            outcome.append(('error', e))
+
+    runner = threading.Thread(target=target, daemon=True)
+    runner.start()
+    runner.join(timeout=10)
+    return outcome[0] if outcome else None
+
+
+def test_pipeline_finishes_when_the_sources_raise(fake_server, workdir):
+    feed_url = _serve_show(fake_server)
+
+    def sources():
+        yield feed_url, "Episode 0"
+        raise RuntimeError("feed list unavailable")
+
+    summer = PodSummer(StubTranscriber(), StubChatClient(), llm_model='stub')
+    episodes = []
+    outcome = _run_in_thread(lambda: [episodes.append(episode) for episode in summer.iter_run(sources())])
+    assert outcome is not None and outcome[0] == 'error' and str(outcome[1]) == "feed list unavailable"
+    # The episodes produced before the error are still processed
+    assert [episode.episode_title for episode in episodes] == ["Episode 0"]
+    assert episodes[0].error is None
+
+
+def test_pipeline_finishes_on_a_malformed_source(fake_server, workdir):
+    summer = PodSummer(StubTranscriber(), StubChatClient(), llm_model='stub')
+    outcome = _run_in_thread(lambda: summer.run([("http://127.0.0.1/feed.xml", "Episode 0", "extra")]))
+    assert outcome is not None and outcome[0] == 'error' and isinstance(outcome[1], ValueError)
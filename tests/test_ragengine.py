@@ -0,0 +1,63 @@
+import pytest
+
+from podsummer import utils
+from podsummer.ragengine import RAGEngine
+from podsummer.transcript.transcript import Transcript
+
+
+def _save(path, words):
+    utils.save_transcript({'segments': [{'start': 10.0 * i, 'end': 10.0 * (i + 1), 'text': f" {word}"}
+                                        for i, word in enumerate(words)], 'language': 'en'}, path)
+    return Transcript(path=str(path))
+
+
+def _texts(engine):
+    return [chunk.text for chunk in engine.index.chunks]
+
+
+def test_persisted_index_is_rebuilt_when_the_transcript_changes(tmp_path):
+    path = tmp_path / 'transcript.json'
+    engine = RAGEngine()
+    engine.load_transcript(_save(path, ['apples', 'pears']))
+    assert (tmp_path / 'transcript.json.index.npy').exists()
+    engine.load_transcript(_save(path, ['rockets', 'planets']))
+    assert 'rockets' in ' '.join(_texts(engine))
+    assert engine.search('rockets', k=1)[0]['text'].strip().startswith('rockets')
+    # Unchanged transcripts reuse the persisted index
+    mtime = (tmp_path / 'transcript.json.index.npy').stat().st_mtime_ns
+    RAGEngine().load_transcript(Transcript(path=str(path)))
+    assert (tmp_path / 'transcript.json.index.npy').stat().st_mtime_ns == mtime
+
+
+def test_transcripts_in_different_formats_get_their_own_index(tmp_path):
+    engine = RAGEngine()
+    engine.load_transcript(_save(tmp_path / 'transcript.json', ['apples']))
+    engine.load_transcript(_save(tmp_path / 'transcript.jsonl', ['rockets']))
+    assert 'rockets' in ' '.join(_texts(engine))
+    engine.load_transcript(Transcript(path=str(tmp_path / 'transcript.json')))
+    assert 'apples' in ' '.join(_texts(engine))
+    assert (tmp_path / 'transcript.jsonl.index.npy').exists()
+
+
+def test_interrupted_index_save_leaves_the_previous_index(tmp_path, monkeypatch):
+    engine = RAGEngine()
+    engine.load_transcript(_save(tmp_path / 'transcript.json', ['apples', 'pears']))
+    files = {path.name: path.read_bytes() for path in tmp_path.iterdir()}
+
+    def failing_dump(*args, **kwargs):
+        raise OSError("disk full")
+
+    transcript = _save(tmp_path / 'transcript.json', ['rockets', 'planets'])
+    files['transcript.json'] = (tmp_path / 'transcript.json').read_bytes()
+    monkeypatch.setattr('podsummer.retrieval.index.json.dump', failing_dump)
+    with pytest.raises(OSError):
+        engine.load_transcript(transcript)
+    monkeypatch.undo()
+    assert {path.name: path.read_bytes() for path in tmp_path.iterdir()} == files
+    # The stale index is rebuilt, as is one whose chunks are missing
+    engine.load_transcript(Transcript(path=str(tmp_path / 'transcript.json')))
+    assert 'rockets' in ' '.join(_texts(engine))
+    (tmp_path / 'transcript.json.index.json').unlink()
+    engine.load_transcript(Transcript(path=str(tmp_path / 'transcript.json')))
+    assert 'rockets' in ' '.join(_texts(engine))
+    assert (tmp_path / 'transcript.json.index.json').exists()
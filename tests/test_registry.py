@@ -0,0 +1,34 @@
+import numpy as np
+
+import conftest
+from podsummer.transcribe.registry import ModelRegistry
+from podsummer.transcribe.whisperx import WhisperXTranscriber
+
+MODEL_BYTES = 64 * 1024 * 1024
+
+
+class LargeModel(conftest.FakeWhisperModel):
+    """ Fake model holding weights in process memory, as models loaded on CPU do """
+
+    def __init__(self):
+        self.weights = np.ones(MODEL_BYTES, dtype=np.uint8)
+
+
+def test_models_are_evicted_when_their_memory_exceeds_the_budget(fake_whisperx):
+    fake_whisperx.load_model = lambda name, **kwargs: LargeModel()
+    registry = ModelRegistry(max_bytes=int(2.5 * MODEL_BYTES))
+    for name in ('tiny', 'base', 'small'):
+        WhisperXTranscriber(name, device='cpu', compute_type='int8', registry=registry).warm_up()
+    assert registry.stats['evictions'] == 1
+    assert ('transcribe', 'tiny', 'cpu', 'int8') not in registry
+    assert ('transcribe', 'small', 'cpu', 'int8') in registry
+    assert registry.resident_bytes > MODEL_BYTES
+
+
+def test_resident_models_are_reused():
+    loads = []
+    registry = ModelRegistry(max_models=1)
+    for key in ('a', 'a', 'b', 'a'):
+        registry.get(key, lambda: loads.append(key) or key)
+    assert loads == ['a', 'b', 'a']
+    assert registry.stats == {**registry.stats, 'hits': 1, 'misses': 3, 'evictions': 2}
@@ -0,0 +1,36 @@
+import pytest
+
+from conftest import rss_feed
+from podsummer.media.feed_cache import FeedCache
+from podsummer.media.rss import RSSPodcast
+
+
+@pytest.fixture
+def feed_url(fake_server):
+    episodes = [(f"guid-{i}", f"Episode {i}: Talking about topic {i}", 1_700_000_000 + i) for i in range(50)]
+    return fake_server.put('feed.xml', rss_feed(episodes), etag='"v1"')
+
+
+def test_streaming_lookups_go_through_the_feed_cache(fake_server, feed_url, tmp_path):
+    cache = FeedCache(tmp_path)
+    podcast = RSSPodcast(feed_url, streaming=True, feed_cache=cache)
+    assert podcast.find_entry_from_title("Episode 7: Talking about topic 7").guid == 'guid-7'
+    assert podcast.find_entry_from_title("Episode 8: Talkin about topic 8").guid == 'guid-8'
+    assert [record.guid for record, _ in podcast.find_entries_from_title("Episode 9: Talking about topic 9", top_k=1)] == ['guid-9']
+    assert fake_server.count('feed.xml') == 3
+    assert fake_server.requests[-1][1].get('If-None-Match') == '"v1"'
+    assert cache.stats == {"hits": 0, "misses": 1, "not_modified": 2}
+
+
+def test_streaming_cache_ttl_skips_the_network(fake_server, feed_url, tmp_path):
+    podcast = RSSPodcast(feed_url, streaming=True, feed_cache=FeedCache(tmp_path, ttl=3600))
+    for i in range(3):
+        podcast.find_entry_from_title(f"Episode {i}: Talking about topic {i}")
+    assert fake_server.count('feed.xml') == 1
+
+
+def test_streaming_lookup_respects_the_threshold(feed_url):
+    podcast = RSSPodcast(feed_url, streaming=True)
+    with pytest.raises(ValueError):
+        podcast.find_entry_from_title("Something else entirely", similarity_threshold=80)
+    assert podcast.find_entry_from_title("Episode 12: Talking about topc 12").guid == 'guid-12'
@@ -0,0 +1,134 @@
+import queue
+
+import pytest
+
+from conftest import rss_feed
+from podsummer.media.scheduler import FeedScheduler, ManualClock
+
+DAY = 24 * 3600
+NOW = 1_700_000_000.0
+
+
+def _daily(count, last_published):
+    return [(f"guid-{i}", f"Episode {i}", last_published - (count - 1 - i) * DAY) for i in range(count)]
+
+
+@pytest.fixture(autouse=True)
+def _feeds_in_workdir(workdir):
+    """ Keeps the feed cache of the schedulers in the temporary directory """
+
+
+@pytest.fixture
+def clock():
+    return ManualClock(NOW)
+
+
+def _scheduler(clock, **kwargs):
+    return FeedScheduler(clock=clock, jitter=0, min_interval=60, host_interval=0, **kwargs)
+
+
+def test_polls_at_a_fraction_of_the_publishing_cadence(fake_server, clock):
+    daily = fake_server.put('daily.xml', rss_feed(_daily(5, NOW - 3600)), etag='"daily"')
+    dormant = fake_server.put('dormant.xml', rss_feed(_daily(5, NOW - 100 * DAY)), etag='"dormant"')
+    scheduler = _scheduler(clock, cadence_fraction=0.05)
+    scheduler.subscribe(daily)
+    scheduler.subscribe(dormant)
+    scheduler.poll()
+    assert scheduler.subscriptions[daily].interval == pytest.approx(0.05 * DAY)
+    # A dormant feed waits a fraction of the time since its last episode instead
+    assert scheduler.subscriptions[dormant].interval == pytest.approx(0.05 * 100 * DAY)
+    assert scheduler.next_poll() == pytest.approx(NOW + 0.05 * DAY)
+
+
+def test_new_episodes_are_emitted_once(fake_server, clock):
+    episodes = _daily(3, NOW - 3600)
+    url = fake_server.put('show.xml', rss_feed(episodes), etag='"v1"')
+    emitted = []
+    scheduler = _scheduler(clock, on_episode=emitted.append)
+    scheduler.subscribe(url)
+    assert scheduler.poll() == []
+    clock.advance(scheduler.subscriptions[url].interval)
+    # Unchanged feeds are answered with 304
+    assert scheduler.poll() == []
+    assert scheduler.stats['not_modified'] == 1
+    episodes.append(('guid-new', 'New episode', clock.time()))
+    fake_server.put('show.xml', rss_feed(episodes), etag='"v2"')
+    clock.advance(scheduler.subscriptions[url].interval)
+    found = scheduler.poll()
+    assert [episode.episode.guid for episode in found] == ['guid-new']
+    assert emitted == found
+    assert fake_server.requests[-1][1].get('If-None-Match') == '"v1"'
+
+
+def test_failing_feeds_back_off_exponentially(fake_server, clock):
+    url = fake_server.url('missing.xml')
+    scheduler = _scheduler(clock, max_interval=5000)
+    subscription = scheduler.subscribe(url)
+    intervals = []
+    for _ in range(7):
+        assert scheduler.poll() == []
+        intervals.append(subscription.interval)
+        clock.advance(subscription.interval)
+    assert intervals == [120, 240, 480, 960, 1920, 3840, 5000]
+    assert subscription.failures == 7 and scheduler.stats['failures'] == 7
+    # The interval returns to the cadence once the feed answers again
+    fake_server.put('missing.xml', rss_feed(_daily(5, clock.time() - 3600)))
+    scheduler.poll()
+    assert subscription.failures == 0 and subscription.error is None
+    assert subscription.interval == pytest.approx(0.05 * DAY)
+
+
+def test_requests_to_a_host_are_spaced(fake_server, clock):
+    urls = [fake_server.put(f"show{i}.xml", rss_feed(_daily(3, NOW - 3600))) for i in range(3)]
+    scheduler = FeedScheduler(clock=clock, jitter=0, min_interval=60, host_interval=5)
+    for url in urls:
+        scheduler.subscribe(url)
+    polled, next_polls = [], []
+    for _ in range(3):
+        scheduler.poll()
+        polled.append(sum(fake_server.count(f"show{i}.xml") for i in range(3)))
+        next_polls.append(scheduler.next_poll() - clock.time())
+        clock.advance(5)
+    assert polled == [1, 2, 3]
+    # Feeds waiting for their host are postponed until it may be requested again
+    assert next_polls[:2] == [5, 5]
+
+
+def test_episodes_are_queued_before_callbacks_that_may_fail(fake_server, clock):
+    episodes = _daily(1, NOW - 3600)
+    url = fake_server.put('show.xml', rss_feed(episodes))
+    episode_queue, called = queue.Queue(), []
+
+    def on_episode(episode):
+        called.append(episode)
+        assert episode_queue.qsize() == len(called)
+        raise RuntimeError("consumer crashed")
+
+    scheduler = _scheduler(clock, on_episode=on_episode, episode_queue=episode_queue)
+    scheduler.subscribe(url)
+    scheduler.poll()
+    episodes += [('guid-a', 'A', NOW), ('guid-b', 'B', NOW + 1)]
+    fake_server.put('show.xml', rss_feed(episodes))
+    clock.advance(scheduler.subscriptions[url].interval)
+    found = scheduler.poll()
+    assert [episode.episode.guid for episode in found] == ['guid-a', 'guid-b']
+    assert called == found == [episode_queue.get_nowait() for _ in range(2)]
+    assert scheduler.stats['callback_errors'] == 2
+    assert isinstance(scheduler.callback_error, RuntimeError)
+
+
+def test_restarted_scheduler_reuses_the_cached_feed(fake_server, clock):
+    url = fake_server.put('show.xml', rss_feed(_daily(3, NOW - 3600)), etag='"v1"')
+    first = _scheduler(clock)
+    first.subscribe(url)
+    first.poll()
+    # A new scheduler sends a conditional request, and still learns the episodes of the unchanged feed
+    emitted = []
+    second = _scheduler(clock, on_episode=emitted.append)
+    second.subscribe(url)
+    assert second.poll() == []
+    assert fake_server.requests[-1][1].get('If-None-Match') == '"v1"'
+    assert second.feed_cache.stats['not_modified'] == 1
+    assert len(second.subscriptions[url].seen) == 3
+    clock.advance(second.subscriptions[url].interval)
+    assert second.poll() == [] and emitted == []
@@ -0,0 +1,63 @@
+import os
+
+from conftest import rss_feed
+from podsummer import utils
+from podsummer.media.rss import RSSPodcast
+from podsummer.store.artifacts import ArtifactStore
+
+
+def test_colliding_titles_get_their_own_directories(fake_server, workdir):
+    feed_url = fake_server.put('feed.xml', rss_feed([('guid-1', "Hello, world!", 1_700_000_000),
+                                                     ('guid-2', "Hello world?", 1_700_086_400)]))
+    first = RSSPodcast(feed_url, episode_title="Hello, world!")
+    second = RSSPodcast(feed_url, episode_title="Hello world?")
+    assert utils.to_filename(first.title) == utils.to_filename(second.title)
+    assert first.store_paths['audio'].parent != second.store_paths['audio'].parent
+    # The same episode finds its directory again
+    assert RSSPodcast(feed_url, episode_title="Hello world?").store_paths == second.store_paths
+    assert RSSPodcast(feed_url, episode_title="Hello, world!").store_paths == first.store_paths
+
+
+def test_stored_audio_is_linked_not_copied(workdir):
+    store = ArtifactStore(workdir / 'store')
+    audio = workdir / 'episode' / 'audio.mp3'
+    audio.parent.mkdir()
+    audio.write_bytes(b'audio' * 1000)
+    digest = store.put_audio(audio, source='http://example.com/a.mp3')
+    stored = store.audio_for_source('http://example.com/a.mp3')
+    assert os.path.samefile(stored, audio)
+    assert store.put_audio(audio) == digest
+    # The same audio elsewhere is deduplicated into the stored object
+    other = workdir / 'other' / 'audio.mp3'
+    other.parent.mkdir()
+    other.write_bytes(b'audio' * 1000)
+    store.put_audio(other)
+    assert os.path.samefile(stored, other)
+    assert len([path for path in store.objects_dir.rglob('*') if path.is_file()]) == 1
+
+
+def test_rewriting_a_materialized_artifact_leaves_the_store_intact(workdir):
+    store = ArtifactStore(workdir / 'store')
+    transcript = workdir / 'a' / 'transcript.json'
+    transcript.parent.mkdir()
+    utils.save_transcript({'segments': [{'start': 0.0, 'end': 1.0, 'text': ' first'}]}, transcript)
+    stored = store.put_artifact('transcript', 'hash', 'model', None, transcript)
+    copy = store.materialize(stored, workdir / 'b' / 'transcript.json')
+    assert os.path.samefile(stored, copy)
+    utils.save_transcript({'segments': [{'start': 0.0, 'end': 1.0, 'text': ' second'}]}, copy)
+    assert utils.load_transcript(stored)['segments'][0]['text'] == ' first'
+    assert utils.load_transcript(copy)['segments'][0]['text'] == ' second'
+    assert store.get_artifact('transcript', 'hash', 'model', None) == stored
+
+
+def test_appending_to_a_stored_transcript_leaves_the_store_intact(workdir):
+    store = ArtifactStore(workdir / 'store')
+    transcript = workdir / 'a' / 'transcript.jsonl'
+    transcript.parent.mkdir()
+    utils.save_transcript({'segments': [{'start': 0.0, 'end': 1.0, 'text': ' first'}]}, transcript)
+    stored = store.put_artifact('transcript', 'hash', 'model', None, transcript)
+    assert os.path.samefile(stored, transcript)
+    with utils.SegmentWriter(transcript, append=True) as writer:
+        writer.write_segment({'start': 1.0, 'end': 2.0, 'text': ' second'})
+    assert [segment['text'] for segment in utils.iter_segments(transcript)] == [' first', ' second']
+    assert [segment['text'] for segment in utils.iter_segments(stored)] == [' first']
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from conftest import timed_audio
+from podsummer.transcribe import chunking
+from podsummer.transcribe.whisperx import WhisperXTranscriber
+from podsummer.transcribe.registry import ModelRegistry
+from podsummer.transcript.transcript import Transcript
+
+DURATION = 35.0
+
+
+@pytest.fixture
+def transcriber(fake_whisperx, monkeypatch):
+    transcriber = WhisperXTranscriber('fake', device='cpu', compute_type='int8', registry=ModelRegistry())
+    windows = []
+
+    def load_audio_window(audio_path, offset, duration, sr=16000):
+        windows.append((offset, duration))
+        return timed_audio(max(0.0, min(duration, DURATION - offset)), offset)
+
+    monkeypatch.setattr(transcriber, 'load_audio_window', load_audio_window)
+    transcriber.windows = windows
+    return transcriber
+
+
+@pytest.fixture
+def audio(tmp_path):
+    path = tmp_path / 'audio.mp3'
+    path.write_bytes(b'audio')
+    return str(path)
+
+
+def _expected():
+    return [f" second {second}" for second in range(int(DURATION))]
+
+
+def test_segments_crossing_window_boundaries_are_kept_once(transcriber, audio, tmp_path):
+    segments = list(transcriber.transcribe_stream(audio, tmp_path / 'checkpoint.jsonl',
+                                                  window_seconds=10, overlap_seconds=2))
+    assert [segment['text'] for segment in segments] == _expected()
+    assert all(a['end'] <= b['start'] for a, b in zip(segments, segments[1:]))
+    assert segments[10] == {'start': pytest.approx(10.0), 'end': pytest.approx(11.0), 'text': " second 10"}
+    # Windows are decoded with the overlap on both sides
+    assert transcriber.windows[:2] == [(0, 12), (8, 14)]
+
+
+def test_resumes_after_the_last_completed_window(transcriber, audio, tmp_path):
+    checkpoint = tmp_path / 'checkpoint.jsonl'
+    stream = transcriber.transcribe_stream(audio, checkpoint, window_seconds=10, overlap_seconds=2)
+    first = [next(stream) for _ in range(15)]
+    stream.close()
+    transcriber.windows.clear()
+    resumed = list(transcriber.transcribe_stream(audio, checkpoint, window_seconds=10, overlap_seconds=2))
+    assert [segment['text'] for segment in resumed] == _expected()
+    assert resumed[:15] == first
+    assert transcriber.windows[0] == (18, 14)
+
+
+def test_checkpoint_of_other_audio_is_not_resumed(transcriber, audio, tmp_path):
+    checkpoint = tmp_path / 'checkpoint.jsonl'
+    stream = transcriber.transcribe_stream(audio, checkpoint, window_seconds=10, overlap_seconds=2)
+    [next(stream) for _ in range(15)]
+    stream.close()
+    # The audio is replaced at the same path, e.g. by a new download
+    with open(audio, 'wb') as f:
+        f.write(b'other audio')
+    transcriber.windows.clear()
+    list(transcriber.transcribe_stream(audio, checkpoint, window_seconds=10, overlap_seconds=2))
+    assert transcriber.windows[0] == (0, 12)
+
+
+@pytest.mark.parametrize('name', ['transcript.json', 'transcript.json.gz', 'transcript.jsonl'])
+def test_transcript_is_saved(transcriber, audio, tmp_path, name):
+    result = transcriber.transcribe_audio_streaming(audio, tmp_path / name, window_seconds=10, overlap_seconds=2)
+    assert result == {'language': 'en', 'mode': 'transcribed', 'segment_count': int(DURATION)}
+    transcript = Transcript(path=str(tmp_path / name))
+    assert [segment['text'] for segment in transcript.segments] == _expected()
+    assert transcript.info == {'language': 'en', 'mode': 'transcribed'}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['audio.mp3', name]
+
+
+def test_merge_segments_shifts_words_and_drops_the_overlap():
+    chunk = chunking.AudioChunk(start=16000 * 8, end=16000 * 22, core_start=16000 * 10, core_end=16000 * 20)
+    segments = [{'start': 1.0, 'end': 2.0, 'text': ' overlap'},
+                {'start': 2.5, 'end': 3.5, 'text': ' kept', 'words': [{'word': 'kept', 'start': 2.5, 'end': 3.5}]},
+                {'start': 12.5, 'end': 13.5, 'text': ' next window'}]
+    kept = chunking.merge_segments(chunk, segments, 16000)
+    assert kept == [{'start': 10.5, 'end': 11.5, 'text': ' kept', 'words': [{'word': 'kept', 'start': 10.5, 'end': 11.5}]}]
+
+
+def test_interrupted_json_lines_transcript_is_not_left_behind(transcriber, audio, tmp_path, monkeypatch):
+    load_audio_window = transcriber.load_audio_window
+
+    def failing_window(audio_path, offset, duration, sr=16000):
+        if offset >= 18:
+            raise RuntimeError("decoder crashed")
+        return load_audio_window(audio_path, offset, duration, sr)
+
+    monkeypatch.setattr(transcriber, 'load_audio_window', failing_window)
+    path = tmp_path / 'transcript.jsonl'
+    with pytest.raises(RuntimeError):
+        transcriber.transcribe_audio_streaming(audio, path, window_seconds=10, overlap_seconds=2)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['audio.mp3', 'transcript.jsonl.partial.jsonl']
+    monkeypatch.setattr(transcriber, 'load_audio_window', load_audio_window)
+    transcriber.transcribe_audio_streaming(audio, path, window_seconds=10, overlap_seconds=2)
+    assert [segment['text'] for segment in Transcript(path=str(path)).segments] == _expected()
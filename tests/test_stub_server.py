@@ -0,0 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor
+import json, urllib.request
+
+from podsummer.llm.stub import StubChatServer
+
+
+def _complete(url):
+    body = json.dumps({'model': 'stub', 'messages': [{'role': 'user', 'content': 'hello'}]}).encode()
+    request = urllib.request.Request(f"{url}/chat/completions", body, {'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.load(response)
+
+
+def test_concurrent_requests_are_all_counted():
+    with StubChatServer() as server:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            responses = list(executor.map(_complete, [server.url] * 64))
+    assert server.requests == 64
+    assert len({response['id'] for response in responses}) == 64
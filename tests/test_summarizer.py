@@ -0,0 +1,63 @@
+import threading
+
+from podsummer.llm.stub import StubChatClient
+from podsummer.llm.summarizer import MapReduceSummarizer
+from podsummer.transcript.transcript import Transcript
+
+
+class CountingClient(StubChatClient):
+    """ Stub client recording the largest number of concurrent requests """
+
+    def __init__(self, latency):
+        super().__init__(latency=latency)
+        self._lock = threading.Lock()
+        self.in_flight = self.peak = 0
+
+    def complete(self, messages, model, **params):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            return super().complete(messages, model, **params)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def _transcript(segments):
+    return Transcript(raw={'segments': [{'start': 10.0 * i, 'end': 10.0 * (i + 1), 'text': f" sentence number {i} " * 20}
+                                        for i in range(segments)], 'language': 'en'})
+
+
+def test_requests_in_flight_are_bounded_across_concurrent_calls():
+    client = CountingClient(latency=0.02)
+    summarizer = MapReduceSummarizer(client, chunk_tokens=200, max_in_flight=3)
+    results = [None] * 4
+
+    def summarize(i):
+        results[i] = summarizer.summarize_with_stats(_transcript(10 + i), 'Show', f'Episode {i}')
+
+    threads = [threading.Thread(target=summarize, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.peak == 3
+    # Every call gets the stats of its own transcript
+    assert [stats['chunks'] for _, stats in results] == [len(summarizer.chunk(_transcript(10 + i))) for i in range(4)]
+    assert sum(stats['calls'] for _, stats in results) == client.calls
+    assert all(summary for summary, _ in results)
+
+
+def test_empty_transcript():
+    summary, stats = MapReduceSummarizer(StubChatClient()).summarize_with_stats(_transcript(0), 'Show', 'Episode')
+    assert summary == '' and stats['calls'] == 0
+
+
+def test_text_transcripts_are_chunked_by_sentence():
+    summarizer = MapReduceSummarizer(StubChatClient(), chunk_tokens=50)
+    transcript = Transcript(raw=' '.join(f"This is sentence number {i} of a plain text transcript." for i in range(40)))
+    chunks = summarizer.chunk(transcript)
+    assert len(chunks) > 1
+    assert ' '.join(chunks).replace('\n', ' ') == transcript.text
+    assert all(summarizer.count_tokens(chunk) <= 50 for chunk in chunks)
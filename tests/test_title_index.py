@@ -0,0 +1,70 @@
+import random
+
+from fuzzywuzzy import fuzz
+
+from podsummer.media.title_index import TitleIndex
+
+
+def _linear_scan(titles, query, threshold):
+    scores = [(i, fuzz.ratio(query, title)) for i, title in enumerate(titles)]
+    return max((match for match in scores if match[1] >= threshold), key=lambda match: match[1], default=None)
+
+
+def _ranking(titles, query, threshold, top_k):
+    scores = [(i, fuzz.ratio(query, title)) for i, title in enumerate(titles)]
+    return sorted((match for match in scores if match[1] >= threshold), key=lambda match: (-match[1], match[0]))[:top_k]
+
+
+def test_exact_and_fuzzy_lookups():
+    titles = [f"Episode {i}: Talking about topic {i}" for i in range(500)]
+    index = TitleIndex(titles)
+    assert index.search("Episode 42: Talking about topic 42", top_k=1) == [(42, 100)]
+    assert index.search("Episode 42: Talkin about topic 42", top_k=1, similarity_threshold=80)[0][0] == 42
+
+
+def test_match_pruned_by_overlap_is_still_found():
+    # Decoys share most n-grams with the query, the true match shares few but is the only one over the threshold
+    query = "the quick brown fox jumps"
+    decoys = [f"the quick brown fox {i} and friends jumps over everything else" for i in range(50)]
+    titles = decoys + ["teh quikc borwn fxo jumsp"]
+    index = TitleIndex(titles)
+    expected = _linear_scan(titles, query, 60)
+    assert expected is not None and expected[0] == len(decoys)
+    assert index.search(query, top_k=1, similarity_threshold=60) == [expected]
+
+
+def test_agrees_with_a_linear_scan_on_whether_a_match_exists():
+    rng = random.Random(0)
+    words = "market science history music story health money culture climate design".split()
+    titles = [' '.join(rng.choice(words) for _ in range(rng.randint(2, 6))) for _ in range(300)]
+    index = TitleIndex(titles)
+    for _ in range(100):
+        query = list(rng.choice(titles))
+        for _ in range(rng.randint(0, 6)):
+            query[rng.randrange(len(query))] = rng.choice('abcdefghij ')
+        query = ''.join(query)
+        expected = _linear_scan(titles, query, 80)
+        found = index.search(query, top_k=1, similarity_threshold=80)
+        assert bool(found) == (expected is not None)
+        if found:
+            assert found[0][1] == expected[1]
+
+
+def test_score_rounded_up_to_the_threshold_is_found():
+    # 200 * 37 / 93 = 79.57 rounds to 80, the threshold
+    titles = ['a' * 37 + 'b' * 19, 'unrelated']
+    assert _linear_scan(titles, 'a' * 37, 80) == (0, 80)
+    assert TitleIndex(titles).search('a' * 37, top_k=1, similarity_threshold=80) == [(0, 80)]
+
+
+def test_rankings_agree_with_a_linear_scan():
+    rng = random.Random(1)
+    words = "market science history music story health money culture climate design".split()
+    titles = [' '.join(rng.choice(words) for _ in range(rng.randint(1, 6))) for _ in range(200)]
+    titles += ['', 'a', 'A']
+    index = TitleIndex(titles)
+    for _ in range(50):
+        query = ' '.join(rng.choice(words) for _ in range(rng.randint(0, 5)))
+        for threshold, top_k in ((0, 5), (60, 3), (80, 1), (95, 10)):
+            assert index.search(query, top_k=top_k, similarity_threshold=threshold) == \
+                _ranking(titles, query, threshold, top_k)
@@ -0,0 +1,66 @@
+import pytest
+
+from conftest import timed_audio
+from podsummer import utils
+from podsummer.transcribe.registry import ModelRegistry
+from podsummer.transcribe.whisperx import WhisperXTranscriber
+
+
+@pytest.fixture
+def transcriber(fake_whisperx, monkeypatch):
+    fake_whisperx.load_align_model = lambda language_code, device: (f"align-{language_code}", {})
+    fake_whisperx.align = lambda segments, model, metadata, audio, device, return_char_alignments: {
+        'segments': [{**segment, 'aligned': model} for segment in segments]}
+    transcriber = WhisperXTranscriber('fake', device='cpu', compute_type='int8', registry=ModelRegistry())
+    decoded = []
+
+    def load_audio(audio_path):
+        decoded.append(audio_path)
+        if audio_path == 'broken.mp3':
+            raise RuntimeError("Failed to load audio")
+        return timed_audio(3)
+
+    monkeypatch.setattr(transcriber, 'load_audio', load_audio)
+    transcriber.decoded = decoded
+    return transcriber
+
+
+def test_transcripts_are_saved_as_soon_as_they_are_final(transcriber, tmp_path, monkeypatch):
+    saved = []
+    save_transcript = utils.save_transcript
+    monkeypatch.setattr(utils, 'save_transcript', lambda result, path: saved.append(path) or save_transcript(result, path))
+    model = transcriber._load_model()
+    model_transcribe = model.transcribe
+
+    saved_before = []
+
+    def transcribe(audio, **kwargs):
+        saved_before.append(list(saved))
+        return model_transcribe(audio, **kwargs)
+
+    monkeypatch.setattr(model, 'transcribe', transcribe)
+    episodes = [(f"{name}.mp3", tmp_path / f"{name}.json") for name in ('a', 'b', 'c')]
+    report = transcriber.transcribe_many(episodes, align=True, prefetch=1)
+    # Every earlier episode is on disk before the next one is transcribed
+    assert saved_before == [[], [episodes[0][1]], [episodes[0][1], episodes[1][1]]]
+    # Alignment reuses the audio decoded for transcription
+    assert transcriber.decoded == ['a.mp3', 'b.mp3', 'c.mp3']
+    assert utils.load_transcript(episodes[0][1])['segments'][0]['aligned'] == 'align-en'
+    assert report['failed'] == 0 and all(episode['rtf'] is not None for episode in report['episodes'])
+
+
+def test_failed_episodes_are_reported(transcriber, tmp_path):
+    episodes = [('a.mp3', tmp_path / 'a.json'), ('broken.mp3', tmp_path / 'broken.json'), ('b.mp3', tmp_path / 'b.json')]
+    report = transcriber.transcribe_many(episodes)
+    assert [episode['error'] for episode in report['episodes']] == [None, "RuntimeError('Failed to load audio')", None]
+    assert report['failed'] == 1
+    assert (tmp_path / 'a.json').exists() and (tmp_path / 'b.json').exists()
+    assert not (tmp_path / 'broken.json').exists()
+
+
+def test_duplicate_audio_is_saved_to_every_transcript_path(transcriber, tmp_path):
+    episodes = [('a.mp3', tmp_path / 'first.json'), ('a.mp3', tmp_path / 'second.json')]
+    report = transcriber.transcribe_many(episodes)
+    assert transcriber.decoded == ['a.mp3']
+    assert [episode['transcript_path'] for episode in report['episodes']] == [str(path) for _, path in episodes]
+    assert utils.load_transcript(tmp_path / 'first.json') == utils.load_transcript(tmp_path / 'second.json')
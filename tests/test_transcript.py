@@ -0,0 +1,60 @@
+import pytest
+
+from podsummer.transcript.segments import SegmentTable
+from podsummer.transcript.transcript import Transcript
+
+SEGMENTS = [{'start': 0.0, 'end': 2.0, 'text': " Hello"}, {'start': 2.5, 'end': 4.0, 'text': " wörld"},
+            {'start': 4.0, 'end': 7.0, 'text': ""}, {'start': 8.0, 'end': 9.5, 'text': " again"}]
+
+
+def test_segment_table():
+    table = SegmentTable.from_segments(SEGMENTS)
+    assert len(table) == 4
+    assert [table.segment(i) for i in range(len(table))] == SEGMENTS
+    assert table.text(1) == " wörld"
+    assert table.index_at(0.0) == 0
+    assert table.index_at(2.2) is None
+    assert table.index_at(3.0) == 1
+    assert table.index_at(9.5) == 3
+    assert table.index_at(10.0) is None
+    assert table.range_indices(1.0, 4.5) == (0, 3)
+    assert table.range_indices(7.2, 7.8) == (3, 3)
+    with pytest.raises(ValueError):
+        SegmentTable(table.starts, table.ends[:2], table.offsets, table.blob)
+
+
+def test_segment_at_and_slice():
+    transcript = Transcript(raw={'segments': SEGMENTS, 'language': 'en'})
+    assert transcript.segment_at(3.0) == SEGMENTS[1]
+    assert transcript.segment_at(7.5) is None
+    part = transcript.slice(3.0, 8.5)
+    assert part.segments == SEGMENTS[1:]
+    assert list(part.starts) == [2.5, 4.0, 8.0]
+    assert part.text == " wörld   again"
+    assert part.info == {'language': 'en'}
+    # Lookups on a slice stay within it
+    assert part.segment_at(1.0) is None
+    assert part.segment_at(8.0) == SEGMENTS[3]
+    assert part.slice(0.0, 3.0).segments == SEGMENTS[1:2]
+    assert len(transcript.slice(20.0, 30.0)) == 0
+
+
+def test_segments_are_built_once():
+    transcript = Transcript(raw={'segments': SEGMENTS})
+    assert transcript.segments is transcript.segments
+    assert list(transcript.iter_segments()) == SEGMENTS
+
+
+def test_text_transcripts_have_no_segment_times():
+    transcript = Transcript(raw="Just some text.")
+    assert not transcript.timed
+    assert transcript.text == "Just some text."
+    assert transcript.segments == [] and len(transcript) == 0
+    assert transcript.segment_at(0.0) is None
+    for attribute in ('starts', 'ends', 'timed_text'):
+        with pytest.raises(ValueError):
+            getattr(transcript, attribute)
+    with pytest.raises(ValueError):
+        list(transcript.iter_texts())
+    with pytest.raises(ValueError):
+        transcript.slice(0.0, 1.0)
@@ -0,0 +1,71 @@
+import gzip
+
+import pytest
+
+from podsummer import utils
+from podsummer.retrieval.bm25 import BM25Index
+
+RESULT = {'language': 'en', 'mode': 'transcribed',
+          'segments': [{'start': float(i), 'end': i + 1.0, 'text': f" segment {i}"} for i in range(5)]}
+
+
+def test_json_lines_transcripts_appear_only_when_complete(tmp_path):
+    path = tmp_path / 'transcript.jsonl'
+    with pytest.raises(RuntimeError):
+        with utils.SegmentWriter(path, {'mode': 'transcribed'}) as writer:
+            writer.write_segments(RESULT['segments'][:2])
+            writer.flush()
+            assert not path.exists()
+            raise RuntimeError("interrupted")
+    assert list(tmp_path.iterdir()) == []
+    utils.save_transcript(RESULT, path)
+    assert utils.load_transcript(path) == RESULT
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_truncated_gzip_transcripts_yield_their_complete_lines(tmp_path):
+    path = tmp_path / 'transcript.jsonl.gz'
+    utils.save_transcript(RESULT, path)
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) - 12])
+    segments = list(utils.iter_segments(path))
+    assert segments == RESULT['segments'][:len(segments)]
+
+
+def test_truncated_zstd_transcripts_yield_their_complete_lines(tmp_path):
+    pytest.importorskip('zstandard')
+    path = tmp_path / 'transcript.jsonl.zst'
+    utils.save_transcript(RESULT, path)
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) - 12])
+    segments = list(utils.iter_segments(path))
+    assert segments == RESULT['segments'][:len(segments)]
+
+
+def test_bm25_indexes_every_transcript_format(tmp_path):
+    content = tmp_path / 'content'
+    for episode, name in (('json', 'transcript.json'), ('jsonl', 'transcript.jsonl'), ('gz', 'transcript.jsonl.gz')):
+        (content / 'show' / episode).mkdir(parents=True)
+        utils.save_transcript({**RESULT, 'segments': [{**RESULT['segments'][0], 'text': f" about {episode}"}]},
+                              content / 'show' / episode / name)
+    # Files kept next to the transcripts are not transcripts
+    (content / 'show' / 'json' / 'transcript.json.partial.jsonl').write_text('{"header": {}}\n')
+    (content / 'show' / 'json' / 'transcript.json.index.json').write_text('{}')
+    index = BM25Index(tmp_path / 'bm25.sqlite')
+    assert index.update(content) == 3
+    assert {hit['episode'] for hit in index.search('about json jsonl gz')} == {'json', 'jsonl', 'gz'}
+    # An episode saved again in another format is indexed once, from its new transcript
+    utils.save_transcript({**RESULT, 'segments': [{**RESULT['segments'][0], 'text': " about zstd"}]},
+                          content / 'show' / 'json' / 'transcript.jsonl')
+    assert index.update(content) == 1
+    assert index.search('json') == []
+    assert [(hit['episode'], hit['text']) for hit in index.search('zstd')] == [('json', " about zstd")]
+
+
+def test_failed_json_save_leaves_the_previous_file(tmp_path):
+    path = tmp_path / 'transcript.json.gz'
+    utils.save_transcript(RESULT, path)
+    with pytest.raises(TypeError):
+        utils.save_json({**RESULT, 'language': object()}, path)
+    assert list(tmp_path.iterdir()) == [path]
+    assert utils.load_transcript(path) == RESULT
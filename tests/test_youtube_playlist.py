@@ -0,0 +1,48 @@
+import pytest
+
+from podsummer.media import youtube
+
+
+class FakeVideo:
+    """ Stands in for YouTubeVideo, failing for the URLs containing 'broken' """
+
+    def __init__(self, url):
+        self.url = url
+        self.video_id = url.rsplit('=', 1)[1]
+        # Several videos of a playlist can share a title
+        self.title = "Same title"
+
+    def download_audio(self, store=None):
+        if 'broken' in self.url:
+            raise IOError(f"cannot download {self.video_id}")
+
+    def download_transcript(self):
+        if 'broken' in self.url:
+            raise IOError(f"cannot fetch captions of {self.video_id}")
+        return [{'start': 0.0, 'end': 1.0, 'text': self.video_id}]
+
+
+class FakePlaylist:
+    def __init__(self, url):
+        self.title = "Playlist"
+        self.video_urls = [f"https://www.youtube.com/watch?v={video_id}" for video_id in ('a', 'b', 'broken', 'c')]
+
+
+@pytest.fixture
+def playlist(monkeypatch):
+    monkeypatch.setattr(youtube.pytube, 'Playlist', FakePlaylist)
+    monkeypatch.setattr(youtube, 'YouTubeVideo', FakeVideo)
+    return youtube.YouTubePlaylist("https://www.youtube.com/playlist?list=test", max_workers=2)
+
+
+def test_results_are_keyed_by_video_id(playlist):
+    transcripts, failures = playlist.download_transcript()
+    assert list(transcripts) == ['a', 'b', 'c']
+    assert transcripts['b'] == [{'start': 0.0, 'end': 1.0, 'text': 'b'}]
+    assert list(failures) == ['broken'] and isinstance(failures['broken'], IOError)
+
+
+def test_download_audio_reports_failures(playlist):
+    failures = playlist.download_audio()
+    assert list(failures) == ['broken']
+    assert ('download_audio', 'broken') in playlist.errors